@@ -4,14 +4,20 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'nearbyB
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'trafficLights')))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'tunnelIdentification')))
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'competitors')))
-from fastapi import FastAPI
-from climate.open_meteo import get_climate_data
+import asyncio
+import json
+import math
+from typing import List, Optional
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import StreamingResponse
+from climate.providers import get_climate_data
 from nearbyBusinesses.nearby_businesses import get_nearby_business_count
 from trafficLights.nearby_traffic_lights import get_nearby_traffic_lights, filter_duplicate_locations
 from speedLimits.speed_limits import get_nearest_roads_with_speed
 from operationalHours.searchNearby import find_nearby_places
 from tunnelIdentification.api import identify_tunnel
 from competitors.api import count_competitors
+from common.places_client import search_nearby, places_field_mask
 
 
 app = FastAPI()
@@ -35,7 +41,11 @@ def get_nearby_businesses(lat: float, lon: float):
     This endpoint takes latitude and longitude as query parameters,
     fetches nearby businesses data, and returns it as a JSON response.
     """
-    nearby_businesses_data = get_nearby_business_count(lat, lon)
+    return build_nearby_businesses_row(lat, lon)
+
+def build_nearby_businesses_row(lat, lon, target_car_wash=None):
+    """Builds the nearby businesses output row, optionally from an already resolved car wash."""
+    nearby_businesses_data = get_nearby_business_count(lat, lon, target_car_wash=target_car_wash)
     if nearby_businesses_data:
         nearest_businesses = nearby_businesses_data.get('nearest_businesses', [])
         multiple_business_count = sum(1 for business in nearest_businesses if business['address'] == nearby_businesses_data['target_car_wash']['address'])
@@ -138,6 +148,10 @@ def get_operational_hours(lat: float, lon: float, radius: int = 3219, place_type
         max_results=max_results,
         rank_preference="DISTANCE"
     )
+    return build_operational_hours_row(lat, lon, results)
+
+def build_operational_hours_row(lat, lon, results):
+    """Builds the operational hours output row from a Nearby Search response."""
     if results and "places" in results and results["places"]:
         nearest_place = results["places"][0]
         output_row = {
@@ -193,3 +207,204 @@ def get_competitors(lat: float, lon: float):
         return competitors_summary
     else:
         return {"error": "Could not retrieve competitors data."}
+
+# Features available to /site-profile, named after their single-feature endpoints.
+SITE_PROFILE_FEATURES = [
+    "climate",
+    "nearby-businesses",
+    "traffic-lights",
+    "speed-limits",
+    "operational-hours",
+    "tunnel-identification",
+    "competitors",
+]
+
+# Union of the fields read by every feature that starts from the nearest car wash.
+NEAREST_CAR_WASH_FIELD_MASK = places_field_mask(
+    "id", "displayName", "location", "formattedAddress", "rating", "userRatingCount",
+    "regularOpeningHours", "businessStatus"
+)
+# Widest car wash radius used by the features (operational hours, 2 miles).
+NEAREST_CAR_WASH_RADIUS_METERS = 3219
+
+def compute_site_feature(feature, lat, lon, nearest_results):
+    """Computes one feature's output row for /site-profile."""
+    nearest_car_wash = None
+    if nearest_results and nearest_results.get("places"):
+        nearest_car_wash = nearest_results["places"][0]
+
+    if feature == "climate":
+        return get_climate(lat, lon)
+    if feature == "nearby-businesses":
+        if nearest_car_wash is None:
+            return {"error": "Could not retrieve nearby businesses data."}
+        return build_nearby_businesses_row(lat, lon, target_car_wash=nearest_car_wash)
+    if feature == "traffic-lights":
+        return get_traffic_lights(lat, lon)
+    if feature == "speed-limits":
+        return get_speed_limits(lat, lon)
+    if feature == "operational-hours":
+        return build_operational_hours_row(lat, lon, nearest_results)
+    if feature == "tunnel-identification":
+        if nearest_car_wash is None:
+            return {"error": "Could not retrieve tunnel identification data."}
+        tunnel_data = identify_tunnel(lat, lon, nearest_car_wash=nearest_car_wash)
+        return tunnel_data if tunnel_data else {"error": "Could not retrieve tunnel identification data."}
+    if feature == "competitors":
+        return get_competitors(lat, lon)
+    return {"error": f"Unknown feature '{feature}'."}
+
+async def build_site_profile(lat, lon, features=None):
+    """
+    Resolves the nearest car wash once, computes the requested features
+    concurrently and merges their rows into one.
+    """
+    features = features or SITE_PROFILE_FEATURES
+    unknown = [feature for feature in features if feature not in SITE_PROFILE_FEATURES]
+    if unknown:
+        return {"error": f"Unknown features: {', '.join(unknown)}. Valid features: {', '.join(SITE_PROFILE_FEATURES)}"}
+
+    nearest_results = None
+    if any(feature in ("nearby-businesses", "operational-hours", "tunnel-identification") for feature in features):
+        API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+        if not API_KEY:
+            return {"error": "GOOGLE_MAPS_API_KEY not set"}
+        nearest_results = await asyncio.to_thread(
+            search_nearby,
+            API_KEY,
+            lat,
+            lon,
+            radius_miles=NEAREST_CAR_WASH_RADIUS_METERS/1609.34,
+            included_types=["car_wash"],
+            max_results=1,
+            rank_preference="DISTANCE",
+            field_mask=NEAREST_CAR_WASH_FIELD_MASK
+        )
+
+    async def run_feature(feature):
+        try:
+            return await asyncio.to_thread(compute_site_feature, feature, lat, lon, nearest_results)
+        except Exception as e:
+            return {"error": f"{type(e).__name__}: {e}"}
+
+    rows = await asyncio.gather(*(run_feature(feature) for feature in features))
+
+    profile = {
+        'Latitude': lat,
+        'Longitude': lon,
+    }
+    errors = {}
+    for feature, row in zip(features, rows):
+        if not row or "error" in row:
+            errors[feature] = (row or {}).get("error", "No data returned.")
+            continue
+        for key, value in row.items():
+            if key not in ('Latitude', 'Longitude'):
+                profile[key] = value
+    if errors:
+        profile['errors'] = errors
+    return profile
+
+@app.get("/site-profile")
+async def get_site_profile(lat: float, lon: float, features: Optional[List[str]] = Query(None)):
+    """
+    This endpoint takes latitude and longitude (and optionally a list of features)
+    as query parameters, computes the features concurrently around a single
+    nearest car wash lookup, and returns one merged row as a JSON response.
+    """
+    return await build_site_profile(lat, lon, features)
+
+# Number of sites processed at the same time by the /batch endpoints.
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+
+BATCH_FEATURE_HANDLERS = {
+    "climate": get_climate,
+    "nearby-businesses": get_nearby_businesses,
+    "traffic-lights": get_traffic_lights,
+    "speed-limits": get_speed_limits,
+    "operational-hours": get_operational_hours,
+    "tunnel-identification": get_tunnel_identification,
+    "competitors": get_competitors,
+}
+
+def parse_batch_sites(body, content_type):
+    """
+    Parses a batch request body into a list of site dicts.
+
+    Accepts NDJSON (one site per line), a JSON list of sites, or a JSON object
+    with a "sites" list. Each site needs lat/lon (or Latitude/Longitude).
+    """
+    text = body.decode("utf-8")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        sites = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        payload = json.loads(text) if text.strip() else []
+        sites = payload.get("sites", []) if isinstance(payload, dict) else payload
+    if not isinstance(sites, list):
+        raise ValueError("Expected a list of sites.")
+    return sites
+
+def _site_coordinates(site):
+    lat = site.get("lat", site.get("Latitude"))
+    lon = site.get("lon", site.get("Longitude"))
+    return float(lat), float(lon)
+
+def _json_safe(value):
+    """Converts numpy scalars and NaN values so rows serialize as strict JSON."""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if hasattr(value, "item") and not isinstance(value, (str, bytes)):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+async def stream_batch_rows(feature, sites, max_workers=BATCH_MAX_WORKERS):
+    """Runs a feature for every site on a bounded pool and yields NDJSON lines as rows finish."""
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def run_site(index, site):
+        row = {"index": index}
+        if not isinstance(site, dict):
+            row["error"] = "Each site must be a JSON object."
+            return row
+        row.update({key: value for key, value in site.items() if key not in ("lat", "lon", "Latitude", "Longitude", "features")})
+        try:
+            lat, lon = _site_coordinates(site)
+        except (TypeError, ValueError):
+            row["error"] = "Site is missing a valid lat/lon."
+            return row
+        async with semaphore:
+            try:
+                if feature == "site-profile":
+                    result = await build_site_profile(lat, lon, site.get("features"))
+                else:
+                    result = await asyncio.to_thread(BATCH_FEATURE_HANDLERS[feature], lat, lon)
+            except Exception as e:
+                result = {"Latitude": lat, "Longitude": lon, "error": f"{type(e).__name__}: {e}"}
+        row.update(result or {"error": "No data returned."})
+        return row
+
+    tasks = [asyncio.create_task(run_site(index, site)) for index, site in enumerate(sites)]
+    for finished in asyncio.as_completed(tasks):
+        row = await finished
+        yield json.dumps(_json_safe(row)) + "\n"
+
+@app.post("/batch/{feature}")
+async def post_batch(feature: str, request: Request):
+    """
+    This endpoint takes a JSON or NDJSON list of sites in the request body,
+    runs the given feature (or "site-profile") for each site on a bounded worker
+    pool, and streams one NDJSON row per site as soon as it finishes. Rows carry
+    the input "index" since they arrive in completion order.
+    """
+    if feature != "site-profile" and feature not in BATCH_FEATURE_HANDLERS:
+        valid = ", ".join(["site-profile"] + list(BATCH_FEATURE_HANDLERS))
+        return {"error": f"Unknown feature '{feature}'. Valid features: {valid}"}
+    try:
+        sites = parse_batch_sites(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        return {"error": f"Could not parse sites: {e}"}
+    return StreamingResponse(stream_batch_rows(feature, sites), media_type="application/x-ndjson")
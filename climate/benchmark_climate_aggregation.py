@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from climate.open_meteo import (
+    climatology_from_daily, CLIMATE_METRICS, START_YEAR, END_YEAR, START_DATE_STR, END_DATE_STR,
+    RAIN_DAY_THRESHOLD_MM, SNOW_DAY_THRESHOLD_CM, FREEZING_THRESHOLD_C, PLEASANT_TEMP_MIN_C, PLEASANT_TEMP_MAX_C
+)
+
+
+def climatology_year_loop(weather_df):
+    """The previous get_climate_data aggregation: one masked copy of the frame per year."""
+    annual_metrics_list = []
+    for year_val in range(START_YEAR, END_YEAR + 1):
+        year_df = weather_df[weather_df.index.year == year_val]
+
+        if year_df.empty:
+            annual_metrics_list.append({"year": year_val})
+            continue
+
+        year_df_copy = year_df.copy()
+        year_df_copy.loc[:, 'temp_avg_approx'] = (year_df_copy['temperature_2m_min'] + year_df_copy['temperature_2m_max']) / 2
+        annual_metrics_list.append({
+            "year": year_val,
+            "total_precipitation_mm": year_df['precipitation_sum'].sum(skipna=True),
+            "rainy_days": (year_df['precipitation_sum'] > RAIN_DAY_THRESHOLD_MM).sum(),
+            "total_snowfall_cm": year_df['snowfall_sum'].sum(skipna=True),
+            "snowy_days": (year_df['snowfall_sum'] > SNOW_DAY_THRESHOLD_CM).sum(),
+            "days_below_freezing": (year_df['temperature_2m_min'] < FREEZING_THRESHOLD_C).sum(),
+            "total_sunshine_hours": year_df['sunshine_duration'].sum(skipna=True) / 3600.0,
+            "days_pleasant_temp": (
+                (year_df_copy['temp_avg_approx'] >= PLEASANT_TEMP_MIN_C) &
+                (year_df_copy['temp_avg_approx'] <= PLEASANT_TEMP_MAX_C)
+            ).sum(),
+            "avg_daily_max_windspeed_ms": year_df['windspeed_10m_max'].mean(skipna=True),
+        })
+
+    annual_metrics_df = pd.DataFrame(annual_metrics_list)
+    if annual_metrics_df.empty or annual_metrics_df.drop(columns=['year']).isnull().all().all():
+        return None
+    return annual_metrics_df.drop(columns=['year']).mean(skipna=True).to_dict()
+
+
+def synthetic_daily_frame(seed, missing_fraction=0.01):
+    """Ten years of plausible daily weather shaped like the Open-Meteo response, with a few gaps."""
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(START_DATE_STR, END_DATE_STR, freq="D", name="time")
+    day_of_year = index.dayofyear.to_numpy()
+    seasonal = 12 * np.sin(2 * np.pi * (day_of_year - 110) / 365.25)
+    temp_min = 8 + seasonal + rng.normal(0, 4, len(index))
+    df = pd.DataFrame({
+        "precipitation_sum": rng.gamma(0.4, 6, len(index)),
+        "snowfall_sum": np.where(temp_min < 0, rng.gamma(0.3, 2, len(index)), 0.0),
+        "temperature_2m_max": temp_min + rng.uniform(5, 14, len(index)),
+        "temperature_2m_min": temp_min,
+        "sunshine_duration": rng.uniform(0, 14 * 3600, len(index)),
+        "windspeed_10m_max": rng.uniform(5, 40, len(index)),
+    }, index=index)
+    return df.mask(rng.random(df.shape) < missing_fraction)
+
+
+def measure(fn, frames):
+    """CPU seconds per site and peak traced memory (bytes) of running `fn` over `frames`."""
+    tracemalloc.start()
+    start = time.process_time()
+    results = [fn(df) for df in frames]
+    cpu_seconds = time.process_time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, cpu_seconds / len(frames), peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the vectorized climatology with the previous per-year loop.")
+    parser.add_argument("--sites", type=int, default=200, help="Number of synthetic sites to aggregate")
+    args = parser.parse_args()
+
+    frames = [synthetic_daily_frame(seed) for seed in range(args.sites)]
+
+    loop_results, loop_cpu, loop_peak = measure(climatology_year_loop, frames)
+    vector_results, vector_cpu, vector_peak = measure(climatology_from_daily, frames)
+
+    for old, new in zip(loop_results, vector_results):
+        for metric in CLIMATE_METRICS:
+            if not np.isclose(old[metric], new[metric], equal_nan=True):
+                print(f"Mismatch in {metric}: loop={old[metric]} vectorized={new[metric]}")
+                sys.exit(1)
+
+    print(f"{args.sites} sites, {len(frames[0])} days each; results match.")
+    print(f"  per-year loop: {loop_cpu * 1000:.2f} ms CPU per site, peak {loop_peak / 1024:.0f} KiB")
+    print(f"  vectorized:    {vector_cpu * 1000:.2f} ms CPU per site, peak {vector_peak / 1024:.0f} KiB")
+    print(f"  speedup: {loop_cpu / vector_cpu:.1f}x")
@@ -0,0 +1,349 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CLIMATE_CACHE_DIR = os.getenv("CLIMATE_CACHE_DIR", os.path.join(PROJECT_ROOT, "cache", "open_meteo"))
+# Half the spacing of the archive's ~0.1 degree (9-11 km) grid: a site within
+# this many degrees of a cached cell's center in both latitude and longitude
+# snaps to that cell. Open-Meteo's statistical downscaling to the site's own
+# elevation is then taken from the first site fetched in the cell.
+GRID_SNAP_DEGREES = float(os.getenv("CLIMATE_GRID_SNAP_DEGREES", "0.05"))
+
+# Same rounding as the places cache: repeated site coordinates share one entry.
+SITE_PRECISION = 5
+CELL_PRECISION = 4
+
+
+def cell_id(latitude, longitude, elevation):
+    """Id of a grid cell, from the coordinates and elevation Open-Meteo returned for it."""
+    return f"{round(float(latitude), CELL_PRECISION)},{round(float(longitude), CELL_PRECISION)},{round(float(elevation), 1)}"
+
+
+class GridClimateCache:
+    """
+    On-disk cache of daily weather series, one per snapped grid cell. Each
+    provider gets its own cache directory (Open-Meteo's by default).
+
+    A SQLite index records each cell (the lat/lon/elevation Open-Meteo
+    returned, the first and last stored day) and which cell every requested
+    site resolved to. New days are merged into a cell's series, so callers
+    only need to fetch the days outside its stored range. Series are stored column by column in compressed .npz files:
+    days since the epoch as int32 and each variable as float32.
+    """
+
+    def __init__(self, cache_dir=CLIMATE_CACHE_DIR, snap_degrees=GRID_SNAP_DEGREES):
+        self.cache_dir = cache_dir
+        self.snap_degrees = snap_degrees
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Serializes read-merge-write of the series files.
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.join(cache_dir, "cells"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cells (
+                cell_id TEXT PRIMARY KEY,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                elevation REAL NOT NULL,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cells_lat_lon ON cells (latitude, longitude)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sites (
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                cell_id TEXT NOT NULL,
+                PRIMARY KEY (latitude, longitude)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _series_path(self, cell):
+        return os.path.join(self.cache_dir, "cells", f"{hashlib.sha1(cell.encode('utf-8')).hexdigest()}.npz")
+
+    def find_cell(self, latitude, longitude):
+        """
+        Returns the cell a site belongs to as a dict (cell_id, latitude,
+        longitude, elevation, start_date, end_date), or None if no cached cell
+        covers it. Sites seen before resolve to the cell they were fetched
+        from; others to the nearest cached cell within snap_degrees.
+        """
+        site = (round(float(latitude), SITE_PRECISION), round(float(longitude), SITE_PRECISION))
+        columns = "cells.cell_id, cells.latitude, cells.longitude, cells.elevation, cells.start_date, cells.end_date"
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {columns} FROM sites JOIN cells ON sites.cell_id = cells.cell_id "
+                f"WHERE sites.latitude = ? AND sites.longitude = ?",
+                site
+            ).fetchone()
+            if row is None:
+                candidates = self._conn.execute(
+                    f"SELECT {columns} FROM cells WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?",
+                    (site[0] - self.snap_degrees, site[0] + self.snap_degrees,
+                     site[1] - self.snap_degrees, site[1] + self.snap_degrees)
+                ).fetchall()
+                if candidates:
+                    row = min(candidates, key=lambda c: (c[1] - site[0]) ** 2 + (c[2] - site[1]) ** 2)
+        if row is None:
+            return None
+        return dict(zip(("cell_id", "latitude", "longitude", "elevation", "start_date", "end_date"), row))
+
+    def load(self, cell):
+        """Returns the cached daily series of a cell as a DataFrame indexed by time, or None."""
+        try:
+            with np.load(self._series_path(cell)) as data:
+                index = pd.DatetimeIndex(data["time"].astype("datetime64[D]"), name="time")
+                columns = {name: data[name].astype(np.float64) for name in data.files if name != "time"}
+        except (OSError, ValueError, KeyError):
+            return None
+        return pd.DataFrame(columns, index=index)
+
+    def covers(self, latitude, longitude, start_date, end_date):
+        """True if the cell the site snaps to is cached for the whole of [start_date, end_date]."""
+        cell = self.find_cell(latitude, longitude)
+        return cell is not None and cell["start_date"] <= start_date and cell["end_date"] >= end_date
+
+    @staticmethod
+    def missing_ranges(cell, start_date, end_date):
+        """
+        The (start_date, end_date) ranges to fetch so a cell covers [start_date, end_date].
+
+        Ranges always start or end next to the stored series (the tail runs
+        from the day after the last stored day), so a cell's series never has
+        gaps and its first and last day describe everything it holds.
+        """
+        day = pd.Timedelta(days=1)
+        ranges = []
+        if start_date < cell["start_date"]:
+            ranges.append((start_date, (pd.Timestamp(cell["start_date"]) - day).strftime("%Y-%m-%d")))
+        if end_date > cell["end_date"]:
+            ranges.append(((pd.Timestamp(cell["end_date"]) + day).strftime("%Y-%m-%d"), end_date))
+        return ranges
+
+    def get(self, latitude, longitude, start_date, end_date):
+        """
+        Returns the daily series for [start_date, end_date] from the cell the
+        site snaps to, or None if no cached cell covers the whole range.
+        """
+        cell = self.find_cell(latitude, longitude)
+        if cell is None or self.missing_ranges(cell, start_date, end_date):
+            self.misses += 1
+            return None
+        df = self.read(latitude, longitude, cell, start_date, end_date)
+        if df is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return df
+
+    def get_or_fetch(self, latitude, longitude, start_date, end_date, fetch):
+        """
+        Returns the daily series for [start_date, end_date], one row per day,
+        fetching only what the site's cell does not have yet.
+
+        `fetch(latitude, longitude, start_date, end_date, elevation=None)`
+        returns a daily DataFrame with the cell in attrs. Missing days of a
+        stored cell are requested at the cell's own coordinates and elevation,
+        so they land in the same cell.
+        """
+        cell = self.find_cell(latitude, longitude)
+        if cell is None:
+            self.misses += 1
+            weather_df = fetch(latitude, longitude, start_date, end_date)
+            if not weather_df.empty:
+                self.set(latitude, longitude, weather_df)
+            return weather_df
+
+        missing = self.missing_ranges(cell, start_date, end_date)
+        if missing:
+            self.misses += 1
+            for missing_start, missing_end in missing:
+                print(f"Fetching {missing_start} to {missing_end} for grid cell {cell['cell_id']}")
+                update = fetch(cell["latitude"], cell["longitude"], missing_start, missing_end, elevation=cell["elevation"])
+                if not update.empty:
+                    self.set(latitude, longitude, update)
+            cell = self.find_cell(latitude, longitude) or cell
+        else:
+            self.hits += 1
+
+        weather_df = self._read_window(latitude, longitude, cell, start_date, end_date)
+        if weather_df is None:
+            return fetch(latitude, longitude, start_date, end_date)
+        return weather_df
+
+    def get_or_fetch_many(self, locations, start_date, end_date, fetch_many):
+        """
+        get_or_fetch() for many sites, with the requests grouped into multi-location calls.
+
+        `fetch_many(locations, start_date, end_date, elevations=None)` returns
+        one daily DataFrame per location, with its cell in attrs. Sites without
+        a stored cell are fetched for the whole range at their own coordinates,
+        one call for all of them. Stored cells only fetch their missing ranges,
+        at the cell's coordinates and elevation, one call per distinct range,
+        so a rolling window costs one small request for every stale cell.
+
+        Returns:
+            list: One daily DataFrame per location, in order (empty where nothing could be fetched).
+        """
+        frames = [pd.DataFrame() for _ in locations]
+        cells = [self.find_cell(latitude, longitude) for latitude, longitude in locations]
+        new_sites = {}  # rounded site -> indices of the locations at it
+        updates = {}    # missing (start_date, end_date) -> {cell_id: (cell, index of a location in it)}
+        for i, ((latitude, longitude), cell) in enumerate(zip(locations, cells)):
+            if cell is None:
+                self.misses += 1
+                site = (round(float(latitude), SITE_PRECISION), round(float(longitude), SITE_PRECISION))
+                new_sites.setdefault(site, []).append(i)
+                continue
+            missing = self.missing_ranges(cell, start_date, end_date)
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+            for missing_range in missing:
+                updates.setdefault(missing_range, {}).setdefault(cell["cell_id"], (cell, i))
+
+        for (missing_start, missing_end), by_cell in updates.items():
+            targets = list(by_cell.values())
+            print(f"Fetching {missing_start} to {missing_end} for {len(targets)} grid cell(s)")
+            fetched = fetch_many([(cell["latitude"], cell["longitude"]) for cell, _ in targets], missing_start, missing_end,
+                                 elevations=[cell["elevation"] for cell, _ in targets])
+            for (_, i), update in zip(targets, fetched):
+                if not update.empty:
+                    self.set(*locations[i], update)
+
+        for i, ((latitude, longitude), cell) in enumerate(zip(locations, cells)):
+            if cell is None:
+                continue
+            weather_df = self._read_window(latitude, longitude, self.find_cell(latitude, longitude) or cell,
+                                           start_date, end_date)
+            if weather_df is None:
+                # The index lists the cell but its series is unreadable: fetch the site afresh.
+                site = (round(float(latitude), SITE_PRECISION), round(float(longitude), SITE_PRECISION))
+                new_sites.setdefault(site, []).append(i)
+            else:
+                frames[i] = weather_df
+
+        if new_sites:
+            groups = list(new_sites.values())
+            fetched = fetch_many([locations[group[0]] for group in groups], start_date, end_date)
+            for group, weather_df in zip(groups, fetched):
+                for i in group:
+                    frames[i] = weather_df
+                if not weather_df.empty:
+                    self.set(*locations[group[0]], weather_df)
+        return frames
+
+    def _read_window(self, latitude, longitude, cell, start_date, end_date):
+        """A cell's stored series over [start_date, end_date], one row per day, or None if it cannot be read."""
+        stored = self.read(latitude, longitude, cell, start_date, end_date)
+        if stored is None:
+            return None
+        # Days the archive has no data for yet come back as empty rows, as from the API.
+        weather_df = stored.reindex(pd.date_range(start_date, end_date, freq="D", name="time"))
+        weather_df.attrs.update(stored.attrs)
+        return weather_df
+
+    def read(self, latitude, longitude, cell, start_date, end_date):
+        """
+        Returns a cell's stored days in [start_date, end_date], with the cell's
+        coordinates in attrs, and records that the site uses this cell.
+        """
+        df = self.load(cell["cell_id"])
+        if df is None:
+            return None
+        self._remember_site(latitude, longitude, cell["cell_id"])
+        df = df.loc[start_date:end_date]
+        df.attrs.update(latitude=cell["latitude"], longitude=cell["longitude"], elevation=cell["elevation"])
+        return df
+
+    def set(self, latitude, longitude, weather_df):
+        """
+        Stores a series fetched for a site under the cell the provider resolved
+        it to (taken from weather_df.attrs), merged with any days already cached.
+        """
+        attrs = weather_df.attrs
+        if weather_df.empty or not all(key in attrs for key in ("latitude", "longitude", "elevation")):
+            return
+        with self._write_lock:
+            cell = cell_id(attrs["latitude"], attrs["longitude"], attrs["elevation"])
+
+            cached = self.load(cell)
+            if cached is not None:
+                weather_df = weather_df.combine_first(cached)
+            weather_df = weather_df.sort_index()
+            # The archive lags a few days behind today and returns those days
+            # empty; they are not stored, so end_date is the last day with data
+            # and the next incremental update asks for them again.
+            has_values = weather_df.notna().any(axis=1).to_numpy()
+            if not has_values.any():
+                return
+            weather_df = weather_df.iloc[:len(has_values) - int(np.argmax(has_values[::-1]))]
+
+            columns = {name: pd.to_numeric(weather_df[name], errors="coerce").to_numpy(dtype=np.float32)
+                       for name in weather_df.columns}
+            days = weather_df.index.values.astype("datetime64[D]").astype(np.int32)
+            path = self._series_path(cell)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+            np.savez_compressed(tmp_path, time=days, **columns)
+            os.replace(tmp_path, path)
+
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?)",
+                    (cell, float(attrs["latitude"]), float(attrs["longitude"]), float(attrs["elevation"]),
+                     weather_df.index[0].strftime("%Y-%m-%d"), weather_df.index[-1].strftime("%Y-%m-%d"))
+                )
+                self._conn.commit()
+        self._remember_site(latitude, longitude, cell)
+
+    def _remember_site(self, latitude, longitude, cell):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sites VALUES (?, ?, ?)",
+                (round(float(latitude), SITE_PRECISION), round(float(longitude), SITE_PRECISION), cell)
+            )
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        with self._lock:
+            cells = self._conn.execute("SELECT COUNT(*) FROM cells").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "cells": cells,
+        }
+
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def get_grid_climate_cache(cache_dir=CLIMATE_CACHE_DIR):
+    """
+    Returns the process-wide GridClimateCache stored in `cache_dir` (Open-Meteo's
+    by default), or None if CLIMATE_CACHE_DISABLED is set.
+    """
+    if os.getenv("CLIMATE_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = GridClimateCache(cache_dir)
+        return _caches[cache_dir]
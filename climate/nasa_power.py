@@ -1,41 +1,68 @@
 import requests
+import os
+import sys
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from climate.open_meteo import climatology_from_daily, DAILY_VARIABLES, START_YEAR, END_YEAR
+from climate.grid_cache import get_grid_climate_cache, PROJECT_ROOT
+from common.rate_limiter import RateLimitedError
+
+# Normalized POWER series are stored per grid cell like Open-Meteo's, in their own directory.
+NASA_POWER_CACHE_DIR = os.getenv("NASA_POWER_CACHE_DIR", os.path.join(PROJECT_ROOT, "cache", "nasa_power"))
+
 # --- Configuration (same as before for location and period) ---
 LATITUDE = 34.0522  # Example: Los Angeles
 LONGITUDE = -118.2437 # Example: Los Angeles
-START_YEAR = 2015
-END_YEAR = 2024 # Inclusive
 
 # NASA POWER wants dates in YYYYMMDD format
 START_DATE_NASA = f"{START_YEAR}0101"
 END_DATE_NASA = f"{END_YEAR}1231"
 
-# Thresholds
-RAIN_DAY_THRESHOLD_MM = 1.0
-FREEZING_THRESHOLD_C = 0.0
-
 # NASA POWER API Endpoint
 NASA_POWER_API_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+# A request that takes longer is given up and treated as an empty answer, so the
+# provider layer moves the site on instead of a hung connection stalling the batch.
+NASA_POWER_TIMEOUT_SECONDS = float(os.getenv("NASA_POWER_TIMEOUT_SECONDS", "60"))
 
 # --- Parameters to request from NASA POWER ---
 # Find equivalents:
 # PRECTOTCORR: Precipitation Corrected (mm/day) - includes rain, snow etc.
+# PRECSNOLAND: Snow Precipitation Land (mm/day water equivalent)
 # T2M_MIN: Minimum Temperature at 2 Meters (°C)
 # T2M_MAX: Maximum Temperature at 2 Meters (°C)
+# WS10M_MAX: Maximum Wind Speed at 10 Meters (m/s)
 # ALLSKY_SFC_SW_DWN: All Sky Insolation Incident on a Horizontal Surface (kWh/m^2/day) - proxy for sunniness
-# (No direct snowfall sum, PM2.5, PM10, Dust)
+# (No sunshine duration, PM2.5, PM10, Dust)
 NASA_PARAMETERS = [
     "PRECTOTCORR",
+    "PRECSNOLAND",
     "T2M_MIN",
     "T2M_MAX",
+    "WS10M_MAX",
     "ALLSKY_SFC_SW_DWN"
 ]
 
+# NASA POWER parameter -> (Open-Meteo daily variable, factor to Open-Meteo's unit).
+# Open-Meteo reports snowfall in cm of snow (0.7 cm per mm of water) and wind in km/h.
+NASA_TO_DAILY_VARIABLES = {
+    "PRECTOTCORR": ("precipitation_sum", 1.0),
+    "PRECSNOLAND": ("snowfall_sum", 0.7),
+    "T2M_MAX": ("temperature_2m_max", 1.0),
+    "T2M_MIN": ("temperature_2m_min", 1.0),
+    "WS10M_MAX": ("windspeed_10m_max", 3.6),
+}
+
 # --- Helper Function to Fetch NASA POWER Data ---
-def fetch_nasa_power_data(latitude, longitude, start_date, end_date, parameters):
-    """Fetches data from NASA POWER API and returns a Pandas DataFrame."""
+def fetch_nasa_power_data(latitude, longitude, start_date, end_date, parameters, fail_fast=False):
+    """
+    Fetches data from NASA POWER API and returns a Pandas DataFrame.
+    With `fail_fast`, a 429 raises RateLimitedError instead of returning an empty frame.
+    """
     api_params = {
         "latitude": latitude,
         "longitude": longitude,
@@ -46,8 +73,9 @@ def fetch_nasa_power_data(latitude, longitude, start_date, end_date, parameters)
         "format": "JSON",
         "user": "anonymous" # For basic use; register for an API key for higher limits
     }
+    data = None
     try:
-        response = requests.get(NASA_POWER_API_URL, params=api_params)
+        response = requests.get(NASA_POWER_API_URL, params=api_params, timeout=NASA_POWER_TIMEOUT_SECONDS)
         response.raise_for_status()
         data = response.json()
 
@@ -69,16 +97,25 @@ def fetch_nasa_power_data(latitude, longitude, start_date, end_date, parameters)
             # NASA POWER uses -999 for missing values
             param_values = [date_values.get(d, -999) for d in dates]
             processed_data[param_name] = [val if val != -999 else pd.NA for val in param_values]
-            
+
         if not processed_data or 'time' not in processed_data:
              print("Warning: No data could be processed from NASA POWER response.")
              return pd.DataFrame()
 
         df = pd.DataFrame(processed_data)
         df.set_index('time', inplace=True)
+        # The POWER grid point the request was resolved to: [lon, lat, elevation].
+        coordinates = data.get("geometry", {}).get("coordinates") or []
+        if len(coordinates) >= 3:
+            df.attrs.update(longitude=coordinates[0], latitude=coordinates[1], elevation=coordinates[2])
         return df
 
+    except requests.exceptions.Timeout:
+        print(f"NASA POWER request timed out after {NASA_POWER_TIMEOUT_SECONDS:.0f} seconds.")
+        return pd.DataFrame()
     except requests.exceptions.RequestException as e:
+        if fail_fast and isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 429:
+            raise RateLimitedError("nasa_power", _retry_after_seconds(e.response))
         print(f"Error fetching data from NASA POWER: {e}")
         return pd.DataFrame()
     except (KeyError, ValueError) as e:
@@ -86,65 +123,84 @@ def fetch_nasa_power_data(latitude, longitude, start_date, end_date, parameters)
         print(f"Response snippet: {str(data)[:500]}") # Print part of the response for debugging
         return pd.DataFrame()
 
-# --- 1. Fetch NASA POWER Data ---
-print(f"Fetching NASA POWER data for {START_DATE_NASA} to {END_DATE_NASA}...")
-nasa_df = fetch_nasa_power_data(LATITUDE, LONGITUDE, START_DATE_NASA, END_DATE_NASA, NASA_PARAMETERS)
-
-if nasa_df.empty:
-    print("Could not fetch or process NASA POWER data. Exiting.")
-    exit()
-
-# --- 2. Calculate Annual Metrics from NASA POWER Data ---
-nasa_annual_metrics_list = []
-
-for year in range(START_YEAR, END_YEAR + 1):
-    year_df = nasa_df[nasa_df.index.year == year]
-
-    if year_df.empty:
-        print(f"No NASA POWER data for year {year}. Skipping.")
-        continue
-
-    # PRECTOTCORR is daily precipitation
-    total_precipitation_nasa = year_df['PRECTOTCORR'].sum(skipna=True)
-    rainy_days_nasa = (year_df['PRECTOTCORR'] > RAIN_DAY_THRESHOLD_MM).sum()
-
-    # T2M_MIN is daily min temperature
-    days_below_freezing_nasa = (year_df['T2M_MIN'] < FREEZING_THRESHOLD_C).sum()
-
-    # ALLSKY_SFC_SW_DWN is daily insolation (proxy for sunshine)
-    total_annual_insolation_kwh_m2 = year_df['ALLSKY_SFC_SW_DWN'].sum(skipna=True)
-
-
-    nasa_annual_metrics_list.append({
-        "year": year,
-        "total_precipitation_mm": total_precipitation_nasa,
-        "rainy_days": rainy_days_nasa,
-        # "total_snowfall_cm": Not directly available,
-        # "snowy_days": Not directly available,
-        "days_below_freezing": days_below_freezing_nasa,
-        "total_annual_insolation_kwh_m2": total_annual_insolation_kwh_m2,
-        # "avg_pm10_ug_m3": Not available,
-        # "avg_pm2_5_ug_m3": Not available,
-        # "avg_dust_ug_m3": Not available
-    })
-
-if not nasa_annual_metrics_list:
-    print("No annual metrics could be calculated from NASA POWER data. Exiting.")
-    exit()
-
-nasa_annual_metrics_df = pd.DataFrame(nasa_annual_metrics_list)
-
-# --- 3. Calculate Climatological Averages from NASA POWER ---
-nasa_climatological_averages = nasa_annual_metrics_df.drop(columns=['year']).mean(skipna=True)
-
-print("\n--- NASA POWER Climatological Averages ---")
-print(f"Location: Lat={LATITUDE}, Lon={LONGITUDE}")
-print(f"Period: {START_YEAR}-{END_YEAR} ({len(nasa_annual_metrics_df)} years of data considered)")
-for metric, value in nasa_climatological_averages.items():
-    print(f"{metric}: {value:.2f}")
-
-print("\n--- Notes on NASA POWER Data ---")
-print("1. NASA POWER does not provide PM2.5, PM10, or specific dust concentrations.")
-print("2. 'total_precipitation_mm' from PRECTOTCORR includes all forms of precipitation (rain, snow, etc.).")
-print("3. Direct 'snowfall_sum' or 'snowy_days' (as defined by daily fall) are not standard NASA POWER outputs.")
-print("4. 'total_annual_insolation_kwh_m2' is used as a proxy for sunniness instead of 'sunshine_duration_hours'.")
\ No newline at end of file
+def _retry_after_seconds(response):
+    try:
+        return max(1.0, float(response.headers.get("Retry-After")))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def normalize_nasa_power_frame(nasa_df):
+    """
+    Converts a fetch_nasa_power_data() frame to the daily frame Open-Meteo
+    returns: DAILY_VARIABLES columns in Open-Meteo's units, NaN where POWER
+    has no equivalent (sunshine duration).
+    """
+    daily = pd.DataFrame(index=nasa_df.index)
+    for variable in DAILY_VARIABLES:
+        daily[variable] = np.nan
+    for parameter, (variable, factor) in NASA_TO_DAILY_VARIABLES.items():
+        if parameter in nasa_df.columns:
+            values = pd.to_numeric(nasa_df[parameter], errors='coerce')
+            daily[variable] = values.to_numpy(dtype=np.float64, na_value=np.nan) * factor
+    daily.index.name = 'time'
+    daily.attrs.update(nasa_df.attrs)
+    return daily
+
+def get_daily_weather(latitude, longitude, start_date, end_date, fail_fast=False):
+    """
+    Daily weather from NASA POWER as a normalized frame (see normalize_nasa_power_frame).
+
+    Served from the per-cell store in NASA_POWER_CACHE_DIR, so reruns only
+    request the days a site's cell does not hold yet.
+
+    Args:
+        start_date, end_date (str): Inclusive dates as YYYY-MM-DD, as for Open-Meteo.
+    """
+    def fetch(lat, lon, start, end, elevation=None):
+        nasa_df = fetch_nasa_power_data(
+            lat, lon, start.replace("-", ""), end.replace("-", ""), NASA_PARAMETERS, fail_fast=fail_fast
+        )
+        if nasa_df.empty:
+            return nasa_df
+        return normalize_nasa_power_frame(nasa_df)
+
+    cache = get_grid_climate_cache(NASA_POWER_CACHE_DIR)
+    if cache is None:
+        return fetch(latitude, longitude, start_date, end_date)
+    return cache.get_or_fetch(latitude, longitude, start_date, end_date, fetch)
+
+
+if __name__ == "__main__":
+    # --- 1. Fetch NASA POWER Data ---
+    print(f"Fetching NASA POWER data for {START_DATE_NASA} to {END_DATE_NASA}...")
+    nasa_df = fetch_nasa_power_data(LATITUDE, LONGITUDE, START_DATE_NASA, END_DATE_NASA, NASA_PARAMETERS)
+
+    if nasa_df.empty:
+        print("Could not fetch or process NASA POWER data. Exiting.")
+        sys.exit(1)
+
+    # --- 2. Climatological Averages, with the same metrics and thresholds as open_meteo.py ---
+    nasa_climatological_averages = climatology_from_daily(normalize_nasa_power_frame(nasa_df))
+    if nasa_climatological_averages is None:
+        print("No annual metrics could be calculated from NASA POWER data. Exiting.")
+        sys.exit(1)
+
+    years = nasa_df.index.year
+    insolation = pd.to_numeric(nasa_df['ALLSKY_SFC_SW_DWN'], errors='coerce')
+    insolation = insolation[(years >= START_YEAR) & (years <= END_YEAR)]
+    nasa_climatological_averages["total_annual_insolation_kwh_m2"] = insolation.groupby(insolation.index.year).sum().mean()
+
+    print("\n--- NASA POWER Climatological Averages ---")
+    print(f"Location: Lat={LATITUDE}, Lon={LONGITUDE}")
+    print(f"Period: {START_YEAR}-{END_YEAR}")
+    for metric, value in nasa_climatological_averages.items():
+        if pd.isna(value):
+            print(f"{metric}: Not Available (NaN)")
+        else:
+            print(f"{metric}: {value:.2f}")
+
+    print("\n--- Notes on NASA POWER Data ---")
+    print("1. NASA POWER does not provide PM2.5, PM10, or specific dust concentrations.")
+    print("2. 'total_precipitation_mm' from PRECTOTCORR includes all forms of precipitation (rain, snow, etc.).")
+    print("3. Snowfall is PRECSNOLAND water equivalent converted to cm of snow (x0.7), as Open-Meteo reports it.")
+    print("4. Sunshine duration is not available; 'total_annual_insolation_kwh_m2' is a proxy for sunniness.")
@@ -1,7 +1,17 @@
 import requests
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import time
+import os
+import sys
+import threading
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from climate.grid_cache import get_grid_climate_cache
+from common.rate_limiter import RateLimitedError
 
 # --- Configuration ---
 START_YEAR = 2015
@@ -18,39 +28,60 @@ PLEASANT_TEMP_MAX_C = 25.0
 
 BASE_URL_HISTORICAL_WEATHER = "https://archive-api.open-meteo.com/v1/archive"
 
-def fetch_open_meteo_weather_data(latitude, longitude, start_date, end_date, retries=5, backoff_factor=20):
-    """Fetches historical weather data from Open-Meteo with retry logic."""
+DAILY_VARIABLES = [
+    "precipitation_sum",
+    "snowfall_sum",
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "sunshine_duration",
+    "windspeed_10m_max",
+]
+
+# Multi-location requests: Open-Meteo accepts comma-separated coordinate lists.
+# Every location-day still counts against the API quota, so the batch size
+# starts small, halves on each 429 and grows back by one per successful batch.
+OPEN_METEO_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", "10"))
+OPEN_METEO_MAX_BATCH_SIZE = int(os.getenv("OPEN_METEO_MAX_BATCH_SIZE", "50"))
+
+def _daily_frame(data, latitude, longitude):
+    """Builds the daily DataFrame of one location object of an Open-Meteo response."""
+    if 'daily' not in data or not data['daily'].get('time'):
+        print(f"Warning: 'daily' data not found or empty in weather response for {latitude},{longitude}.")
+        return pd.DataFrame()
+
+    df = pd.DataFrame(data['daily'])
+    df['time'] = pd.to_datetime(df['time'])
+    df.set_index('time', inplace=True)
+    # The grid cell Open-Meteo snapped the request to.
+    df.attrs.update({key: data[key] for key in ("latitude", "longitude", "elevation") if key in data})
+    return df
+
+def fetch_open_meteo_weather_data(latitude, longitude, start_date, end_date, retries=5, backoff_factor=20, elevation=None,
+                                  fail_fast=False):
+    """
+    Fetches historical weather data from Open-Meteo with retry logic.
+    `elevation` overrides the elevation used for downscaling (default: the site's own).
+    With `fail_fast`, a 429 raises RateLimitedError instead of sleeping and retrying.
+    """
     weather_params = {
         "latitude": latitude,
         "longitude": longitude,
         "start_date": start_date,
         "end_date": end_date,
-        "daily": [
-            "precipitation_sum",
-            "snowfall_sum",
-            "temperature_2m_max",
-            "temperature_2m_min",
-            "sunshine_duration",
-            "windspeed_10m_max",
-        ],
+        "daily": DAILY_VARIABLES,
         "timezone": "UTC"
     }
+    if elevation is not None:
+        weather_params["elevation"] = elevation
     for attempt in range(retries):
         try:
             response = requests.get(BASE_URL_HISTORICAL_WEATHER, params=weather_params)
             response.raise_for_status()
-            data = response.json()
-
-            if 'daily' not in data or not data['daily'].get('time'):
-                print(f"Warning: 'daily' data not found or empty in weather response for {latitude},{longitude}.")
-                return pd.DataFrame()
-
-            df = pd.DataFrame(data['daily'])
-            df['time'] = pd.to_datetime(df['time'])
-            df.set_index('time', inplace=True)
-            return df
+            return _daily_frame(response.json(), latitude, longitude)
         except requests.exceptions.RequestException as e:
             if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 429:
+                if fail_fast:
+                    raise RateLimitedError("open_meteo", _retry_after_seconds(e.response, None))
                 wait = backoff_factor * (2 ** attempt)
                 print(f"Rate limited. Retrying in {wait} seconds...")
                 time.sleep(wait)
@@ -63,60 +94,276 @@ def fetch_open_meteo_weather_data(latitude, longitude, start_date, end_date, ret
     print(f"Failed to fetch weather data for {latitude},{longitude} after {retries} retries.")
     return pd.DataFrame()
 
-def get_climate_data(latitude, longitude):
+class AdaptiveBatchSize:
+    """Additive-increase/multiplicative-decrease batch size, shared by all batch fetches in the process."""
+
+    def __init__(self, initial=OPEN_METEO_BATCH_SIZE, maximum=OPEN_METEO_MAX_BATCH_SIZE):
+        self.maximum = max(1, maximum)
+        self.size = max(1, min(initial, self.maximum))
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            return self.size
+
+    def on_success(self):
+        with self._lock:
+            self.size = min(self.maximum, self.size + 1)
+
+    def on_rate_limited(self):
+        with self._lock:
+            self.size = max(1, self.size // 2)
+            return self.size
+
+_batch_size = AdaptiveBatchSize()
+
+def _retry_after_seconds(response, default):
+    try:
+        return max(1.0, float(response.headers.get("Retry-After")))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+def fetch_open_meteo_weather_data_batch(locations, start_date, end_date, retries=5, backoff_factor=20, fail_fast=False,
+                                        elevations=None):
     """
-    Calculates climatological averages for a given location.
+    Fetches historical weather data for many locations with multi-location requests.
+
+    Locations are sent in batches of the current adaptive batch size. A 429
+    halves the batch size and retries the same locations after the server's
+    Retry-After (or an exponential backoff); each successful batch grows it
+    by one. A batch that fails for any other reason yields empty frames.
+    With `fail_fast`, a 429 still halves the batch size but then raises
+    RateLimitedError with the frames fetched so far as `partial`.
+
+    Args:
+        locations (list): (latitude, longitude) pairs.
+        elevations (list, optional): Elevation per location for the statistical downscaling,
+            as for fetch_open_meteo_weather_data. Defaults to the API's digital elevation model.
+
+    Returns:
+        list: One DataFrame per location, in order (empty on failure), like fetch_open_meteo_weather_data.
     """
-    weather_df = fetch_open_meteo_weather_data(latitude, longitude, START_DATE_STR, END_DATE_STR)
+    frames = [pd.DataFrame() for _ in locations]
+    position = 0
+    rate_limited = 0
+    while position < len(locations):
+        batch = locations[position:position + _batch_size.current()]
+        weather_params = {
+            "latitude": ",".join(str(lat) for lat, _ in batch),
+            "longitude": ",".join(str(lon) for _, lon in batch),
+            "start_date": start_date,
+            "end_date": end_date,
+            "daily": DAILY_VARIABLES,
+            "timezone": "UTC"
+        }
+        if elevations is not None:
+            weather_params["elevation"] = ",".join(str(elevation) for elevation in elevations[position:position + len(batch)])
+        try:
+            response = requests.get(BASE_URL_HISTORICAL_WEATHER, params=weather_params)
+            response.raise_for_status()
+            data = response.json()
+            # A single location comes back as an object, several as a list.
+            results = data if isinstance(data, list) else [data]
+            if len(results) != len(batch):
+                raise ValueError(f"expected {len(batch)} locations in the response, got {len(results)}")
+            for offset, (result, (lat, lon)) in enumerate(zip(results, batch)):
+                frames[position + offset] = _daily_frame(result, lat, lon)
+        except requests.exceptions.RequestException as e:
+            if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code == 429:
+                if fail_fast:
+                    _batch_size.on_rate_limited()
+                    raise RateLimitedError("open_meteo", _retry_after_seconds(e.response, None), partial=frames)
+                rate_limited += 1
+                if rate_limited > retries:
+                    print(f"Failed to fetch weather data after {retries} rate-limited retries; "
+                          f"skipping {len(locations) - position} location(s).")
+                    break
+                new_size = _batch_size.on_rate_limited()
+                wait = _retry_after_seconds(e.response, backoff_factor * (2 ** (rate_limited - 1)))
+                print(f"Rate limited. Batch size now {new_size}; retrying in {wait:.0f} seconds...")
+                time.sleep(wait)
+                continue
+            print(f"Error fetching weather data for {len(batch)} location(s): {e}")
+        except (KeyError, ValueError) as e:
+            print(f"Error processing weather data for {len(batch)} location(s): {e}")
+        else:
+            rate_limited = 0
+            _batch_size.on_success()
+        position += len(batch)
+    return frames
 
-    if weather_df.empty:
-        return None
+CLIMATE_METRICS = [
+    "total_precipitation_mm",
+    "rainy_days",
+    "total_snowfall_cm",
+    "snowy_days",
+    "days_below_freezing",
+    "total_sunshine_hours",
+    "days_pleasant_temp",
+    "avg_daily_max_windspeed_ms",
+]
 
-    annual_metrics_list = []
-    for year_val in range(START_YEAR, END_YEAR + 1):
-        year_df = weather_df[weather_df.index.year == year_val]
+def _column(weather_df, name):
+    if name in weather_df.columns:
+        return pd.to_numeric(weather_df[name], errors='coerce').to_numpy(dtype=np.float64)
+    return np.full(len(weather_df), np.nan)
 
-        if year_df.empty:
-            annual_metrics_list.append({"year": year_val})
-            continue
+def climatology_from_daily(weather_df, start_year=START_YEAR, end_year=END_YEAR):
+    """
+    Averages annual weather metrics over the years in [start_year, end_year] that have data.
+
+    All years are aggregated in one pass with np.bincount over the year of
+    each day; missing values count as zero in sums and never meet a threshold,
+    and years without any rows are left out of the averages. Metrics whose
+    variable has no value at all in the period (e.g. sunshine from a provider
+    that does not report it) are NaN rather than zero.
 
-        total_precipitation = year_df['precipitation_sum'].sum(skipna=True)
-        rainy_days = (year_df['precipitation_sum'] > RAIN_DAY_THRESHOLD_MM).sum()
-        total_snowfall = year_df['snowfall_sum'].sum(skipna=True)
-        snowy_days = (year_df['snowfall_sum'] > SNOW_DAY_THRESHOLD_CM).sum()
-        days_below_freezing = (year_df['temperature_2m_min'] < FREEZING_THRESHOLD_C).sum()
-        total_sunshine_hours = year_df['sunshine_duration'].sum(skipna=True) / 3600.0
-
-        year_df_copy = year_df.copy()
-        year_df_copy.loc[:, 'temp_avg_approx'] = (year_df_copy['temperature_2m_min'] + year_df_copy['temperature_2m_max']) / 2
-        days_pleasant_temp = (
-            (year_df_copy['temp_avg_approx'] >= PLEASANT_TEMP_MIN_C) &
-            (year_df_copy['temp_avg_approx'] <= PLEASANT_TEMP_MAX_C)
-        ).sum()
-
-        avg_daily_max_windspeed_ms = year_df['windspeed_10m_max'].mean(skipna=True)
-
-        annual_metrics_list.append({
-            "year": year_val,
-            "total_precipitation_mm": total_precipitation,
-            "rainy_days": rainy_days,
-            "total_snowfall_cm": total_snowfall,
-            "snowy_days": snowy_days,
-            "days_below_freezing": days_below_freezing,
-            "total_sunshine_hours": total_sunshine_hours,
-            "days_pleasant_temp": days_pleasant_temp,
-            "avg_daily_max_windspeed_ms": avg_daily_max_windspeed_ms,
-        })
-
-    if not annual_metrics_list:
+    Returns:
+        dict: CLIMATE_METRICS -> climatological average, or None if no day falls in the period.
+    """
+    if weather_df is None or weather_df.empty:
         return None
 
-    annual_metrics_df = pd.DataFrame(annual_metrics_list)
-    if annual_metrics_df.empty or annual_metrics_df.drop(columns=['year']).isnull().all().all():
+    years = pd.DatetimeIndex(weather_df.index).year.to_numpy()
+    in_period = (years >= start_year) & (years <= end_year)
+    if not in_period.any():
         return None
+    year_idx = years[in_period] - start_year
+    n_years = end_year - start_year + 1
+
+    def per_year_sum(values):
+        return np.bincount(year_idx, weights=np.nan_to_num(values[in_period], nan=0.0), minlength=n_years)
+
+    def per_year_count(mask):
+        return np.bincount(year_idx, weights=mask[in_period], minlength=n_years)
+
+    precipitation = _column(weather_df, 'precipitation_sum')
+    snowfall = _column(weather_df, 'snowfall_sum')
+    temp_min = _column(weather_df, 'temperature_2m_min')
+    temp_max = _column(weather_df, 'temperature_2m_max')
+    windspeed = _column(weather_df, 'windspeed_10m_max')
+    sunshine = _column(weather_df, 'sunshine_duration')
+    temp_avg_approx = (temp_min + temp_max) / 2
+
+    # NaN compares False, so missing days never count towards a threshold.
+    with np.errstate(invalid='ignore'):
+        annual = {
+            "total_precipitation_mm": per_year_sum(precipitation),
+            "rainy_days": per_year_count(precipitation > RAIN_DAY_THRESHOLD_MM),
+            "total_snowfall_cm": per_year_sum(snowfall),
+            "snowy_days": per_year_count(snowfall > SNOW_DAY_THRESHOLD_CM),
+            "days_below_freezing": per_year_count(temp_min < FREEZING_THRESHOLD_C),
+            "total_sunshine_hours": per_year_sum(sunshine) / 3600.0,
+            "days_pleasant_temp": per_year_count(
+                (temp_avg_approx >= PLEASANT_TEMP_MIN_C) & (temp_avg_approx <= PLEASANT_TEMP_MAX_C)
+            ),
+        }
+        wind_days = per_year_count(~np.isnan(windspeed))
+        annual["avg_daily_max_windspeed_ms"] = np.where(
+            wind_days > 0, per_year_sum(windspeed) / np.maximum(wind_days, 1), np.nan
+        )
+
+    reported = {name: not np.isnan(values[in_period]).all() for name, values in (
+        ("precipitation", precipitation), ("snowfall", snowfall), ("temp_min", temp_min),
+        ("temp_avg", temp_avg_approx), ("sunshine", sunshine), ("windspeed", windspeed),
+    )}
+    metric_sources = {
+        "total_precipitation_mm": "precipitation",
+        "rainy_days": "precipitation",
+        "total_snowfall_cm": "snowfall",
+        "snowy_days": "snowfall",
+        "days_below_freezing": "temp_min",
+        "total_sunshine_hours": "sunshine",
+        "days_pleasant_temp": "temp_avg",
+        "avg_daily_max_windspeed_ms": "windspeed",
+    }
+
+    has_data = np.bincount(year_idx, minlength=n_years) > 0
+    climatological_averages = {}
+    for metric in CLIMATE_METRICS:
+        if not reported[metric_sources[metric]]:
+            climatological_averages[metric] = np.nan
+            continue
+        values = annual[metric][has_data]
+        values = values[~np.isnan(values)]
+        climatological_averages[metric] = float(values.mean()) if values.size else np.nan
+    return climatological_averages
 
-    climatological_averages = annual_metrics_df.drop(columns=['year']).mean(skipna=True)
-    return climatological_averages.to_dict()
+def get_daily_weather(latitude, longitude, start_date=START_DATE_STR, end_date=END_DATE_STR, fail_fast=False):
+    """
+    Returns the daily series for a location over [start_date, end_date], one row per day.
+
+    Served from the per-cell store in climate/grid_cache.py: when the site's
+    grid cell is stored, only the days before or after its stored range are
+    requested (at the cell's own coordinates and elevation, so they land in the
+    same cell), so refreshing a rolling window costs a few days per site.
+    """
+    def fetch(lat, lon, start, end, elevation=None):
+        return fetch_open_meteo_weather_data(lat, lon, start, end, elevation=elevation, fail_fast=fail_fast)
+
+    cache = get_grid_climate_cache()
+    if cache is None:
+        return fetch(latitude, longitude, start_date, end_date)
+    return cache.get_or_fetch(latitude, longitude, start_date, end_date, fetch)
+
+def get_climate_data(latitude, longitude):
+    """
+    Calculates climatological averages for a given location.
+    """
+    weather_df = get_daily_weather(latitude, longitude)
+    return climatology_from_daily(weather_df)
+
+
+def get_daily_weather_batch(locations, start_date=START_DATE_STR, end_date=END_DATE_STR, fail_fast=False):
+    """
+    get_daily_weather() for many locations, with multi-location requests.
+
+    Incremental like get_daily_weather(): sites whose grid cell is stored only
+    request the cell's missing days (see GridClimateCache.get_or_fetch_many),
+    and new sites are fetched in full and added to the cache.
+
+    With `fail_fast`, a 429 raises RateLimitedError whose `partial` is the
+    list of frames (empty where not fetched), after caching what was fetched.
+
+    Args:
+        locations (list): (latitude, longitude) pairs.
+
+    Returns:
+        list: One daily DataFrame per location, in order (empty on failure).
+    """
+    rate_limited = None
+
+    def fetch_many(batch_locations, start, end, elevations=None):
+        # After a 429 the remaining requests are skipped and reported through `partial`.
+        nonlocal rate_limited
+        if rate_limited is not None:
+            return [pd.DataFrame() for _ in batch_locations]
+        try:
+            return fetch_open_meteo_weather_data_batch(batch_locations, start, end, fail_fast=fail_fast,
+                                                       elevations=elevations)
+        except RateLimitedError as e:
+            rate_limited = e
+            return e.partial
+
+    cache = get_grid_climate_cache()
+    if cache is None:
+        frames = fetch_many(locations, start_date, end_date)
+    else:
+        frames = cache.get_or_fetch_many(locations, start_date, end_date, fetch_many)
+
+    if rate_limited is not None:
+        rate_limited.partial = frames
+        raise rate_limited
+    return frames
+
+def get_climate_data_batch(locations):
+    """
+    get_climate_data() for many locations (see get_daily_weather_batch).
+
+    Returns:
+        list: One climatological averages dict (or None) per location, in order.
+    """
+    return [climatology_from_daily(weather_df) for weather_df in get_daily_weather_batch(locations)]
 
 
 if __name__ == "__main__":
@@ -2,12 +2,16 @@ import pandas as pd
 import os
 import csv
 import sys
-import time
 
 # Add the project root to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from climate.open_meteo import get_climate_data
+from climate.providers import get_climate_data_batch
+from climate.grid_cache import get_grid_climate_cache
+
+# Rows written to the CSV per batch call; Open-Meteo requests inside a chunk
+# are sized adaptively, and sites move to the next provider while one throttles.
+CHUNK_SIZE = 100
 
 def process_data(start_index, end_index):
     excel_file_path = 'climate/unscaled_clean_dataset.xlsx'
@@ -27,7 +31,7 @@ def process_data(start_index, end_index):
         'full_site_address', 'Latitude', 'Longitude',
         'total_precipitation_mm', 'rainy_days', 'total_snowfall_cm', 'snowy_days',
         'days_below_freezing', 'total_sunshine_hours', 'days_pleasant_temp',
-        'avg_daily_max_windspeed_ms'
+        'avg_daily_max_windspeed_ms', 'climate_provider'
     ]
     
     # Prepare CSV file
@@ -36,47 +40,53 @@ def process_data(start_index, end_index):
         with open(output_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
-
-
-    for index, row in df.iloc[start_index:end_index].iterrows():
-        time.sleep(30) # Add a 1-second delay to avoid rate limiting
-        full_site_address = row['full_site_address']
-        latitude = row['Latitude']
-        longitude = row['Longitude']
-
-        print(f"--- Processing record {index}: {full_site_address} ---")
+    else:
+        with open(output_csv_path, newline='', encoding='utf-8') as csvfile:
+            existing_fieldnames = next(csv.reader(csvfile), [])
+        if 'climate_provider' not in existing_fieldnames:
+            # Rows must keep the columns of the file they are appended to.
+            print(f"Warning: {output_csv_path} has no climate_provider column; rows are appended without it.")
+            fieldnames = existing_fieldnames
+
+
+    # Sites are processed in chunks: cached grid cells are answered locally, the
+    # rest go to Open-Meteo as multi-location requests, and NASA POWER takes
+    # over while Open-Meteo is rate limiting (see providers.py). The two differ
+    # in grid and biases and POWER has no sunshine duration, so each row
+    # records its source in climate_provider.
+    records = df.iloc[start_index:end_index]
+    for chunk_start in range(0, len(records), CHUNK_SIZE):
+        chunk = records.iloc[chunk_start:chunk_start + CHUNK_SIZE]
+        print(f"--- Processing records {chunk.index[0]}-{chunk.index[-1]} ---")
 
         try:
-            climate_data = get_climate_data(latitude, longitude)
-            
-            output_row = {
-                'full_site_address': full_site_address,
-                'Latitude': latitude,
-                'Longitude': longitude,
-            }
-
-            if climate_data:
-                output_row.update(climate_data)
-            else:
-                for key in fieldnames[3:]:
-                    output_row[key] = 'ERROR'
-
-
+            climate_results = get_climate_data_batch(list(zip(chunk['Latitude'], chunk['Longitude'])))
         except Exception as e:
             print(f"  - An unexpected error occurred: {e}")
-            output_row = {
-                'full_site_address': full_site_address,
-                'Latitude': latitude,
-                'Longitude': longitude,
-            }
-            for key in fieldnames[3:]:
-                output_row[key] = 'ERROR'
-
+            climate_results = [None] * len(chunk)
 
         with open(output_csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writerow(output_row)
-            print(f"  - Successfully processed and saved to CSV.")
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+            for (index, row), climate_data in zip(chunk.iterrows(), climate_results):
+                output_row = {
+                    'full_site_address': row['full_site_address'],
+                    'Latitude': row['Latitude'],
+                    'Longitude': row['Longitude'],
+                }
+
+                if climate_data:
+                    output_row.update(climate_data)
+                else:
+                    print(f"  - Record {index} ({row['full_site_address']}): no climate data")
+                    for key in fieldnames[3:]:
+                        output_row[key] = 'ERROR' if key != 'climate_provider' else None
+                writer.writerow(output_row)
+        print(f"  - Successfully processed {len(chunk)} record(s) and saved to CSV.")
+
+    cache = get_grid_climate_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Climate grid cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%}), {stats['cells']} cells cached")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,292 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from climate import nasa_power, open_meteo
+from climate.open_meteo import climatology_from_daily, START_DATE_STR, END_DATE_STR
+from climate.grid_cache import get_grid_climate_cache, CLIMATE_CACHE_DIR
+from common.rate_limiter import RateLimitedError
+
+# Providers in order of preference; all return the same normalized daily frame
+# (open_meteo.DAILY_VARIABLES columns in Open-Meteo's units, indexed by day).
+CLIMATE_PROVIDERS = [name.strip() for name in os.getenv("CLIMATE_PROVIDERS", "open_meteo,nasa_power").split(",") if name.strip()]
+# "fallback": try providers in order, skipping any that is rate limiting.
+# "race": query every available provider at once and keep the first answer.
+CLIMATE_PROVIDER_MODE = os.getenv("CLIMATE_PROVIDER_MODE", "fallback")
+# Seconds a provider is skipped after a 429 that carried no Retry-After.
+DEFAULT_COOLDOWN_SECONDS = float(os.getenv("CLIMATE_PROVIDER_COOLDOWN_SECONDS", "60"))
+NASA_POWER_WORKERS = int(os.getenv("NASA_POWER_WORKERS", "4"))
+# Rounds of waiting for a provider's cooldown before a batch gives up on the remaining sites.
+MAX_BATCH_ROUNDS = 5
+
+
+class ClimateProvider:
+    """
+    A source of daily weather. Fetches fail fast: a 429 raises
+    RateLimitedError, and the provider is then skipped until its cooldown ends.
+    """
+
+    name = None
+    # Directory of the provider's grid cell store (climate/grid_cache.py), if it has one.
+    cache_dir = None
+
+    def __init__(self):
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def available(self):
+        with self._lock:
+            return time.monotonic() >= self._cooldown_until
+
+    def seconds_until_available(self):
+        with self._lock:
+            return max(0.0, self._cooldown_until - time.monotonic())
+
+    def cool_down(self, seconds=None):
+        with self._lock:
+            self._cooldown_until = time.monotonic() + (seconds or DEFAULT_COOLDOWN_SECONDS)
+
+    def cached_daily(self, latitude, longitude, start_date, end_date):
+        """Returns the daily frame from the provider's local store without any request, or None."""
+        cache = get_grid_climate_cache(self.cache_dir) if self.cache_dir else None
+        cell = cache.find_cell(latitude, longitude) if cache is not None else None
+        if cell is None or cache.missing_ranges(cell, start_date, end_date):
+            return None
+        return cache.read(latitude, longitude, cell, start_date, end_date)
+
+    def fetch_daily(self, latitude, longitude, start_date, end_date):
+        """Returns the normalized daily frame for one location (empty on failure)."""
+        raise NotImplementedError
+
+    def fetch_daily_batch(self, locations, start_date, end_date):
+        """
+        Returns one normalized daily frame per location. On a 429 raises
+        RateLimitedError whose `partial` holds the frames fetched so far.
+        """
+        frames = []
+        for latitude, longitude in locations:
+            try:
+                frames.append(self.fetch_daily(latitude, longitude, start_date, end_date))
+            except RateLimitedError as e:
+                e.partial = frames + [pd.DataFrame()] * (len(locations) - len(frames))
+                raise
+        return frames
+
+
+class OpenMeteoProvider(ClimateProvider):
+    """Open-Meteo archive, through the incremental grid cell store and multi-location requests."""
+
+    name = "open_meteo"
+    cache_dir = CLIMATE_CACHE_DIR
+
+    def fetch_daily(self, latitude, longitude, start_date, end_date):
+        return open_meteo.get_daily_weather(latitude, longitude, start_date, end_date, fail_fast=True)
+
+    def fetch_daily_batch(self, locations, start_date, end_date):
+        return open_meteo.get_daily_weather_batch(locations, start_date, end_date, fail_fast=True)
+
+
+class NasaPowerProvider(ClimateProvider):
+    """NASA POWER daily point API (one location per request, fetched concurrently)."""
+
+    name = "nasa_power"
+    cache_dir = nasa_power.NASA_POWER_CACHE_DIR
+
+    def fetch_daily(self, latitude, longitude, start_date, end_date):
+        return nasa_power.get_daily_weather(latitude, longitude, start_date, end_date, fail_fast=True)
+
+    def fetch_daily_batch(self, locations, start_date, end_date):
+        frames = [pd.DataFrame() for _ in locations]
+        rate_limited = None
+        with ThreadPoolExecutor(max_workers=max(1, min(NASA_POWER_WORKERS, len(locations)))) as executor:
+            futures = {
+                executor.submit(self.fetch_daily, latitude, longitude, start_date, end_date): i
+                for i, (latitude, longitude) in enumerate(locations)
+            }
+            for future in as_completed(futures):
+                try:
+                    frames[futures[future]] = future.result()
+                except RateLimitedError as e:
+                    rate_limited = e
+        if rate_limited is not None:
+            rate_limited.partial = frames
+            raise rate_limited
+        return frames
+
+
+PROVIDER_CLASSES = {
+    OpenMeteoProvider.name: OpenMeteoProvider,
+    NasaPowerProvider.name: NasaPowerProvider,
+}
+
+_providers = None
+_providers_lock = threading.Lock()
+
+
+def get_providers():
+    """Returns the process-wide provider instances named in CLIMATE_PROVIDERS, in order."""
+    global _providers
+    with _providers_lock:
+        if _providers is None:
+            unknown = [name for name in CLIMATE_PROVIDERS if name not in PROVIDER_CLASSES]
+            if unknown:
+                raise ValueError(f"Unknown climate provider(s) in CLIMATE_PROVIDERS: {', '.join(unknown)}")
+            _providers = [PROVIDER_CLASSES[name]() for name in CLIMATE_PROVIDERS]
+        return _providers
+
+
+def _cached_daily(latitude, longitude, start_date, end_date):
+    """A stored frame from any provider, tagged with its name; stored data is used even while its provider throttles."""
+    for provider in get_providers():
+        weather_df = provider.cached_daily(latitude, longitude, start_date, end_date)
+        if weather_df is not None and not weather_df.empty:
+            weather_df.attrs["provider"] = provider.name
+            return weather_df
+    return None
+
+
+def _cool_down_if_rate_limited(provider):
+    """Future callback that cools `provider` down if its fetch hit a 429, even after the race was decided."""
+    def callback(future):
+        if not future.cancelled() and isinstance(future.exception(), RateLimitedError):
+            provider.cool_down(future.exception().retry_after)
+    return callback
+
+
+def _fetch_tagged(provider, latitude, longitude, start_date, end_date):
+    weather_df = provider.fetch_daily(latitude, longitude, start_date, end_date)
+    weather_df.attrs["provider"] = provider.name
+    return weather_df
+
+
+def get_daily_weather(latitude, longitude, start_date=START_DATE_STR, end_date=END_DATE_STR, mode=None):
+    """
+    Returns the normalized daily frame for a location from the first provider
+    that answers, with the provider's name in attrs["provider"].
+
+    In "fallback" mode providers are tried in order; in "race" mode all
+    available providers are queried at once and the first non-empty answer
+    wins (the others finish in the background, still filling their caches,
+    and a 429 from one of them still cools it down). Providers that are rate
+    limiting are skipped until their cooldown ends.
+
+    Returns:
+        DataFrame: The daily frame, or an empty frame if no provider had data.
+    """
+    mode = mode or CLIMATE_PROVIDER_MODE
+    cached = _cached_daily(latitude, longitude, start_date, end_date)
+    if cached is not None:
+        return cached
+    providers = [provider for provider in get_providers() if provider.available()] or get_providers()[:1]
+
+    if mode == "race" and len(providers) > 1:
+        executor = ThreadPoolExecutor(max_workers=len(providers))
+        futures = []
+        for provider in providers:
+            future = executor.submit(_fetch_tagged, provider, latitude, longitude, start_date, end_date)
+            future.add_done_callback(_cool_down_if_rate_limited(provider))
+            futures.append(future)
+        try:
+            for future in as_completed(futures):
+                try:
+                    weather_df = future.result()
+                except RateLimitedError:
+                    continue
+                if not weather_df.empty:
+                    return weather_df
+        finally:
+            executor.shutdown(wait=False)
+        return pd.DataFrame()
+
+    for provider in providers:
+        try:
+            weather_df = _fetch_tagged(provider, latitude, longitude, start_date, end_date)
+        except RateLimitedError as e:
+            print(f"Climate provider {provider.name} is rate limiting; trying the next one.")
+            provider.cool_down(e.retry_after)
+            continue
+        if not weather_df.empty:
+            return weather_df
+    return pd.DataFrame()
+
+
+def get_daily_weather_batch(locations, start_date=START_DATE_STR, end_date=END_DATE_STR):
+    """
+    Normalized daily frames for many locations. Each provider in turn gets
+    the locations still missing; a provider that starts rate limiting hands
+    the rest to the next one and is retried once its cooldown ends, so the
+    batch keeps going while one provider throttles.
+
+    Returns:
+        list: One daily frame per location, in order (empty where no provider had data).
+    """
+    frames = [pd.DataFrame() for _ in locations]
+    providers = get_providers()
+    # Providers that gave a (possibly empty) answer for each site, as opposed to being rate limited.
+    attempted = [set() for _ in locations]
+    pending = []
+    for i, (latitude, longitude) in enumerate(locations):
+        cached = _cached_daily(latitude, longitude, start_date, end_date)
+        if cached is not None:
+            frames[i] = cached
+        else:
+            pending.append(i)
+
+    for _ in range(MAX_BATCH_ROUNDS):
+        for provider in providers:
+            todo = [i for i in pending if provider.name not in attempted[i]]
+            if not todo or not provider.available():
+                continue
+            try:
+                results = provider.fetch_daily_batch([locations[i] for i in todo], start_date, end_date)
+                answered = todo
+            except RateLimitedError as e:
+                print(f"Climate provider {provider.name} is rate limiting; handing the remaining sites to the next provider.")
+                provider.cool_down(e.retry_after)
+                results = e.partial or []
+                answered = [i for i, weather_df in zip(todo, results) if not weather_df.empty]
+            for i, weather_df in zip(todo, results):
+                if not weather_df.empty:
+                    weather_df.attrs["provider"] = provider.name
+                    frames[i] = weather_df
+            for i in answered:
+                attempted[i].add(provider.name)
+            pending = [i for i in pending if frames[i].empty]
+
+        # Sites every provider answered without data are given up on.
+        pending = [i for i in pending if len(attempted[i]) < len(providers)]
+        cooling = [provider.seconds_until_available() for provider in providers if not provider.available()]
+        if not pending or not cooling:
+            break
+        wait = min(cooling)
+        print(f"Climate providers are rate limiting; waiting {wait:.0f} seconds for {len(pending)} site(s)...")
+        time.sleep(wait)
+    return frames
+
+
+def _climatology_with_provider(weather_df):
+    """climatology_from_daily plus the "climate_provider" the daily data came from."""
+    climate_data = climatology_from_daily(weather_df)
+    if climate_data is not None:
+        climate_data["climate_provider"] = weather_df.attrs.get("provider")
+    return climate_data
+
+
+def get_climate_data(latitude, longitude, mode=None):
+    """
+    Climatological averages for a location, from whichever provider answers
+    (see get_daily_weather), with the provider's name under "climate_provider".
+    """
+    return _climatology_with_provider(get_daily_weather(latitude, longitude, mode=mode))
+
+
+def get_climate_data_batch(locations):
+    """Climatological averages for many locations, each with its "climate_provider" (see get_daily_weather_batch)."""
+    return [_climatology_with_provider(weather_df) for weather_df in get_daily_weather_batch(locations)]
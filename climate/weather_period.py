@@ -1,45 +1,31 @@
-import requests
-from datetime import datetime, timedelta
+import os
 import sys
+from datetime import datetime, timedelta
 
-# --- Configuration ---
-BASE_URL_HISTORICAL_WEATHER = "https://archive-api.open-meteo.com/v1/archive"
-
-def fetch_weather_data(latitude, longitude, start_date, end_date):
-    """Fetches historical weather data from Open-Meteo."""
-    weather_params = {
-        "latitude": latitude,
-        "longitude": longitude,
-        "start_date": start_date,
-        "end_date": end_date,
-        "daily": [
-            "precipitation_sum",
-            "snowfall_sum",
-            "temperature_2m_max",
-            "temperature_2m_min",
-            "sunshine_duration",
-            "windspeed_10m_max",
-        ],
-        "timezone": "UTC"
-    }
+import pandas as pd
 
-    try:
-        response = requests.get(BASE_URL_HISTORICAL_WEATHER, params=weather_params)
-        response.raise_for_status()
-        data = response.json()
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-        if 'daily' not in data or not data['daily'].get('time'):
-            print(f"Warning: No daily data found in response.")
-            return None
+from climate.open_meteo import get_daily_weather, DAILY_VARIABLES
 
-        return data['daily']
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching weather data: {e}")
-        return None
-    except (KeyError, ValueError) as e:
-        print(f"Error processing weather data: {e}")
+def fetch_weather_data(latitude, longitude, start_date, end_date):
+    """
+    Returns historical daily weather as Open-Meteo's 'daily' dict of lists
+    (None for missing values). Served from the incremental per-cell store, so
+    only days not stored yet are requested from Open-Meteo.
+    """
+    weather_df = get_daily_weather(latitude, longitude, start_date, end_date)
+    if weather_df is None or weather_df.empty:
+        print(f"Warning: No daily data found in response.")
         return None
 
+    daily = {"time": [t.strftime("%Y-%m-%d") for t in weather_df.index]}
+    for variable in DAILY_VARIABLES:
+        values = weather_df[variable] if variable in weather_df.columns else pd.Series(index=weather_df.index, dtype=float)
+        daily[variable] = [None if pd.isna(v) else float(v) for v in values]
+    return daily
+
 def get_weather_averages(latitude, longitude, last_n_days):
     """
     Fetches weather data for the last n days and calculates verbose averages.
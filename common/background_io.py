@@ -0,0 +1,57 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Persist images fetched on the online API path. Writes happen on a background
+# thread after the bytes are already in use, so they never add request latency.
+PERSIST_API_IMAGES = os.getenv("PERSIST_API_IMAGES", "1").lower() not in ("0", "false", "no")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One writer keeps writes to the same folder (and its manifest) ordered.
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="background-io")
+            atexit.register(_executor.shutdown, wait=True)
+        return _executor
+
+
+def write_file_atomic(path, data):
+    """Writes `data` to `path` through a temporary file, creating parent folders as needed."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _run_logged(fn, args):
+    try:
+        fn(*args)
+    except Exception as e:
+        print(f"Background write failed in {getattr(fn, '__name__', fn)}: {e}")
+
+
+def run_in_background(fn, *args):
+    """
+    Queues `fn(*args)` on the background writer. Errors are printed, never raised
+    to the caller; pending work is finished at interpreter exit.
+
+    Returns:
+        Future: Completes when the work has run.
+    """
+    return _get_executor().submit(_run_logged, fn, args)
+
+
+def write_file_async(path, data):
+    """Queues write_file_atomic(path, data) on the background writer."""
+    return run_in_background(write_file_atomic, path, data)
@@ -0,0 +1,105 @@
+import json
+import math
+import os
+import sys
+import tempfile
+from unittest import mock
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURE_OSM = os.path.join(FIXTURE_DIR, 'osm_store_fixture.osm')
+FIXTURE_OVERPASS = os.path.join(FIXTURE_DIR, 'osm_store_overpass.json')
+
+
+class _OverpassResponse:
+    """Stands in for the requests response of one recorded Overpass query."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def _same_lights(local, overpass):
+    return [light['id'] for light in local] == [light['id'] for light in overpass] and all(
+        light['tags'] == other['tags'] and math.isclose(light['distance_miles'], other['distance_miles'], abs_tol=1e-9)
+        for light, other in zip(local, overpass)
+    )
+
+
+def _same_roads(local, overpass):
+    return [road['id'] for road in local] == [road['id'] for road in overpass] and all(
+        road[key] == other[key] if isinstance(road[key], (str, int)) else math.isclose(road[key], other[key], abs_tol=1e-9)
+        for road, other in zip(local, overpass) for key in road
+    )
+
+
+def check_osm_store():
+    """
+    Builds a local OSM store from the fixture extract and checks that the
+    backend="local" and backend="overpass" paths of the traffic light and
+    speed limit features return the same rows. The Overpass side is served
+    the responses recorded in fixtures/osm_store_overpass.json.
+
+    Returns:
+        list: Descriptions of the mismatches found (empty when everything matches).
+    """
+    with open(FIXTURE_OVERPASS) as f:
+        recorded = json.load(f)
+    lat, lon = recorded['center']['lat'], recorded['center']['lon']
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'osm_store.sqlite')
+        # get_osm_store() opens OSM_STORE_PATH, read when common.osm_store is first imported.
+        os.environ['OSM_STORE_PATH'] = db_path
+        sys.path.append(PROJECT_ROOT)
+        sys.path.append(os.path.join(PROJECT_ROOT, 'trafficLights'))
+        sys.path.append(os.path.join(PROJECT_ROOT, 'speedLimits'))
+        from common.osm_store import build_osm_store, get_osm_store
+        import nearby_traffic_lights
+        import speed_limits
+
+        build_osm_store(FIXTURE_OSM, db_path)
+        store = get_osm_store()
+
+        mismatches = []
+        for radius, response in recorded['traffic_signals'].items():
+            radius = float(radius)
+            expected_ids = sorted(element['id'] for element in response['elements'])
+            found_ids = [element['id'] for element in store.traffic_signals_around(lat, lon, radius)]
+            if found_ids != expected_ids:
+                mismatches.append(f"traffic_signals_around r={radius:g}: {found_ids} != {expected_ids}")
+
+            local = nearby_traffic_lights.get_nearby_traffic_lights(lat, lon, radius, backend='local')
+            with mock.patch.object(nearby_traffic_lights.requests, 'post', return_value=_OverpassResponse(response)):
+                overpass = nearby_traffic_lights.get_nearby_traffic_lights(lat, lon, radius, backend='overpass')
+            if not _same_lights(local, overpass):
+                mismatches.append(f"get_nearby_traffic_lights r={radius:g}: local and overpass backends differ")
+
+        for radius, response in recorded['maxspeed_ways'].items():
+            radius = float(radius)
+            expected_ids = sorted(element['id'] for element in response['elements'])
+            found_ids = [element['id'] for element in store.maxspeed_ways_around(lat, lon, radius)]
+            if found_ids != expected_ids:
+                mismatches.append(f"maxspeed_ways_around r={radius:g}: {found_ids} != {expected_ids}")
+
+            local = speed_limits.get_nearest_roads_with_speed(lat, lon, radius, backend='local')
+            with mock.patch.object(speed_limits.requests, 'post', return_value=_OverpassResponse(response)):
+                overpass = speed_limits.get_nearest_roads_with_speed(lat, lon, radius, backend='overpass')
+            if not _same_roads(local, overpass):
+                mismatches.append(f"get_nearest_roads_with_speed r={radius:g}: local and overpass backends differ")
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    problems = check_osm_store()
+    for problem in problems:
+        print(f"MISMATCH {problem}")
+    if problems:
+        sys.exit(1)
+    print("Local OSM store matches the recorded Overpass responses for the fixture extract.")
@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH", os.path.join(PROJECT_ROOT, "cache", "classification_cache.sqlite"))
+
+
+class ClassificationCache:
+    """
+    On-disk SQLite cache of model classification results.
+
+    Entries are grouped by `namespace` (one per classifier) and keyed by the
+    caller's normalized input plus a `version` string that identifies the
+    prompt and model. A lookup only matches its own version, so editing the
+    prompt or switching model never serves stale verdicts. Rows of other
+    versions are left alone, since another process may still be running
+    with different settings; purge_stale() removes them on request.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.hits = {}
+        self.misses = {}
+        self._purged = set()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS classification (
+                namespace TEXT NOT NULL,
+                cache_key TEXT NOT NULL,
+                version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, cache_key, version)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, namespace, cache_key, version, max_age_seconds=None):
+        """Returns the cached result dict, or None on a miss or if it is older than `max_age_seconds`."""
+        min_created_at = time.time() - max_age_seconds if max_age_seconds else 0
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM classification "
+                "WHERE namespace = ? AND cache_key = ? AND version = ? AND created_at >= ?",
+                (namespace, cache_key, version, min_created_at)
+            ).fetchone()
+            if row is None:
+                self.misses[namespace] = self.misses.get(namespace, 0) + 1
+                return None
+            self.hits[namespace] = self.hits.get(namespace, 0) + 1
+        return json.loads(row[0])
+
+    def set(self, namespace, cache_key, version, result):
+        """Stores a result for (namespace, cache_key, version)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO classification (namespace, cache_key, version, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, cache_key, version, json.dumps(result), time.time())
+            )
+            self._conn.commit()
+
+    def purge_stale(self, namespace, version):
+        """Deletes every entry of `namespace` written under a version other than `version` (once per process)."""
+        with self._lock:
+            if (namespace, version) in self._purged:
+                return 0
+            deleted = self._conn.execute(
+                "DELETE FROM classification WHERE namespace = ? AND version != ?", (namespace, version)
+            ).rowcount
+            self._conn.commit()
+            self._purged.add((namespace, version))
+        return deleted
+
+    def stats(self, namespace=None):
+        namespaces = [namespace] if namespace else sorted(set(self.hits) | set(self.misses))
+        hits = sum(self.hits.get(ns, 0) for ns in namespaces)
+        misses = sum(self.misses.get(ns, 0) for ns in namespaces)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_classification_cache():
+    """Returns the process-wide ClassificationCache, or None if CLASSIFICATION_CACHE_DISABLED is set."""
+    global _cache
+    if os.getenv("CLASSIFICATION_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ClassificationCache()
+        return _cache
@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+EARTH_RADIUS_METERS = 6371000
+
+
+def _is_missing(value):
+    if value is None:
+        return True
+    try:
+        return math.isnan(float(value))
+    except (TypeError, ValueError):
+        return True
+
+
+def calculate_distance(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS_MILES):
+    """
+    Calculate the distance between two points in miles (scalar fast path).
+
+    Returns None if any coordinate is missing (None/NaN/NA), like the
+    per-module geo_utils copies this replaces.
+    """
+    if _is_missing(lat1) or _is_missing(lon1) or _is_missing(lat2) or _is_missing(lon2):
+        return None
+
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2) - math.radians(lon1)
+
+    a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return radius * c
+
+
+def haversine_pairwise(lats1, lons1, lats2, lons2, radius=EARTH_RADIUS_MILES):
+    """
+    Element-wise distance between two equally shaped sets of points.
+
+    Args:
+        lats1, lons1, lats2, lons2 (array-like): Coordinates in degrees; broadcastable.
+        radius (float, optional): Earth radius in the desired output unit. Defaults to miles.
+
+    Returns:
+        np.ndarray: Distances; NaN where any input coordinate is NaN.
+    """
+    lat1_rad = np.radians(np.asarray(lats1, dtype=float))
+    lat2_rad = np.radians(np.asarray(lats2, dtype=float))
+    dlat = lat2_rad - lat1_rad
+    dlon = np.radians(np.asarray(lons2, dtype=float)) - np.radians(np.asarray(lons1, dtype=float))
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
+    return radius * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_one_to_many(lat, lon, lats, lons, radius=EARTH_RADIUS_MILES):
+    """
+    Distances from one point to many points.
+
+    Returns:
+        np.ndarray: 1-D array with one distance per (lats[i], lons[i]).
+    """
+    return haversine_pairwise(lat, lon, lats, lons, radius=radius)
+
+
+def haversine_many_to_many(lats1, lons1, lats2, lons2, radius=EARTH_RADIUS_MILES):
+    """
+    Distance matrix between two sets of points.
+
+    Returns:
+        np.ndarray: Array of shape (len(lats1), len(lats2)).
+    """
+    lats1 = np.asarray(lats1, dtype=float)[:, None]
+    lons1 = np.asarray(lons1, dtype=float)[:, None]
+    lats2 = np.asarray(lats2, dtype=float)[None, :]
+    lons2 = np.asarray(lons2, dtype=float)[None, :]
+    return haversine_pairwise(lats1, lons1, lats2, lons2, radius=radius)
+
+
+def polyline_distances(lat, lon, polylines, radius=EARTH_RADIUS_MILES):
+    """
+    Distance from one point to each of many polylines (e.g. OSM ways from an `out geom` response).
+
+    All segments of all polylines are processed in one vectorized pass in a
+    local equirectangular projection centred on the query point. This is an
+    approximation whose error grows with distance and latitude: against
+    haversine, the relative error is about 1e-4 at 2 miles and 45 degrees
+    latitude (0.3 m) and about 4e-4 at 5 miles and 60 degrees (3.4 m).
+
+    Args:
+        lat, lon (float): Query point in degrees.
+        polylines (list): One sequence of (lat, lon) vertices per polyline. A
+                          single-vertex polyline is treated as a point.
+        radius (float, optional): Earth radius in the desired output unit. Defaults to miles.
+
+    Returns:
+        dict: Arrays with one entry per polyline:
+              'distance' to the closest point on the polyline (NaN if it has no vertices),
+              'closest_lat' / 'closest_lon' of that point, and
+              'segment_index' of the segment containing it (-1 if no vertices).
+    """
+    n = len(polylines)
+    result = {
+        "distance": np.full(n, np.nan),
+        "closest_lat": np.full(n, np.nan),
+        "closest_lon": np.full(n, np.nan),
+        "segment_index": np.full(n, -1, dtype=np.int64),
+    }
+
+    starts_lat, starts_lon, ends_lat, ends_lon, owners, local_index = [], [], [], [], [], []
+    for owner, vertices in enumerate(polylines):
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+        if len(vertices) == 0:
+            continue
+        if len(vertices) == 1:
+            vertices = np.vstack([vertices, vertices])
+        starts_lat.append(vertices[:-1, 0])
+        starts_lon.append(vertices[:-1, 1])
+        ends_lat.append(vertices[1:, 0])
+        ends_lon.append(vertices[1:, 1])
+        owners.append(np.full(len(vertices) - 1, owner, dtype=np.int64))
+        local_index.append(np.arange(len(vertices) - 1, dtype=np.int64))
+
+    if not owners:
+        return result
+
+    starts_lat = np.concatenate(starts_lat)
+    starts_lon = np.concatenate(starts_lon)
+    ends_lat = np.concatenate(ends_lat)
+    ends_lon = np.concatenate(ends_lon)
+    owners = np.concatenate(owners)
+    local_index = np.concatenate(local_index)
+
+    # Project to a local plane (radians scaled by earth radius), query point at the origin.
+    cos_lat0 = math.cos(math.radians(lat))
+    ax = np.radians(starts_lon - lon) * cos_lat0 * radius
+    ay = np.radians(starts_lat - lat) * radius
+    bx = np.radians(ends_lon - lon) * cos_lat0 * radius
+    by = np.radians(ends_lat - lat) * radius
+
+    dx = bx - ax
+    dy = by - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length_sq > 0, -(ax * dx + ay * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    cx = ax + t * dx
+    cy = ay + t * dy
+    segment_distance = np.hypot(cx, cy)
+
+    # Closest segment per polyline: sort by (owner, distance) and take the first of each owner.
+    order = np.lexsort((segment_distance, owners))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = owners[order][1:] != owners[order][:-1]
+    best = order[first]
+    best_owner = owners[best]
+
+    result["distance"][best_owner] = segment_distance[best]
+    result["closest_lat"][best_owner] = lat + np.degrees(cy[best] / radius)
+    result["closest_lon"][best_owner] = lon + np.degrees(cx[best] / (radius * cos_lat0))
+    result["segment_index"][best_owner] = local_index[best]
+    return result
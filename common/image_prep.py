@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import math
+import os
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMAGE_PREP_CACHE_DIR = os.getenv("IMAGE_PREP_CACHE_DIR", os.path.join(PROJECT_ROOT, "cache", "image_prep"))
+JPEG_QUALITY = int(os.getenv("IMAGE_PREP_JPEG_QUALITY", "82"))
+# Total encoded image bytes allowed in one vision request (before base64).
+IMAGE_BYTE_BUDGET = int(os.getenv("IMAGE_PREP_BYTE_BUDGET", str(1500 * 1024)))
+# Qualities tried, in order, when a request is over its byte budget.
+FALLBACK_QUALITIES = (70, 55, 40)
+
+# OpenAI "high" detail: the image is fitted into 2048x2048, its short side
+# scaled down to 768, then billed per 512px tile plus a base cost.
+TILE_SIZE = 512
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+BASE_TOKENS = 85
+TOKENS_PER_TILE = 170
+# Downscale at most this much to drop a partially filled row/column of tiles.
+MIN_TILE_SNAP_SCALE = 0.8
+
+
+def estimate_image_tokens(width, height, detail="high"):
+    """Estimated prompt tokens for one image at the given detail level."""
+    if detail == "low":
+        return BASE_TOKENS
+    width, height = _high_detail_size(width, height)
+    tiles = math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+    return BASE_TOKENS + TOKENS_PER_TILE * tiles
+
+
+def _high_detail_size(width, height):
+    scale = min(1.0, HIGH_DETAIL_MAX_SIDE / max(width, height))
+    scale = min(scale, HIGH_DETAIL_SHORT_SIDE / min(width, height))
+    return width * scale, height * scale
+
+
+def tile_snapped_size(width, height):
+    """
+    Target size for an image so it does not pay for a barely used tile.
+
+    The image is first reduced the way the model would reduce it anyway, then
+    shrunk slightly (never below MIN_TILE_SNAP_SCALE) when that brings a side
+    down onto a tile boundary, e.g. 640x640 -> 512x512 (4 tiles -> 1) and
+    800x600 -> 683x512 (4 tiles -> 2).
+    """
+    w, h = _high_detail_size(width, height)
+    scale = 1.0
+    for side in (w, h):
+        snapped = (side // TILE_SIZE) * TILE_SIZE
+        if snapped and side % TILE_SIZE and snapped / side >= MIN_TILE_SNAP_SCALE:
+            scale = min(scale, snapped / side)
+    return max(1, int(round(w * scale))), max(1, int(round(h * scale)))
+
+
+def _encode(image, quality):
+    ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+    if not ok:
+        raise ValueError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def prepare_image(file_path, quality=JPEG_QUALITY):
+    """
+    Resizes an image file onto the tile grid and re-encodes it as a metadata-free JPEG.
+
+    Results are cached on disk under IMAGE_PREP_CACHE_DIR, keyed by the source
+    bytes and the preparation settings, so each photo is processed once.
+
+    Returns:
+        bytes: The encoded JPEG, or None if the file cannot be decoded.
+    """
+    with open(file_path, "rb") as f:
+        raw = f.read()
+    return prepare_image_bytes(raw, quality=quality, use_disk_cache=True)
+
+
+def prepare_image_bytes(raw, quality=JPEG_QUALITY, use_disk_cache=False):
+    """
+    Same as prepare_image() for an image already in memory. The disk cache is
+    off by default so in-memory callers never touch the filesystem.
+    """
+    cache_path = None
+    if use_disk_cache:
+        key = hashlib.sha1(raw + f"|{quality}|{TILE_SIZE}|{MIN_TILE_SNAP_SCALE}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(IMAGE_PREP_CACHE_DIR, key[:2], f"{key}.jpg")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+    image = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    target_width, target_height = tile_snapped_size(width, height)
+    if (target_width, target_height) != (width, height):
+        image = cv2.resize(image, (target_width, target_height), interpolation=cv2.INTER_AREA)
+    encoded = _encode(image, quality)
+
+    if cache_path is not None:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(tmp_path, cache_path)
+    return encoded
+
+
+def prepare_image_set(file_paths, byte_budget=IMAGE_BYTE_BUDGET):
+    """
+    Prepares the images of one request and keeps them within `byte_budget`.
+
+    Images are prepared at JPEG_QUALITY; if the set is over budget it is
+    re-encoded at each of FALLBACK_QUALITIES in turn, and as a last resort
+    trailing images are dropped (the first image, e.g. the satellite view,
+    is always kept).
+
+    Returns:
+        list: (file_path, data_url) pairs for the images that were kept, in order.
+    """
+    return _prepare_set(file_paths, lambda path, quality: prepare_image(path, quality=quality), byte_budget)
+
+
+def prepare_image_bytes_set(images, byte_budget=IMAGE_BYTE_BUDGET):
+    """
+    prepare_image_set() for in-memory images.
+
+    Args:
+        images (list): (label, raw bytes) pairs; the label is only used in messages and the result.
+
+    Returns:
+        list: (label, data_url) pairs for the images that were kept, in order.
+    """
+    raw_by_label = dict(images)
+    return _prepare_set(
+        [label for label, _ in images],
+        lambda label, quality: prepare_image_bytes(raw_by_label[label], quality=quality),
+        byte_budget
+    )
+
+
+def _prepare_set(labels, prepare, byte_budget):
+    prepared = []
+    for quality in (JPEG_QUALITY,) + FALLBACK_QUALITIES:
+        prepared = []
+        for label in labels:
+            try:
+                encoded = prepare(label, quality)
+            except (OSError, ValueError, cv2.error) as e:
+                print(f"Error preparing image {label}: {e}")
+                encoded = None
+            if encoded is not None:
+                prepared.append((label, encoded))
+        if sum(len(encoded) for _, encoded in prepared) <= byte_budget:
+            break
+
+    while len(prepared) > 1 and sum(len(encoded) for _, encoded in prepared) > byte_budget:
+        dropped_label, _ = prepared.pop()
+        print(f"  - Dropped {os.path.basename(str(dropped_label))} to stay within the {byte_budget} byte image budget")
+
+    return [(label, jpeg_data_url(encoded)) for label, encoded in prepared]
+
+
+def jpeg_data_url(encoded):
+    return f"data:image/jpeg;base64,{base64.b64encode(encoded).decode('utf-8')}"
@@ -0,0 +1,173 @@
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+from array import array
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.geo import haversine_one_to_many, polyline_distances, EARTH_RADIUS_METERS
+
+# Backend used by the traffic light and speed limit features: "overpass" (public API) or "local".
+OSM_BACKEND = os.getenv("OSM_BACKEND", "overpass")
+OSM_STORE_PATH = os.getenv("OSM_STORE_PATH", os.path.join(os.path.dirname(__file__), '..', 'cache', 'osm_store.sqlite'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (id INTEGER PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL, tags TEXT);
+CREATE VIRTUAL TABLE IF NOT EXISTS signal_index USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE TABLE IF NOT EXISTS ways (id INTEGER PRIMARY KEY, tags TEXT, geometry BLOB NOT NULL);
+CREATE VIRTUAL TABLE IF NOT EXISTS way_index USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+
+def _pack_geometry(coords):
+    """Packs [(lat, lon), ...] into a compact float64 blob."""
+    return array('d', [value for point in coords for value in point]).tobytes()
+
+
+def _unpack_geometry(blob):
+    values = array('d')
+    values.frombytes(blob)
+    return [{'lat': values[i], 'lon': values[i + 1]} for i in range(0, len(values), 2)]
+
+
+def _bbox_around(lat, lon, radius_meters):
+    lat_pad = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+    lon_pad = lat_pad / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - lat_pad, lat + lat_pad, lon - lon_pad, lon + lon_pad
+
+
+def build_osm_store(osm_path, db_path=OSM_STORE_PATH, batch_size=10000):
+    """
+    Loads a local .osm.pbf (or .osm) extract into a SQLite/R-tree store.
+
+    Only highway=traffic_signals nodes and ways tagged with both highway and
+    maxspeed are kept, which is all the traffic light and speed limit
+    features read. Requires pyosmium (`pip install osmium`).
+    """
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError("Building a local OSM store requires pyosmium (pip install osmium).") from e
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+
+    signals, signal_boxes, ways, way_boxes = [], [], [], []
+
+    def flush():
+        conn.executemany("INSERT OR REPLACE INTO signals VALUES (?, ?, ?, ?)", signals)
+        conn.executemany("INSERT OR REPLACE INTO signal_index VALUES (?, ?, ?, ?, ?)", signal_boxes)
+        conn.executemany("INSERT OR REPLACE INTO ways VALUES (?, ?, ?)", ways)
+        conn.executemany("INSERT OR REPLACE INTO way_index VALUES (?, ?, ?, ?, ?)", way_boxes)
+        conn.commit()
+        for batch in (signals, signal_boxes, ways, way_boxes):
+            batch.clear()
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, n):
+            if n.tags.get('highway') != 'traffic_signals' or not n.location.valid():
+                return
+            lat, lon = n.location.lat, n.location.lon
+            signals.append((n.id, lat, lon, json.dumps({tag.k: tag.v for tag in n.tags})))
+            signal_boxes.append((n.id, lat, lat, lon, lon))
+            if len(signals) >= batch_size:
+                flush()
+
+        def way(self, w):
+            if 'highway' not in w.tags or 'maxspeed' not in w.tags:
+                return
+            coords = [(nd.lat, nd.lon) for nd in w.nodes if nd.location.valid()]
+            if not coords:
+                return
+            lats = [c[0] for c in coords]
+            lons = [c[1] for c in coords]
+            ways.append((w.id, json.dumps({tag.k: tag.v for tag in w.tags}), _pack_geometry(coords)))
+            way_boxes.append((w.id, min(lats), max(lats), min(lons), max(lons)))
+            if len(ways) >= batch_size:
+                flush()
+
+    Handler().apply_file(osm_path, locations=True)
+    flush()
+    conn.close()
+
+
+class OsmStore:
+    """
+    Read side of the local OSM store. Returns elements in the same shape as
+    Overpass JSON (`out body` nodes and `out tags geom` ways), so the feature
+    code post-processes them exactly like API responses.
+    """
+
+    def __init__(self, db_path=OSM_STORE_PATH):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Local OSM store not found at {db_path}. Build it with build_osm_store().")
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def traffic_signals_around(self, lat, lon, radius_meters):
+        """Returns traffic signal nodes within radius_meters, like Overpass `around`."""
+        min_lat, max_lat, min_lon, max_lon = _bbox_around(lat, lon, radius_meters)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT s.id, s.lat, s.lon, s.tags FROM signal_index i JOIN signals s ON s.id = i.id "
+                "WHERE i.min_lat <= ? AND i.max_lat >= ? AND i.min_lon <= ? AND i.max_lon >= ? ORDER BY s.id",
+                (max_lat, min_lat, max_lon, min_lon)
+            ).fetchall()
+        if not rows:
+            return []
+        distances = haversine_one_to_many(lat, lon, [r[1] for r in rows], [r[2] for r in rows], radius=EARTH_RADIUS_METERS)
+        return [
+            {'type': 'node', 'id': node_id, 'lat': node_lat, 'lon': node_lon, 'tags': json.loads(tags or '{}')}
+            for (node_id, node_lat, node_lon, tags), distance in zip(rows, distances.tolist())
+            if distance <= radius_meters
+        ]
+
+    def maxspeed_ways_around(self, lat, lon, radius_meters):
+        """Returns highway ways with a maxspeed tag passing within radius_meters, like Overpass `around`."""
+        min_lat, max_lat, min_lon, max_lon = _bbox_around(lat, lon, radius_meters)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT w.id, w.tags, w.geometry FROM way_index i JOIN ways w ON w.id = i.id "
+                "WHERE i.min_lat <= ? AND i.max_lat >= ? AND i.min_lon <= ? AND i.max_lon >= ? ORDER BY w.id",
+                (max_lat, min_lat, max_lon, min_lon)
+            ).fetchall()
+        if not rows:
+            return []
+        geometries = [_unpack_geometry(blob) for _, _, blob in rows]
+        nearest = polyline_distances(
+            lat, lon,
+            [[(p['lat'], p['lon']) for p in geometry] for geometry in geometries],
+            radius=EARTH_RADIUS_METERS
+        )
+        return [
+            {'type': 'way', 'id': way_id, 'tags': json.loads(tags or '{}'), 'geometry': geometry}
+            for (way_id, tags, _), geometry, distance in zip(rows, geometries, nearest['distance'].tolist())
+            if distance <= radius_meters
+        ]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_osm_store():
+    """Returns the process-wide OsmStore opened from OSM_STORE_PATH."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OsmStore(OSM_STORE_PATH)
+        return _store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python common/osm_store.py <extract.osm.pbf> [store.sqlite]")
+        sys.exit(1)
+    target = sys.argv[2] if len(sys.argv) == 3 else OSM_STORE_PATH
+    build_osm_store(sys.argv[1], target)
+    print(f"Local OSM store written to {target}")
@@ -0,0 +1,172 @@
+import os
+import sqlite3
+import threading
+
+import cv2
+import numpy as np
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+PHOTO_HASH_CACHE_PATH = os.getenv("PHOTO_HASH_CACHE_PATH", os.path.join(PROJECT_ROOT, "cache", "photo_hashes.sqlite"))
+# Two photos whose pHash or dHash differ in at most this many of 64 bits are near-duplicates.
+DUPLICATE_HAMMING_DISTANCE = int(os.getenv("PHOTO_DUPLICATE_HAMMING_DISTANCE", "10"))
+
+
+def dhash(gray, hash_size=8):
+    """Difference hash: sign of horizontal gradients on a (hash_size + 1) x hash_size thumbnail."""
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray, hash_size=8, highfreq_factor=4):
+    """Perceptual hash: low-frequency DCT coefficients of a 32x32 thumbnail compared with their median."""
+    size = hash_size * highfreq_factor
+    small = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:hash_size, :hash_size]
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def informativeness(gray):
+    """
+    Higher for sharp, detailed photos: log sharpness (variance of the
+    Laplacian) plus the grey-level entropy in bits. Blurry, dark or flat
+    shots (menus, logos on plain backgrounds) score low.
+    """
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    histogram = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    p = histogram[histogram > 0] / histogram.sum()
+    entropy = float(-(p * np.log2(p)).sum())
+    return float(np.log1p(sharpness) + entropy)
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.ravel():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PhotoFeatureCache:
+    """SQLite cache of per-file hashes and informativeness, invalidated by file size and mtime."""
+
+    def __init__(self, path=PHOTO_HASH_CACHE_PATH):
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS photo_features (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                dhash TEXT NOT NULL,
+                phash TEXT NOT NULL,
+                informativeness REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def features(self, file_path):
+        """Returns (dhash, phash, informativeness) for a photo, or None if it cannot be decoded."""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dhash, phash, informativeness FROM photo_features WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime)
+            ).fetchone()
+        if row is not None:
+            return int(row[0], 16), int(row[1], 16), row[2]
+
+        gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            return None
+        result = _features_from_gray(gray)
+        with self._lock:
+            # Hashes are stored as hex text; 64-bit values overflow SQLite's signed INTEGER.
+            self._conn.execute(
+                "INSERT OR REPLACE INTO photo_features VALUES (?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, f"{result[0]:016x}", f"{result[1]:016x}", result[2])
+            )
+            self._conn.commit()
+        return result
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_photo_feature_cache():
+    """Returns the process-wide PhotoFeatureCache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PhotoFeatureCache()
+        return _cache
+
+
+def _features_from_gray(gray):
+    return dhash(gray), phash(gray), informativeness(gray)
+
+
+def select_photos(file_paths, limit, max_distance=DUPLICATE_HAMMING_DISTANCE):
+    """
+    Picks up to `limit` distinct, informative photos.
+
+    Photos are ranked by informativeness and taken greedily, skipping any
+    photo whose pHash or dHash is within `max_distance` bits of one already
+    taken. Files that cannot be decoded are skipped.
+
+    Returns:
+        list: The selected file paths, most informative first.
+    """
+    cache = get_photo_feature_cache()
+    candidates = []
+    for path in file_paths:
+        try:
+            features = cache.features(path)
+        except OSError as e:
+            print(f"Error hashing photo {path}: {e}")
+            continue
+        if features is not None:
+            candidates.append((path, os.path.basename(path), features))
+    return [path for path, _, _ in _select_distinct(candidates, limit, max_distance)]
+
+
+def select_photo_bytes(images, limit, max_distance=DUPLICATE_HAMMING_DISTANCE):
+    """
+    select_photos() for in-memory photos; features are computed on the fly, not cached.
+
+    Args:
+        images (list): (label, raw bytes) pairs.
+
+    Returns:
+        list: The selected (label, raw bytes) pairs, most informative first.
+    """
+    candidates = []
+    for label, raw in images:
+        gray = cv2.imdecode(np.frombuffer(raw, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is not None:
+            candidates.append(((label, raw), str(label), _features_from_gray(gray)))
+    return [item for item, _, _ in _select_distinct(candidates, limit, max_distance)]
+
+
+def _select_distinct(candidates, limit, max_distance):
+    # Highest informativeness first; the name breaks ties so the choice is stable.
+    candidates = sorted(candidates, key=lambda item: (-item[2][2], item[1]))
+
+    selected = []
+    for candidate in candidates:
+        if len(selected) >= limit:
+            break
+        d, p, _ = candidate[2]
+        if any(hamming_distance(d, kept[2][0]) <= max_distance or hamming_distance(p, kept[2][1]) <= max_distance
+               for kept in selected):
+            continue
+        selected.append(candidate)
+    return selected
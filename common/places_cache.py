@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_CACHE_PATH = os.getenv("PLACES_CACHE_PATH", os.path.join(PROJECT_ROOT, "cache", "places_cache.sqlite"))
+DEFAULT_TTL_SECONDS = int(os.getenv("PLACES_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("PLACES_CACHE_MAX_ENTRIES", "50000"))
+
+# 5 decimal places is roughly 1 m, well below any search radius we use.
+COORDINATE_PRECISION = 5
+
+
+def make_search_key(latitude, longitude, radius_meters, included_types, rank_preference):
+    """
+    Builds the geo key for a Nearby Search request, without the field mask or result count.
+
+    Coordinates are rounded so repeated runs over the same site coordinates
+    (which come from spreadsheets with varying float precision) share one entry.
+    """
+    key_parts = {
+        "lat": round(float(latitude), COORDINATE_PRECISION),
+        "lon": round(float(longitude), COORDINATE_PRECISION),
+        "radius": round(float(radius_meters), 1),
+        "types": sorted(included_types or []),
+        "rank": rank_preference or "",
+    }
+    return hashlib.sha1(json.dumps(key_parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _mask_fields(field_mask):
+    return frozenset(f.strip() for f in field_mask.split(",") if f.strip())
+
+
+class PlacesCache:
+    """
+    On-disk SQLite cache of Places Nearby Search responses.
+
+    Entries are keyed by the rounded search parameters, the field mask and
+    the result count. A lookup is also served by any entry whose field mask
+    is a superset of the requested one, so modules asking for fewer fields
+    reuse responses fetched by modules asking for more. For DISTANCE-ranked
+    searches an entry fetched with a larger result count is truncated to the
+    requested count, since its first N places are the N nearest. Entries
+    expire after `ttl_seconds`, and the least recently used ones are evicted
+    once the cache holds more than `max_entries`.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS nearby_search (
+                search_key TEXT NOT NULL,
+                field_mask TEXT NOT NULL,
+                max_results INTEGER NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (search_key, field_mask, max_results)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_nearby_last_accessed ON nearby_search (last_accessed)")
+        self._conn.commit()
+
+    def get(self, search_key, field_mask, max_results, allow_truncate=False):
+        """Returns the cached response dict, or None on a miss or expired entry."""
+        requested = _mask_fields(field_mask)
+        now = time.time()
+        with self._lock:
+            if allow_truncate:
+                count_clause, count_param = "max_results >= ?", max_results
+            else:
+                count_clause, count_param = "max_results = ?", max_results
+            rows = self._conn.execute(
+                f"SELECT field_mask, max_results, response FROM nearby_search "
+                f"WHERE search_key = ? AND {count_clause} AND created_at >= ? ORDER BY created_at DESC",
+                (search_key, count_param, now - self.ttl_seconds)
+            ).fetchall()
+            for stored_mask, stored_max, response in rows:
+                if stored_mask == "*" or requested <= _mask_fields(stored_mask):
+                    self._conn.execute(
+                        "UPDATE nearby_search SET last_accessed = ? "
+                        "WHERE search_key = ? AND field_mask = ? AND max_results = ?",
+                        (now, search_key, stored_mask, stored_max)
+                    )
+                    self._conn.commit()
+                    self.hits += 1
+                    data = json.loads(response)
+                    if "places" in data:
+                        data["places"] = data["places"][:max_results]
+                    return data
+            self.misses += 1
+        return None
+
+    def set(self, search_key, field_mask, max_results, response):
+        """Stores a response and evicts expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nearby_search "
+                "(search_key, field_mask, max_results, response, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (search_key, field_mask, max_results, json.dumps(response), now, now)
+            )
+            self._conn.execute("DELETE FROM nearby_search WHERE created_at < ?", (now - self.ttl_seconds,))
+            count = self._conn.execute("SELECT COUNT(*) FROM nearby_search").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM nearby_search WHERE rowid IN "
+                    "(SELECT rowid FROM nearby_search ORDER BY last_accessed ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_places_cache():
+    """Returns the process-wide PlacesCache, or None if PLACES_CACHE_DISABLED is set."""
+    global _cache
+    if os.getenv("PLACES_CACHE_DISABLED", "").lower() in ("1", "true", "yes"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PlacesCache()
+        return _cache
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.places_cache import get_places_cache, make_search_key
+from common.rate_limiter import get_rate_limiter
+
+PLACES_NEARBY_URL = "https://places.googleapis.com/v1/places:searchNearby"
+PLACES_TEXT_URL = "https://places.googleapis.com/v1/places:searchText"
+
+# Keep-alive pool shared by every caller in the process.
+POOL_SIZE = int(os.getenv("PLACES_POOL_SIZE", "20"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def places_field_mask(*fields):
+    """
+    Builds a Places API response field mask for search results.
+
+    Example: places_field_mask("id", "displayName") -> "places.id,places.displayName"
+    """
+    return ",".join(f"places.{field}" for field in fields)
+
+
+# Minimal mask covering the car wash lookups (name, location, id, ratings).
+DEFAULT_FIELD_MASK = places_field_mask("id", "displayName", "location", "rating", "userRatingCount")
+
+
+def get_session():
+    """Returns the process-wide requests.Session backed by a keep-alive connection pool."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def _circle(latitude, longitude, radius_meters):
+    return {
+        "circle": {
+            "center": {
+                "latitude": latitude,
+                "longitude": longitude
+            },
+            "radius": radius_meters
+        }
+    }
+
+
+def post_places_request(url, api_key, payload, field_mask, retries=3, backoff_factor=1.0, timeout=15):
+    """
+    POSTs a Places API request through the shared session.
+
+    Retries connection errors, timeouts, 429 and 5xx responses with full-jitter
+    exponential backoff. Other HTTP errors are not retried.
+
+    Returns:
+        dict: The JSON response from the API, or None if an error occurs.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "X-Goog-Api-Key": api_key,
+        "X-Goog-FieldMask": field_mask
+    }
+    session = get_session()
+    limiter = get_rate_limiter("google_maps")
+
+    for attempt in range(retries):
+        limiter.acquire()
+        response = None
+        try:
+            response = session.post(url, headers=headers, data=json.dumps(payload), timeout=timeout)
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                raise requests.exceptions.HTTPError(f"{response.status_code} Server Error", response=response)
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+            retryable = response is None or response.status_code in RETRYABLE_STATUS_CODES
+            print(f"Attempt {attempt + 1} for Places request failed: {e}")
+            if not retryable:
+                print(f"Response content: {response.text}")
+                return None
+            if attempt < retries - 1:
+                time.sleep(random.uniform(0, backoff_factor * (2 ** attempt)))
+            else:
+                print("All attempts failed.")
+                if response is not None:
+                    print(f"Final response content: {response.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"Request error occurred: {e}")
+            return None
+        except json.JSONDecodeError:
+            print("Error decoding JSON response.")
+            print(f"Response content: {response.text}")
+            return None
+    return None
+
+
+def search_nearby(api_key, latitude, longitude, radius_miles=1, included_types=None, max_results=10,
+                  rank_preference="POPULARITY", field_mask=DEFAULT_FIELD_MASK, use_cache=True):
+    """
+    Finds nearby places using the Google Places API (Nearby Search New).
+
+    Args:
+        api_key (str): Your Google Maps Platform API Key.
+        latitude (float): The latitude of the center point for the search.
+        longitude (float): The longitude of the center point for the search.
+        radius_miles (float, optional): The radius for the search in miles. Defaults to 1.
+        included_types (list, optional): Place types to search for. If None or empty, all types.
+        max_results (int, optional): The maximum number of results to return (1-20). Defaults to 10.
+        rank_preference (str, optional): "POPULARITY" or "DISTANCE". Defaults to "POPULARITY".
+        field_mask (str, optional): Response fields to request. Keep it to what the caller reads.
+        use_cache (bool, optional): Consult the on-disk geo-keyed cache first. Defaults to True.
+
+    Returns:
+        dict: The JSON response from the API, or None if an error occurs.
+    """
+    radius_meters = radius_miles * 1609.34
+    if not (0.0 < radius_meters <= 50000.0):
+        print("Error: Radius must be between 0.0 (exclusive) and 50000.0 meters (inclusive).")
+        return None
+
+    payload = {
+        "locationRestriction": _circle(latitude, longitude, radius_meters),
+        "maxResultCount": min(max(1, max_results), 20)
+    }
+    if included_types:
+        payload["includedTypes"] = included_types
+    if rank_preference:
+        payload["rankPreference"] = rank_preference
+
+    cache = get_places_cache() if use_cache else None
+    if cache is not None:
+        search_key = make_search_key(latitude, longitude, radius_meters, included_types, rank_preference)
+        cached = cache.get(search_key, field_mask, payload["maxResultCount"],
+                           allow_truncate=rank_preference == "DISTANCE")
+        if cached is not None:
+            return cached
+
+    response_data = post_places_request(PLACES_NEARBY_URL, api_key, payload, field_mask)
+    if cache is not None and response_data is not None:
+        cache.set(search_key, field_mask, payload["maxResultCount"], response_data)
+    return response_data
+
+
+def search_text(api_key, text_query, latitude, longitude, radius_miles=1, included_types=None, max_results=10,
+                rank_preference="RELEVANCE", field_mask=DEFAULT_FIELD_MASK):
+    """
+    Finds places matching a text query, biased towards a circle (Text Search New).
+
+    Returns:
+        dict: The JSON response from the API, or None if an error occurs.
+    """
+    payload = {
+        "textQuery": text_query,
+        "locationBias": _circle(latitude, longitude, radius_miles * 1609.34),
+        "maxResultCount": min(max(1, max_results), 20)
+    }
+    if included_types:
+        payload["includedTypes"] = included_types
+    if rank_preference:
+        payload["rankPreference"] = rank_preference
+
+    return post_places_request(PLACES_TEXT_URL, api_key, payload, field_mask)
+
+
+async def search_nearby_async(*args, **kwargs):
+    """Async entry point for search_nearby; runs on a worker thread and shares the same pool."""
+    return await asyncio.to_thread(search_nearby, *args, **kwargs)
+
+
+async def search_text_async(*args, **kwargs):
+    """Async entry point for search_text; runs on a worker thread and shares the same pool."""
+    return await asyncio.to_thread(search_text, *args, **kwargs)
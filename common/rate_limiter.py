@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket used to pace calls to an external provider.
+
+    Tokens refill continuously at `rate_per_sec` up to `burst`. `acquire()`
+    blocks until a token is available, so concurrent workers share one budget
+    per provider instead of each sleeping a fixed amount after every call.
+    """
+
+    def __init__(self, rate_per_sec, burst=1):
+        if rate_per_sec <= 0:
+            raise ValueError("rate_per_sec must be positive.")
+        self.rate_per_sec = float(rate_per_sec)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_sec)
+
+    def _reserve(self):
+        """Takes a token if one is available, otherwise returns the seconds to wait."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate_per_sec
+
+    def acquire(self):
+        """Blocks until a token is available."""
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class RateLimitedError(Exception):
+    """
+    Raised by fetchers that fail fast when a provider answers 429, so the
+    caller can switch to another provider instead of sleeping.
+
+    Attributes:
+        provider (str): Provider key, e.g. "open_meteo".
+        retry_after (float): Seconds the provider asked to wait, or None.
+        partial: Whatever the fetcher completed before being throttled.
+    """
+
+    def __init__(self, provider, retry_after=None, partial=None):
+        super().__init__(f"{provider} is rate limiting" + (f" (retry after {retry_after:.0f} s)" if retry_after else ""))
+        self.provider = provider
+        self.retry_after = retry_after
+        self.partial = partial
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+# Default pacing per provider as (requests per second, burst). Each can be
+# overridden with <PROVIDER>_RATE_PER_SEC / <PROVIDER>_BURST env variables.
+DEFAULT_PROVIDER_LIMITS = {
+    "google_maps": (10.0, 10),
+    "gemini": (2.0, 4),
+    "azure_openai": (1.0, 3),
+}
+
+
+def get_rate_limiter(provider):
+    """
+    Returns the process-wide RateLimiter for a provider, creating it on first use.
+
+    Args:
+        provider (str): Provider key, e.g. "gemini" or "azure_openai".
+
+    Returns:
+        RateLimiter: The shared limiter for that provider.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            default_rate, default_burst = DEFAULT_PROVIDER_LIMITS.get(provider, (1.0, 1))
+            env_prefix = provider.upper()
+            rate = float(os.getenv(f"{env_prefix}_RATE_PER_SEC", default_rate))
+            burst = int(os.getenv(f"{env_prefix}_BURST", default_burst))
+            limiter = RateLimiter(rate, burst)
+            _limiters[provider] = limiter
+        return limiter
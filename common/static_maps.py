@@ -0,0 +1,151 @@
+import hashlib
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from common.places_client import get_session
+from common.rate_limiter import get_rate_limiter
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+STATIC_MAP_URL = "https://maps.googleapis.com/maps/api/staticmap"
+STATIC_MAP_CACHE_DIR = os.getenv("STATIC_MAP_CACHE_DIR", os.path.join(PROJECT_ROOT, "cache", "static_maps"))
+STATIC_MAP_CACHE_DISABLED = os.getenv("STATIC_MAP_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+DEFAULT_SIZE = "640x640"
+DEFAULT_MAPTYPE = "hybrid"
+# Center coordinates are rounded to this many decimals (~1 cm) so equal
+# locations coming from different CSVs or APIs share one cache entry.
+CENTER_DECIMALS = 7
+
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+
+def static_map_center(latitude, longitude):
+    return f"{float(latitude):.{CENTER_DECIMALS}f},{float(longitude):.{CENTER_DECIMALS}f}"
+
+
+def static_map_cache_key(latitude, longitude, zoom, size=DEFAULT_SIZE, maptype=DEFAULT_MAPTYPE):
+    """Cache key of one Static Maps image: everything that determines its pixels."""
+    request = f"{static_map_center(latitude, longitude)}|{int(zoom)}|{size}|{maptype}"
+    return hashlib.sha1(request.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(STATIC_MAP_CACHE_DIR, key[:2], f"{key}.png")
+
+
+def _key_lock(key):
+    """Per-image lock, so concurrent callers wanting the same image download it once."""
+    with _key_locks_lock:
+        lock = _key_locks.get(key)
+        if lock is None:
+            lock = _key_locks[key] = threading.Lock()
+        return lock
+
+
+def fetch_static_map(latitude, longitude, zoom, size=DEFAULT_SIZE, maptype=DEFAULT_MAPTYPE, api_key=None,
+                     retries=3, backoff_factor=0.5):
+    """
+    Returns the raw Static Maps image for a center, zoom, size and map type.
+
+    Images are stored once under STATIC_MAP_CACHE_DIR, keyed by
+    static_map_cache_key(), so every feature asking for the same view reuses
+    the first download. Only responses OpenCV can decode are cached.
+
+    Returns:
+        bytes: The image as served by the API, or None if every attempt failed.
+    """
+    key = static_map_cache_key(latitude, longitude, zoom, size, maptype)
+    cache_path = _cache_path(key)
+
+    with _key_lock(key):
+        if not STATIC_MAP_CACHE_DISABLED and os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                return f.read()
+
+        params = {
+            "center": static_map_center(latitude, longitude),
+            "zoom": int(zoom),
+            "size": size,
+            "maptype": maptype,
+            "key": api_key or os.getenv("GOOGLE_MAPS_API_KEY")
+        }
+        for attempt in range(retries):
+            try:
+                get_rate_limiter("google_maps").acquire()
+                response = get_session().get(STATIC_MAP_URL, params=params, timeout=15)
+                response.raise_for_status()  # Raise an exception for bad status codes
+
+                if _decode(response.content) is None:
+                    print(f"Attempt {attempt + 1} failed: OpenCV could not decode the image.")
+                else:
+                    if not STATIC_MAP_CACHE_DISABLED:
+                        _write_atomic(cache_path, response.content)
+                    return response.content
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed with exception: {e}")
+
+            if attempt < retries - 1:
+                sleep_time = backoff_factor * (2 ** attempt)
+                print(f"Retrying in {sleep_time:.2f} seconds...")
+                time.sleep(sleep_time)
+
+    print(f"Failed to retrieve static map at {params['center']} zoom {zoom} after {retries} attempts.")
+    return None
+
+
+def _decode(raw):
+    return cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def mark_center(raw, radius=10, color=(0, 0, 255)):
+    """
+    Draws a filled circle (red by default) at the image center and returns it as PNG.
+
+    Returns:
+        bytes: The annotated PNG, or None if `raw` cannot be decoded or encoded.
+    """
+    image = _decode(raw)
+    if image is None:
+        return None
+    height, width, _ = image.shape
+    cv2.circle(image, (width // 2, height // 2), radius, color, -1)
+    success, buffer = cv2.imencode('.png', image)
+    return buffer.tobytes() if success else None
+
+
+def get_static_map_image(latitude, longitude, zoom, output_filepath, api_key=None, retries=3, backoff_factor=0.5,
+                         size=DEFAULT_SIZE, maptype=DEFAULT_MAPTYPE):
+    """
+    Saves the static map for a location with its center marked by a red dot.
+
+    The raw image comes from fetch_static_map(); the marked copy is derived
+    from it on each call, so features sharing a location share one download.
+
+    Returns:
+        bool: True if a non-empty image was written to `output_filepath`.
+    """
+    raw = fetch_static_map(latitude, longitude, zoom, size, maptype, api_key, retries, backoff_factor)
+    if raw is None:
+        print(f"Failed to retrieve image for {output_filepath} after {retries} attempts.")
+        return False
+
+    annotated = mark_center(raw)
+    if not annotated:
+        print(f"Failed to annotate image for {output_filepath}.")
+        return False
+    with open(output_filepath, "wb") as f:
+        f.write(annotated)
+    return True
@@ -1,15 +1,15 @@
 import pandas as pd
 import os
 from dotenv import load_dotenv
-import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from utils.competitor_matcher import match_competitors
-from utils.placePhotos import get_photo_references_and_name, download_photo
-from utils.keyword_classification import keywordclassifier
-from utils.gpt_images_classification import visionModelResponse
-from utils.file_utils import sanitize_filename, get_place_image_count
-from utils.geo_utils import calculate_distance
-from utils.google_maps_utils import get_satellite_image_name, download_satellite_image, find_nearby_places
+from utils.placePhotos import get_place_photos, fetch_photos_bytes
+from utils.keyword_classification import keywordclassifier, keywordclassifier_batch
+from utils.gpt_images_classification import visionModelResponseFromBytes, get_cached_vision_verdict, cache_vision_verdict
+from utils.geo_utils import calculate_distance, haversine_one_to_many
+from utils.google_maps_utils import load_satellite_image_bytes, find_nearby_places
+from common.rate_limiter import get_rate_limiter
 
 IMAGE_DIR = "competitors/place_images"
 if not os.path.exists(IMAGE_DIR):
@@ -19,7 +19,84 @@ SATELLITE_IMAGE_BASE_DIR = "competitors/satellite_images"
 if not os.path.exists(SATELLITE_IMAGE_BASE_DIR):
     os.makedirs(SATELLITE_IMAGE_BASE_DIR)
 
-def count_competitors(original_latitude, original_longitude):
+# Number of nearby places evaluated at the same time. Provider pacing is
+# handled by the shared rate limiters, not by this cap.
+MAX_WORKERS = int(os.getenv("COMPETITORS_MAX_WORKERS", "8"))
+
+def evaluate_place(api_key, place, original_latitude, original_longitude, distance=None, classification_result=None):
+    """
+    Runs the filter chain (name match, keyword classifier, vision model) for one nearby place.
+    `distance` and the keyword `classification_result` may be precomputed by the
+    caller; otherwise they are computed here.
+
+    Returns:
+        dict: distance/rating/userRatingCount if the place is a competitor, otherwise None.
+    """
+    display_name = place.get("displayName", {}).get("text", "N/A")
+    place_latitude = place.get("location", {}).get("latitude")
+    place_longitude = place.get("location", {}).get("longitude")
+    place_id = place.get("id")
+    is_competitor = False
+    if distance is None:
+        distance = calculate_distance(original_latitude, original_longitude, place_latitude, place_longitude)
+    rating = place.get("rating")
+    user_rating_count = place.get("userRatingCount")
+
+    _, found_competitors, _ = match_competitors([display_name])
+    found_in_competitor_list = bool(found_competitors)
+
+    if found_in_competitor_list:
+        is_competitor = True
+    else:
+        if classification_result is None:
+            classification_result = keywordclassifier(display_name)
+        keyword_classification = classification_result.get("classification")
+
+        if keyword_classification == "Competitor":
+            is_competitor = True
+        elif keyword_classification == "Can't say":
+            photos = []
+            if place_id:
+                get_rate_limiter("google_maps").acquire()
+                photos, _ = get_place_photos(place_id)
+            photo_references = [photo.get("name") for photo in photos]
+
+            # A verdict for this place and photo set skips every download and the vision call.
+            cached_verdict = get_cached_vision_verdict(place_id, photos)
+            if cached_verdict is not None:
+                if cached_verdict.get("classification") == "Competitor":
+                    is_competitor = True
+            else:
+                # Images go from download to the model request in memory; saving
+                # them to disk happens in the background (PERSIST_API_IMAGES).
+                with ThreadPoolExecutor(max_workers=1) as satellite_executor:
+                    satellite_future = satellite_executor.submit(
+                        load_satellite_image_bytes, api_key, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR
+                    )
+                    # Branches of a chain share a name; the place_id keeps their folders apart.
+                    place_images = fetch_photos_bytes(photo_references, "api_call", f"{display_name} {place_id}", IMAGE_DIR)
+                    satellite_image_bytes = satellite_future.result()
+
+                if place_images or satellite_image_bytes:
+                    try:
+                        get_rate_limiter("azure_openai").acquire()
+                        image_classification_result = visionModelResponseFromBytes(satellite_image_bytes, place_images)
+                        cache_vision_verdict(place_id, photos, image_classification_result)
+                        image_classification = image_classification_result.get("classification")
+                        if image_classification == "Competitor":
+                            is_competitor = True
+                    except Exception as e:
+                        print(f"ERROR calling visionModelResponse for {display_name}: {e}")
+
+    if is_competitor:
+        return {
+            "distance": distance,
+            "rating": rating,
+            "userRatingCount": user_rating_count
+        }
+    return None
+
+def count_competitors(original_latitude, original_longitude, max_workers=MAX_WORKERS):
     load_dotenv()
     API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
     if not API_KEY or API_KEY == "YOUR_API_KEY":
@@ -41,67 +118,39 @@ def count_competitors(original_latitude, original_longitude):
 
     competitors_data = []
     if results and "places" in results:
-        for i, place in enumerate(results["places"]):
-            if i == 0:
-                continue
-                
-            display_name = place.get("displayName", {}).get("text", "N/A")
-            place_latitude = place.get("location", {}).get("latitude")
-            place_longitude = place.get("location", {}).get("longitude")
-            place_id = place.get("id")
-            is_competitor = False
-            distance = calculate_distance(original_latitude, original_longitude, place_latitude, place_longitude)
-            rating = place.get("rating")
-            user_rating_count = place.get("userRatingCount")
-            
-            _, found_competitors, _ = match_competitors([display_name])
-            found_in_competitor_list = bool(found_competitors)
-            
-            if found_in_competitor_list:
-                is_competitor = True
-            else:
-                classification_result = keywordclassifier(display_name)
-                keyword_classification = classification_result.get("classification")
-                time.sleep(1)
+        # The first result is the site's own car wash.
+        nearby_places = results["places"][1:]
 
-                if keyword_classification == "Competitor":
-                    is_competitor = True
-                elif keyword_classification == "Can't say":
-                    satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
-                    if satellite_image_name is None and place_id and place_latitude and place_longitude:
-                        if download_satellite_image(API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR):
-                            satellite_image_name = f"{place_id}.jpg"
-                    
-                    num_place_images = 0
-                    if place_id:
-                        photo_references, _ = get_photo_references_and_name(place_id)
-                        if photo_references:
-                            for photo_idx, ref in enumerate(photo_references):
-                                download_photo(ref, "api_call", display_name, photo_idx, IMAGE_DIR)
-                            num_place_images = get_place_image_count("api_call", display_name, IMAGE_DIR)
-
-                    current_place_images_folder_path = os.path.join(IMAGE_DIR, sanitize_filename("api_call"), sanitize_filename(display_name))
-                    current_satellite_image_full_path = os.path.join(SATELLITE_IMAGE_BASE_DIR, satellite_image_name) if satellite_image_name else ""
-
-                    if (num_place_images is not None and num_place_images > 0) or (current_satellite_image_full_path and os.path.exists(current_satellite_image_full_path)):
-                        try:
-                            image_classification_result = visionModelResponse(
-                                place_images_folder_path=current_place_images_folder_path,
-                                satellite_image_path=current_satellite_image_full_path
-                            )
-                            image_classification = image_classification_result.get("classification")
-                            if image_classification == "Competitor":
-                                is_competitor = True
-                            time.sleep(1)
-                        except Exception as e:
-                            print(f"ERROR calling visionModelResponse for {display_name}: {e}")
-            
-            if is_competitor:
-                competitors_data.append({
-                    "distance": distance,
-                    "rating": rating,
-                    "userRatingCount": user_rating_count
-                })
+        # All distances in one vectorized pass; places without a location fall back to the scalar path.
+        distances = haversine_one_to_many(
+            original_latitude, original_longitude,
+            [place.get("location", {}).get("latitude", float("nan")) for place in nearby_places],
+            [place.get("location", {}).get("longitude", float("nan")) for place in nearby_places]
+        ).tolist() if nearby_places else []
+        distance_by_place = {id(place): (d if d == d else None) for place, d in zip(nearby_places, distances)}
+
+        # Keyword classification for every place the name match misses, in one batched request.
+        unmatched_names = [
+            name for name in (place.get("displayName", {}).get("text", "N/A") for place in nearby_places)
+            if not match_competitors([name])[1]
+        ]
+        keyword_results = dict(zip(unmatched_names, keywordclassifier_batch(unmatched_names)))
+
+        def evaluate(place):
+            try:
+                return evaluate_place(API_KEY, place, original_latitude, original_longitude, distance_by_place.get(id(place)),
+                                      keyword_results.get(place.get("displayName", {}).get("text", "N/A")))
+            except Exception as e:
+                print(f"ERROR evaluating {place.get('displayName', {}).get('text', 'N/A')}: {e}")
+                print(traceback.format_exc())
+                return None
+
+        if nearby_places:
+            # executor.map keeps the original place order, so ties in distance sort as before.
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(nearby_places)))) as executor:
+                for competitor in executor.map(evaluate, nearby_places):
+                    if competitor is not None:
+                        competitors_data.append(competitor)
 
     summary_data = {
         "original_address": f"{original_latitude}, {original_longitude}",
@@ -0,0 +1,85 @@
+import argparse
+import base64
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add the competitors directory and project root to the Python path
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.image_prep import estimate_image_tokens
+from utils.gpt_images_classification import (
+    build_image_content_parts, CarWashClassification, SYSTEM_PROMPT, USER_QUERY_PROMPT, IMAGE_DETAIL,
+    AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_API_VERSION, AZURE_OPENAI_MODEL_DEPLOYMENT_NAME
+)
+
+
+def describe_parts(parts):
+    """Payload bytes and estimated image tokens of a list of image_url content parts."""
+    payload_bytes = 0
+    tokens = 0
+    for part in parts:
+        url = part["image_url"]["url"]
+        payload_bytes += len(url)
+        encoded = url.split(",", 1)[1]
+        image = cv2.imdecode(np.frombuffer(base64.b64decode(encoded), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            tokens += estimate_image_tokens(image.shape[1], image.shape[0], IMAGE_DETAIL)
+    return payload_bytes, tokens
+
+
+def live_call(parts):
+    """Sends one classification request and returns (latency seconds, prompt tokens)."""
+    from openai import AzureOpenAI
+
+    client = AzureOpenAI(
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_key=AZURE_OPENAI_API_KEY,
+        api_version=AZURE_OPENAI_API_VERSION
+    )
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": [{"type": "text", "text": USER_QUERY_PROMPT}] + parts}
+    ]
+    start = time.perf_counter()
+    completion = client.beta.chat.completions.parse(
+        model=AZURE_OPENAI_MODEL_DEPLOYMENT_NAME,
+        messages=messages,
+        response_format=CarWashClassification,
+        max_tokens=1500,
+    )
+    return time.perf_counter() - start, completion.usage.prompt_tokens
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vision request payloads with and without image preprocessing.")
+    parser.add_argument("place_images_folder", help="Folder of place photos, e.g. competitors/place_images/<site>/<place>")
+    parser.add_argument("satellite_image", help="Satellite image of the same place")
+    parser.add_argument("--live", action="store_true", help="Also send both requests to Azure OpenAI and report latency/usage")
+    args = parser.parse_args()
+
+    for label, preprocess in (("original", False), ("preprocessed", True)):
+        start = time.perf_counter()
+        parts, error = build_image_content_parts(args.place_images_folder, args.satellite_image, preprocess=preprocess)
+        build_seconds = time.perf_counter() - start
+        if error:
+            print(f"Error: {error}")
+            sys.exit(1)
+        if preprocess:
+            # Second build is served from the on-disk encoding cache.
+            start = time.perf_counter()
+            build_image_content_parts(args.place_images_folder, args.satellite_image, preprocess=True)
+            warm_seconds = time.perf_counter() - start
+        payload_bytes, tokens = describe_parts(parts)
+
+        print(f"\n[{label}] {len(parts)} image(s)")
+        print(f"  payload (base64): {payload_bytes / 1024:.0f} KiB")
+        print(f"  estimated image tokens: {tokens}")
+        print(f"  build time: {build_seconds * 1000:.1f} ms" + (f" (cached: {warm_seconds * 1000:.1f} ms)" if preprocess else ""))
+        if args.live:
+            latency, prompt_tokens = live_call(parts)
+            print(f"  request latency: {latency:.2f} s, prompt tokens billed: {prompt_tokens}")
@@ -4,10 +4,10 @@ from dotenv import load_dotenv
 import time
 import traceback
 from utils.competitor_matcher import match_competitors
-from utils.placePhotos import get_photo_references_and_name, download_photo
-from utils.keyword_classification import keywordclassifier
+from utils.placePhotos import get_place_photos, download_photos
+from utils.keyword_classification import keywordclassifier, keywordclassifier_batch, keyword_cache_stats
 # from utils.gemini_images_classification import visionModelResponse
-from utils.gpt_images_classification import visionModelResponse
+from utils.gpt_images_classification import visionModelResponse, get_cached_vision_verdict, cache_vision_verdict, vision_cache_stats
 from utils.file_utils import sanitize_filename, get_place_image_count
 from utils.geo_utils import calculate_distance
 from utils.google_maps_utils import get_satellite_image_name, download_satellite_image, find_nearby_places
@@ -119,6 +119,14 @@ if __name__ == "__main__":
             )
 
             if results and "places" in results:
+                # Filter 2 inputs for the whole site: every nearby place the name match misses,
+                # classified together in one batched request.
+                unmatched_names = [
+                    name for name in (place.get("displayName", {}).get("text", "N/A") for place in results["places"][1:])
+                    if not match_competitors([name])[1]
+                ]
+                keyword_results = dict(zip(unmatched_names, keywordclassifier_batch(unmatched_names)))
+
                 for i, place in enumerate(results["places"]):
                     if i == 0:
                         continue
@@ -148,46 +156,59 @@ if __name__ == "__main__":
                         is_competitor = True
                     else:
                         # Filter 2: Keyword Classification
-                        classification_result = keywordclassifier(display_name)
+                        classification_result = keyword_results.get(display_name) or keywordclassifier(display_name)
                         keyword_classification = classification_result.get("classification")
                         keyword_explanation = classification_result.get("explanation")
-                        time.sleep(1)
 
                         if keyword_classification == "Competitor":
                             is_competitor = True
                         elif keyword_classification == "Can't say":
                             # Filter 3: Vision Model
-                            satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
-                            if satellite_image_name is None and place_id and place_latitude and place_longitude:
-                                if download_satellite_image(API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR):
-                                    satellite_image_name = f"{place_id}.jpg"
-                            
+                            photos = []
                             if place_id:
-                                photo_references, _ = get_photo_references_and_name(place_id)
+                                photos, _ = get_place_photos(place_id)
+                            photo_references = [photo.get("name") for photo in photos]
+
+                            # A verdict for this place and photo set skips every download and the vision call.
+                            cached_verdict = get_cached_vision_verdict(place_id, photos)
+                            if cached_verdict is not None:
+                                # Same columns as a miss: whatever images earlier runs left on disk.
+                                satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
+                                num_place_images = get_place_image_count(site_address, display_name, IMAGE_DIR)
+                                image_classification = cached_verdict.get("classification")
+                                image_justification = cached_verdict.get("justification")
+                                if image_classification == "Competitor":
+                                    is_competitor = True
+                            else:
+                                satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
+                                if satellite_image_name is None and place_id and place_latitude and place_longitude:
+                                    if download_satellite_image(API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR):
+                                        satellite_image_name = f"{place_id}.jpg"
+
                                 if photo_references:
-                                    for photo_idx, ref in enumerate(photo_references):
-                                        download_photo(ref, site_address, display_name, photo_idx, IMAGE_DIR)
+                                    download_photos(photo_references, site_address, display_name, IMAGE_DIR)
                                     num_place_images = get_place_image_count(site_address, display_name, IMAGE_DIR)
 
-                            current_place_images_folder_path = os.path.join(IMAGE_DIR, sanitize_filename(site_address), sanitize_filename(display_name))
-                            current_satellite_image_full_path = os.path.join(SATELLITE_IMAGE_BASE_DIR, satellite_image_name) if satellite_image_name else ""
-
-                            if (num_place_images is not None and num_place_images > 0) or (current_satellite_image_full_path and os.path.exists(current_satellite_image_full_path)):
-                                try:
-                                    image_classification_result = visionModelResponse(
-                                        place_images_folder_path=current_place_images_folder_path,
-                                        satellite_image_path=current_satellite_image_full_path
-                                    )
-                                    image_classification = image_classification_result.get("classification")
-                                    image_justification = image_classification_result.get("justification")
-                                    if image_classification == "Competitor":
-                                        is_competitor = True
-                                    time.sleep(1)
-                                except Exception as e:
-                                    print(f"ERROR calling visionModelResponse for {display_name}: {e}")
-                                    print(traceback.format_exc())
-                                    image_classification = "Error"
-                                    image_justification = str(e)
+                                current_place_images_folder_path = os.path.join(IMAGE_DIR, sanitize_filename(site_address), sanitize_filename(display_name))
+                                current_satellite_image_full_path = os.path.join(SATELLITE_IMAGE_BASE_DIR, satellite_image_name) if satellite_image_name else ""
+
+                                if (num_place_images is not None and num_place_images > 0) or (current_satellite_image_full_path and os.path.exists(current_satellite_image_full_path)):
+                                    try:
+                                        image_classification_result = visionModelResponse(
+                                            place_images_folder_path=current_place_images_folder_path,
+                                            satellite_image_path=current_satellite_image_full_path
+                                        )
+                                        cache_vision_verdict(place_id, photos, image_classification_result)
+                                        image_classification = image_classification_result.get("classification")
+                                        image_justification = image_classification_result.get("justification")
+                                        if image_classification == "Competitor":
+                                            is_competitor = True
+                                        time.sleep(1)
+                                    except Exception as e:
+                                        print(f"ERROR calling visionModelResponse for {display_name}: {e}")
+                                        print(traceback.format_exc())
+                                        image_classification = "Error"
+                                        image_justification = str(e)
                     
                     if is_competitor:
                         competitors_data.append({
@@ -239,6 +260,10 @@ if __name__ == "__main__":
 
         print(f"\nProcessing complete. Results appended to {output_filepath}")
         print(f"Summary results appended to {summary_output_filepath}")
+        stats = keyword_cache_stats()
+        print(f"Keyword classification cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+        stats = vision_cache_stats()
+        print(f"Vision verdict cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
 
     except Exception as e:
         print(f"An error occurred during processing: {e}")
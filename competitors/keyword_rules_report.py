@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Add the competitors directory to the Python path (for utils.keyword_rules)
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from utils.keyword_rules import rule_classify
+
+DEFAULT_CSV_PATH = 'EDAFE/competitor_analysis.csv'
+LABELS = ["Competitor", "Not a Competitor", "Can't say"]
+
+
+def build_report(csv_path):
+    """
+    Replays rule_classify() over historical countCompetitors output and compares
+    it with the Gemini labels recorded in the keyword_classification column.
+
+    Returns:
+        tuple: (summary dict, DataFrame of rule-resolved rows where the labels disagree)
+    """
+    df = pd.read_csv(csv_path)
+    if "keyword_classification" not in df.columns or "found_car_wash_name" not in df.columns:
+        raise ValueError(f"{csv_path} has no found_car_wash_name/keyword_classification columns to compare against.")
+
+    labelled = df[df["keyword_classification"].isin(LABELS)].copy()
+
+    start = time.perf_counter()
+    rule_results = [rule_classify(name) for name in labelled["found_car_wash_name"]]
+    elapsed = time.perf_counter() - start
+
+    labelled["rule_classification"] = [r["classification"] if r else None for r in rule_results]
+    resolved = labelled[labelled["rule_classification"].notna()]
+    agree = resolved["rule_classification"] == resolved["keyword_classification"]
+
+    summary = {
+        "labelled_rows": len(labelled),
+        "unique_names": labelled["found_car_wash_name"].nunique(),
+        "resolved_rows": len(resolved),
+        "resolved_unique_names": resolved["found_car_wash_name"].nunique(),
+        "coverage": len(resolved) / len(labelled) if len(labelled) else 0.0,
+        "agreement": agree.mean() if len(resolved) else 0.0,
+        "microseconds_per_name": elapsed / len(labelled) * 1e6 if len(labelled) else 0.0,
+        "confusion": pd.crosstab(resolved["rule_classification"], resolved["keyword_classification"]),
+    }
+    disagreements = resolved.loc[~agree, ["found_car_wash_name", "rule_classification", "keyword_classification"]]
+    return summary, disagreements.drop_duplicates("found_car_wash_name")
+
+
+if __name__ == "__main__":
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CSV_PATH
+    try:
+        summary, disagreements = build_report(csv_path)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Rows with a Gemini keyword label: {summary['labelled_rows']} ({summary['unique_names']} unique names)")
+    print(f"Resolved by rules: {summary['resolved_rows']} rows ({summary['coverage']:.1%}), "
+          f"{summary['resolved_unique_names']} unique names")
+    print(f"Agreement with Gemini on resolved rows: {summary['agreement']:.1%}")
+    print(f"Rule evaluation time: {summary['microseconds_per_name']:.1f} us per name")
+    print("\nRule label (rows) vs Gemini label (columns):")
+    print(summary["confusion"].to_string())
+    if not disagreements.empty:
+        print("\nDisagreements:")
+        print(disagreements.to_string(index=False))
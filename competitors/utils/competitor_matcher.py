@@ -1,4 +1,6 @@
 import re
+from collections import defaultdict
+from functools import lru_cache
 
 reference_company_names = ['Whistle Express Car Wash',
  'Mister Car Wash',
@@ -178,6 +180,32 @@ reference_company_names = ['Whistle Express Car Wash',
  'Waves Express Car Wash',
  'Four Seasons Car Wash']
 
+# Compiled once; normalize_name runs for every place the API returns.
+_NOISE_CHARS_RE = re.compile(r"[^a-z0-9\s]")
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]')
+
+# Known trailing suffixes, longest first so overlapping phrases match correctly.
+_TRAILING_PHRASES = sorted([
+    "car wash",
+    "carwash",
+    "express car wash",
+    "express carwash",
+    "xpress car wash",
+    "xpress carwash",
+    "auto wash"
+    "express wash"
+    "xpress wash"
+    "car washes"
+], key=len, reverse=True)
+
+# Fuzzy matching only applies to normalized names at least this long, so
+# short brands ("go", "luv") never match an unrelated one-letter variant.
+FUZZY_MIN_LENGTH = 5
+# Normalized names at least this long may differ by 2 edits instead of 1.
+FUZZY_TWO_EDIT_MIN_LENGTH = 14
+_DIGITS_RE = re.compile(r'[0-9]+')
+
+
 def normalize_name(name):
     """
     Normalizes a company name through a simplified process:
@@ -186,49 +214,46 @@ def normalize_name(name):
     3. Normalizes whitespace (multiple spaces/tabs to single space, trims).
     4. Removes a predefined list of common trailing phrases from the end.
     5. Finally, removes all remaining non-alphanumeric characters (i.e., spaces) for a compact key.
+
+    Results are memoized, since the same chain names come back for many sites.
     """
     if not isinstance(name, str) or not name.strip():  # Handle None, non-string, empty or whitespace-only strings
         return ''
+    return _normalize_name_cached(name)
+
 
+@lru_cache(maxsize=65536)
+def _normalize_name_cached(name):
+    # Final normalization - remove all remaining non-alphanumeric (i.e., spaces)
+    # This collapses multiple word parts into a single string, e.g., "tidal wave" -> "tidalwave".
+    return _NON_ALNUM_RE.sub('', _normalized_words(name))
+
+
+@lru_cache(maxsize=65536)
+def _normalized_words(name):
+    """Steps 1-4 of normalize_name: the cleaned, suffix-stripped name with its spaces kept."""
     name_lower = name.lower()
 
     # Clean internal "noise" characters (non-alphanumeric, non-space)
     # This removes symbols like ®, ™, ', ' etc., but keeps spaces.
-    semi_cleaned = re.sub(r"[^a-z0-9\s]", '', name_lower)
+    semi_cleaned = _NOISE_CHARS_RE.sub('', name_lower)
 
     # Normalize whitespace (multiple spaces/tabs to single space, trim)
-    semi_cleaned_normalized_space = ' '.join(semi_cleaned.split())
-
-    # Remove known trailing suffixes.
-    # Order by length (descending) for correct matching of overlapping/sub-phrases.
-    trailing_phrases_to_remove = [
-        "car wash",
-        "carwash",
-        "express car wash",
-        "express carwash",    
-        "xpress car wash",
-        "xpress carwash",
-        "auto wash"  
-        "express wash"
-        "xpress wash"
-        "car washes"            
-    ]
-    trailing_phrases_to_remove.sort(key=len, reverse=True)  # Important: longest match first
-
-    final_name = semi_cleaned_normalized_space
-    for phrase in trailing_phrases_to_remove:
+    final_name = ' '.join(semi_cleaned.split())
+
+    for phrase in _TRAILING_PHRASES:
         if final_name.endswith(phrase):
             # Remove the phrase and strip any leading/trailing whitespace from the remainder
             final_name = final_name[:-len(phrase)].strip()
             # After removing a major suffix, assume the remainder is the core brand.
             # Stop further suffix stripping for this name.
             break
-    
-    # Final normalization - remove all remaining non-alphanumeric (i.e., spaces)
-    # This collapses multiple word parts into a single string, e.g., "tidal wave" -> "tidalwave".
-    normalized = re.sub(r'[^a-z0-9]', '', final_name)
-    
-    return normalized
+    return final_name
+
+
+def _first_word(name):
+    words = _normalized_words(name).split() if isinstance(name, str) else []
+    return words[0] if words else ''
 
 
 def build_normalized_name_database(company_names_list):
@@ -257,42 +282,150 @@ def build_normalized_name_database(company_names_list):
     return normalized_set, normalized_to_original_map
 
 
-def match_competitors(competitor_names):
+def _trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _bounded_edit_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 once it is known to exceed max_distance."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+def _max_edit_distance(normalized):
+    """Edits allowed for a fuzzy match: none for short names, 2 only for long ones, otherwise 1."""
+    if len(normalized) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(normalized) < FUZZY_TWO_EDIT_MIN_LENGTH else 2
+
+
+class CompetitorIndex:
+    """
+    Normalized lookup over the reference company names, built once.
+
+    Exact lookups are a set membership test on the normalized name. Fuzzy
+    lookups use a trigram index to shortlist reference names sharing enough
+    trigrams with the query, then accept the closest one within a small
+    edit distance (see _max_edit_distance). A fuzzy match must also keep
+    the first word and every number unchanged: "Sonny's" is not "Ronny's"
+    and "3 Minute" is not "5 Minute".
+    """
+
+    def __init__(self, company_names_list):
+        self.normalized_set, self.normalized_to_original_map = build_normalized_name_database(company_names_list)
+        self._names = sorted(self.normalized_set)
+        self._first_words = [_first_word(self.normalized_to_original_map[name]) for name in self._names]
+        self._trigram_index = defaultdict(set)
+        for name_id, normalized in enumerate(self._names):
+            for trigram in _trigrams(normalized):
+                self._trigram_index[trigram].add(name_id)
+
+    def _fuzzy_lookup(self, normalized, first_word):
+        max_distance = _max_edit_distance(normalized)
+        if max_distance == 0:
+            return None
+        digits = _DIGITS_RE.findall(normalized)
+
+        query_trigrams = _trigrams(normalized)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for name_id in self._trigram_index.get(trigram, ()):
+                shared[name_id] += 1
+
+        # Each edit destroys at most 3 trigrams of the shorter string.
+        best_name, best_distance = None, max_distance + 1
+        for name_id, count in shared.items():
+            candidate = self._names[name_id]
+            if count < min(len(query_trigrams), len(candidate) + 1) - 3 * max_distance:
+                continue
+            if self._first_words[name_id] != first_word or _DIGITS_RE.findall(candidate) != digits:
+                continue
+            distance = _bounded_edit_distance(normalized, candidate, max_distance)
+            if distance > max_distance:
+                continue
+            if distance < best_distance or (distance == best_distance and candidate < best_name):
+                best_name, best_distance = candidate, distance
+        return best_name
+
+    def lookup(self, name, fuzzy=False):
+        """Returns the reference company name that `name` matches, or None."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return None
+        if normalized in self.normalized_set:
+            return self.normalized_to_original_map[normalized]
+        if fuzzy:
+            match = self._fuzzy_lookup(normalized, _first_word(name))
+            if match is not None:
+                return self.normalized_to_original_map[match]
+        return None
+
+    def lookup_many(self, names, fuzzy=False):
+        """Batch form of lookup(): one reference name (or None) per input name, in order."""
+        return [self.lookup(name, fuzzy=fuzzy) for name in names]
+
+
+_reference_index = None
+
+
+def get_reference_index():
+    """Returns the CompetitorIndex over reference_company_names, building it on first use."""
+    global _reference_index
+    if _reference_index is None:
+        _reference_index = CompetitorIndex(reference_company_names)
+    return _reference_index
+
+
+def match_competitor_names(competitor_names, fuzzy=False):
+    """
+    Matches many competitor names against the reference companies in one pass.
+
+    Args:
+        competitor_names (iterable): Competitor names (strings; other values never match).
+        fuzzy (bool, optional): Also accept near-miss spellings. Defaults to False.
+
+    Returns:
+        list: The matched reference company name, or None, for each input name in order.
+    """
+    return get_reference_index().lookup_many(competitor_names, fuzzy=fuzzy)
+
+
+def match_competitors(competitor_names, fuzzy=False):
     """
     Compares a list of competitor names with reference company names.
-    Uses name normalization to enable matching despite variations.
+    Uses name normalization (and, with fuzzy=True, near-miss spelling
+    matching) to enable matching despite variations.
+
+    A match is treated as a confirmed competitor without any keyword or
+    image check, so fuzzy matching is opt-in.
 
     Args:
         competitor_names (list): A list of competitor names (strings).
-        reference_company_names (list): A list of reference company names (strings).
+        fuzzy (bool, optional): Also accept near-miss spellings. Defaults to False.
 
     Returns:
         tuple: A tuple containing count of found, list of found, list of not found.
     """
     if not isinstance(competitor_names, list) or not isinstance(reference_company_names, list):
         return 0, [], list(competitor_names) if competitor_names is not None else []
-        
-    normalized_reference_set, normalized_to_original_map = build_normalized_name_database(reference_company_names)
 
     found_competitors = []
     not_found_competitors = []
 
-    for competitor_name in competitor_names:
-        if not isinstance(competitor_name, str) or not competitor_name.strip():
-            not_found_competitors.append(competitor_name)
-            continue
-
-        normalized_competitor = normalize_name(competitor_name)
-
-        if not normalized_competitor:
-            not_found_competitors.append(competitor_name)
-            continue
-
-        if normalized_competitor in normalized_reference_set:
+    for competitor_name, match in zip(competitor_names, match_competitor_names(competitor_names, fuzzy=fuzzy)):
+        if match is not None:
             found_competitors.append(competitor_name)
         else:
             not_found_competitors.append(competitor_name)
 
     return len(found_competitors), found_competitors, not_found_competitors
-
-
@@ -1,5 +1,8 @@
 import base64
+import hashlib
 import os
+import re
+import sys
 from google import genai
 from google.genai import types
 import json
@@ -7,19 +10,18 @@ from dotenv import load_dotenv
 import traceback
 import time
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.classification_cache import get_classification_cache
+from common.rate_limiter import get_rate_limiter
+from utils.keyword_rules import rule_classify
+
 load_dotenv()
 
-def keywordclassifier(car_wash_name: str):
-    client = genai.Client(
-        api_key=os.environ.get("GEMINI_API_KEY"),
-    )
+MODEL = "gemini-2.5-flash-preview-05-20" # Consider 'gemini-1.5-flash' or 'gemini-1.5-pro' for more complex classification or longer inputs if needed.
 
-    model = "gemini-2.5-flash-preview-05-20" # Consider 'gemini-1.5-flash' or 'gemini-1.5-pro' for more complex classification or longer inputs if needed.
-    contents = [
-        types.Content(
-            role="user",
-            parts=[
-                types.Part.from_text(text="""You are a smart classifier for car wash businesses. Your goal is to decide whether a business is a Competitor or Not a Competitor based on its name or description.
+PROMPT_INSTRUCTIONS = """You are a smart classifier for car wash businesses. Your goal is to decide whether a business is a Competitor or Not a Competitor based on its name or description.
 
 Classification Logic:
 
@@ -65,11 +67,81 @@ Input: "Downtown Detail & Hand Wash"
 Output: Not a Competitor
 
 
-Now classify this input:
-{{""" + str(car_wash_name) + """}}"""),
+"""
+
+PROMPT = PROMPT_INSTRUCTIONS + """Now classify this input:
+{{"""
+
+BATCH_PROMPT = PROMPT_INSTRUCTIONS + """Now classify each of the following inputs independently. Return one result per input, with the input's index:
+"""
+
+CLASSIFICATIONS = ["Competitor", "Not a Competitor", "Can't say"]
+
+# Cache entries are keyed by this version, so editing the prompt, model or
+# label set automatically invalidates previously cached classifications.
+CACHE_NAMESPACE = "keyword_classification"
+PROMPT_VERSION = hashlib.sha1(json.dumps([MODEL, PROMPT, CLASSIFICATIONS]).encode("utf-8")).hexdigest()[:16]
+
+# Names per batched request; each batch shares one copy of the instruction block.
+BATCH_SIZE = int(os.getenv("KEYWORD_BATCH_SIZE", "25"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"[^\w\s&]")
+
+
+def classification_cache_key(car_wash_name):
+    """Case, punctuation and whitespace-insensitive cache key for a business name."""
+    cleaned = _PUNCTUATION_RE.sub("", str(car_wash_name).lower())
+    return _WHITESPACE_RE.sub(" ", cleaned).strip()
+
+
+def keyword_cache_stats():
+    """Hit/miss counts and hit rate of the keyword classification cache in this process."""
+    cache = get_classification_cache()
+    return cache.stats(CACHE_NAMESPACE) if cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0}
+
+
+def keywordclassifier(car_wash_name: str, use_cache=True, use_rules=True):
+    """
+    Classifies a business name as "Competitor", "Not a Competitor" or "Can't say".
+
+    Names with unambiguous keywords are resolved by rule_classify() first.
+    Names already classified under the current PROMPT_VERSION are served from
+    the persistent classification cache without calling Gemini. Error results
+    are never cached.
+    """
+    if use_rules:
+        rule_result = rule_classify(car_wash_name)
+        if rule_result is not None:
+            return rule_result
+
+    cache = get_classification_cache() if use_cache else None
+    cache_key = classification_cache_key(car_wash_name)
+    if cache is not None and cache_key:
+        cached = cache.get(CACHE_NAMESPACE, cache_key, PROMPT_VERSION)
+        if cached is not None:
+            return cached
+
+    result = _classify_with_gemini(car_wash_name)
+    if cache is not None and cache_key and result.get("classification") in CLASSIFICATIONS:
+        cache.set(CACHE_NAMESPACE, cache_key, PROMPT_VERSION, result)
+    return result
+
+
+def _classify_with_gemini(car_wash_name):
+    client = genai.Client(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+    )
+
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=PROMPT + str(car_wash_name) + "}}"),
             ],
         ),
     ]
+
     generate_content_config = types.GenerateContentConfig(
         response_mime_type="application/json",
         response_schema=genai.types.Schema(
@@ -78,7 +150,7 @@ Now classify this input:
             properties = {
                 "classification": genai.types.Schema(
                     type = genai.types.Type.STRING,
-                    enum = ["Competitor", "Not a Competitor", "Can't say"], # Added "Can't say"
+                    enum = CLASSIFICATIONS,
                     description = "The classification of the car wash business.",
                 ),
                 "explanation": genai.types.Schema(
@@ -91,9 +163,10 @@ Now classify this input:
 
     full_response_content = ""
     for attempt in range(3):
+        get_rate_limiter("gemini").acquire()
         try:
             for chunk in client.models.generate_content_stream(
-                model=model,
+                model=MODEL,
                 contents=contents,
                 config=generate_content_config,
             ):
@@ -115,3 +188,143 @@ Now classify this input:
         print(f"Error decoding JSON from Gemini API response: {e}")
         print(f"Raw response content: {full_response_content}")
         return {"classification": "Error", "explanation": f"JSON decoding error: {e}"}
+
+
+def keywordclassifier_batch(car_wash_names, use_cache=True, batch_size=BATCH_SIZE, use_rules=True):
+    """
+    Classifies many business names with as few Gemini requests as possible.
+
+    Names resolved by rule_classify() and cached names never reach Gemini; the rest are
+    de-duplicated and sent `batch_size` at a time in one structured-output
+    request each. Any name whose batched result is missing or invalid is
+    retried on its own with the single-name prompt.
+
+    Returns:
+        list: One result dict ({"classification", "explanation"}) per input name, in order.
+    """
+    cache = get_classification_cache() if use_cache else None
+
+    results_by_key = {}
+    pending = {}  # cache key -> first name seen with that key
+    for name in car_wash_names:
+        cache_key = classification_cache_key(name)
+        if cache_key in results_by_key or cache_key in pending:
+            continue
+        rule_result = rule_classify(name) if use_rules else None
+        if rule_result is not None:
+            results_by_key[cache_key] = rule_result
+            continue
+        cached = cache.get(CACHE_NAMESPACE, cache_key, PROMPT_VERSION) if cache is not None and cache_key else None
+        if cached is not None:
+            results_by_key[cache_key] = cached
+        else:
+            pending[cache_key] = name
+
+    pending_items = list(pending.items())
+    for start in range(0, len(pending_items), max(1, batch_size)):
+        chunk = pending_items[start:start + max(1, batch_size)]
+        batch_results = _classify_batch_with_gemini([name for _, name in chunk]) if len(chunk) > 1 else [None]
+        for (cache_key, name), result in zip(chunk, batch_results):
+            if result is None:
+                # Per-name fallback, also used for 1-item chunks.
+                result = _classify_with_gemini(name)
+            results_by_key[cache_key] = result
+            if cache is not None and cache_key and result.get("classification") in CLASSIFICATIONS:
+                cache.set(CACHE_NAMESPACE, cache_key, PROMPT_VERSION, result)
+
+    return [results_by_key[classification_cache_key(name)] for name in car_wash_names]
+
+
+def _validate_batch_item(item, count):
+    """Returns (index, result) for a well-formed batch item, or None."""
+    if not isinstance(item, dict):
+        return None
+    index = item.get("index")
+    classification = item.get("classification")
+    explanation = item.get("explanation")
+    if not isinstance(index, int) or not 0 <= index < count:
+        return None
+    if classification not in CLASSIFICATIONS or not isinstance(explanation, str):
+        return None
+    return index, {"classification": classification, "explanation": explanation}
+
+
+def _classify_batch_with_gemini(car_wash_names):
+    """
+    Classifies several names in one request.
+
+    Returns:
+        list: One result dict per name, or None for names the response did not
+              classify validly (the whole list is None entries if the request failed).
+    """
+    client = genai.Client(
+        api_key=os.environ.get("GEMINI_API_KEY"),
+    )
+
+    inputs = "\n".join(f"{index}: {{{{{name}}}}}" for index, name in enumerate(car_wash_names))
+    contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(text=BATCH_PROMPT + inputs),
+            ],
+        ),
+    ]
+    generate_content_config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=genai.types.Schema(
+            type = genai.types.Type.ARRAY,
+            items = genai.types.Schema(
+                type = genai.types.Type.OBJECT,
+                required = ["index", "classification", "explanation"],
+                properties = {
+                    "index": genai.types.Schema(
+                        type = genai.types.Type.INTEGER,
+                        description = "The index of the input this result belongs to.",
+                    ),
+                    "classification": genai.types.Schema(
+                        type = genai.types.Type.STRING,
+                        enum = CLASSIFICATIONS,
+                        description = "The classification of the car wash business.",
+                    ),
+                    "explanation": genai.types.Schema(
+                        type = genai.types.Type.STRING,
+                        description = "A brief explanation for the classification, mentioning the keywords found.",
+                    ),
+                },
+            ),
+        ),
+    )
+
+    results = [None] * len(car_wash_names)
+    response_text = None
+    for attempt in range(3):
+        get_rate_limiter("gemini").acquire()
+        try:
+            response_text = client.models.generate_content(
+                model=MODEL,
+                contents=contents,
+                config=generate_content_config,
+            ).text
+            break
+        except Exception as e:
+            print(f"Error on batch attempt {attempt + 1}: {e}")
+            if attempt < 2:
+                time.sleep(2 ** attempt)  # Exponential backoff
+            else:
+                print("Final batch attempt failed. Falling back to per-name classification.")
+                return results
+
+    try:
+        items = json.loads(response_text or "")
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON from Gemini batch response: {e}")
+        return results
+    if not isinstance(items, list):
+        return results
+
+    for item in items:
+        validated = _validate_batch_item(item, len(car_wash_names))
+        if validated is not None and results[validated[0]] is None:
+            results[validated[0]] = validated[1]
+    return results
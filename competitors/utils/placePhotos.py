@@ -1,10 +1,22 @@
 import requests
 import os
 import re # Added for sanitize_filename
+import sys
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 import os
 import time
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.places_client import get_session
+from common.rate_limiter import get_rate_limiter
+from common.background_io import run_in_background, write_file_atomic, PERSIST_API_IMAGES
+
 load_dotenv()
 
 # --- Configuration ---
@@ -15,8 +27,31 @@ API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY") # <--- REPLACE WITH YOUR ACTUAL
 PLACE_DETAILS_URL = "https://places.googleapis.com/v1/places/"
 PLACE_PHOTO_URL = "https://places.googleapis.com/v1/"
 
+# --- Photo download settings ---
+PHOTO_DOWNLOAD_WORKERS = int(os.getenv("PHOTO_DOWNLOAD_WORKERS", "10"))
+PHOTO_DOWNLOADS_PER_HOST = int(os.getenv("PHOTO_DOWNLOADS_PER_HOST", "10"))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = (10, 60)  # (connect, read) seconds
+# Per-folder record of each downloaded file's photo reference, size and ETag.
+PHOTO_MANIFEST_FILENAME = ".photos.json"
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+_manifest_lock = threading.Lock()
+
 def get_photo_references_and_name(place_id):
     """Gets photo references and the place name for a given place_id using the new Places API."""
+    photos, place_name = get_place_photos(place_id)
+    return [photo.get("name") for photo in photos], place_name
+
+def get_place_photos(place_id):
+    """
+    Gets the photo metadata (name, widthPx, heightPx, ...) and the place name
+    for a given place_id using the new Places API.
+
+    Returns:
+        tuple: (list of photo dicts as returned by the API, place name or None)
+    """
     if not place_id:
         return [], None
 
@@ -30,20 +65,20 @@ def get_photo_references_and_name(place_id):
     
     for attempt in range(3):
         try:
-            response = requests.get(url, headers=headers)
+            response = get_session().get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
             response.raise_for_status()
             result = response.json()
             
             place_name = result.get("displayName", {}).get("text", place_id)
-            photo_refs = []
+            photos = []
 
             if "photos" in result and result["photos"]:
-                photo_refs = [photo.get("name") for photo in result["photos"]]
-                print(f"Found {len(photo_refs)} photo references for '{place_name}' (ID: {place_id}).")
+                photos = result["photos"]
+                print(f"Found {len(photos)} photo references for '{place_name}' (ID: {place_id}).")
             else:
                 print(f"No photos found for '{place_name}' (ID: {place_id}).")
 
-            return photo_refs, place_name
+            return photos, place_name
         except requests.exceptions.RequestException as e:
             print(f"Error on attempt {attempt + 1}: {e}")
             if attempt < 2:
@@ -63,31 +98,89 @@ def sanitize_filename(name):
     # and strip leading/trailing underscores.
     return re.sub(r'[^a-zA-Z0-9]+', '_', str(name)).strip('_')
 
+def _host_semaphore(url):
+    """Bounds concurrent downloads per host across all threads."""
+    host = urlparse(url).netloc
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(PHOTO_DOWNLOADS_PER_HOST)
+        return _host_semaphores[host]
+
+def _read_manifest(nested_dir):
+    try:
+        with open(os.path.join(nested_dir, PHOTO_MANIFEST_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _record_download(nested_dir, filename, photo_reference, size, etag):
+    with _manifest_lock:
+        manifest = _read_manifest(nested_dir)
+        manifest[filename] = {"reference": photo_reference, "size": size, "etag": etag}
+        tmp_path = os.path.join(nested_dir, f"{PHOTO_MANIFEST_FILENAME}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(nested_dir, PHOTO_MANIFEST_FILENAME))
+
+def _stored_etag(nested_dir, filename):
+    """
+    The ETag `filename` was downloaded with, if it is still on disk with the
+    recorded size, else None. Photo references change between Places
+    responses, so a stored photo is revalidated by ETag rather than by reference.
+    """
+    entry = _read_manifest(nested_dir).get(filename)
+    path = os.path.join(nested_dir, filename)
+    if not entry or not entry.get("etag") or not os.path.exists(path) or os.path.getsize(path) != entry.get("size"):
+        return None
+    return entry["etag"]
+
 def download_photo(photo_reference, original_name, found_car_wash_name, index, image_base_dir, max_width=800):
-    """Downloads a photo given its reference and saves it into a structured subfolder."""
+    """
+    Downloads a photo given its reference and saves it into a structured subfolder.
+
+    A file already on disk is revalidated with If-None-Match and its stored
+    ETag, and kept when the server answers 304 Not Modified. Uses the shared
+    pooled session and writes through a temporary file, so an interrupted
+    download never leaves a truncated photo behind.
+
+    Returns:
+        bool: True if the photo is on disk afterwards.
+    """
     if not photo_reference:
-        return
+        return False
 
     url = f"{PLACE_PHOTO_URL}{photo_reference}/media?maxHeightPx={max_width}&key={API_KEY}"
-    
-    for attempt in range(3):
-        try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-
-            safe_original_name = sanitize_filename(original_name)
-            safe_found_car_wash_name = sanitize_filename(found_car_wash_name)
 
-            nested_dir = os.path.join(image_base_dir, safe_original_name, safe_found_car_wash_name)
-            os.makedirs(nested_dir, exist_ok=True)
+    safe_original_name = sanitize_filename(original_name)
+    safe_found_car_wash_name = sanitize_filename(found_car_wash_name)
+    nested_dir = os.path.join(image_base_dir, safe_original_name, safe_found_car_wash_name)
+    os.makedirs(nested_dir, exist_ok=True)
+    basename = f"photo_{index + 1}.jpg"
+    filename = os.path.join(nested_dir, basename)
 
-            filename = os.path.join(nested_dir, f"photo_{index + 1}.jpg")
+    stored_etag = _stored_etag(nested_dir, basename)
+    headers = {"If-None-Match": stored_etag} if stored_etag else {}
 
-            with open(filename, "wb") as f:
-                for chunk in response.iter_content(1024):
-                    f.write(chunk)
+    session = get_session()
+    for attempt in range(3):
+        tmp_filename = f"{filename}.{threading.get_ident()}.part"
+        try:
+            get_rate_limiter("google_maps").acquire()
+            with _host_semaphore(url):
+                with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT, headers=headers) as response:
+                    if stored_etag and response.status_code == 304:
+                        _record_download(nested_dir, basename, photo_reference, os.path.getsize(filename), stored_etag)
+                        print(f"Already downloaded (not modified): {filename}")
+                        return True
+                    response.raise_for_status()
+                    with open(tmp_filename, "wb") as f:
+                        for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                    etag = response.headers.get("ETag")
+            os.replace(tmp_filename, filename)
+            _record_download(nested_dir, basename, photo_reference, os.path.getsize(filename), etag)
             print(f"Successfully downloaded: {filename}")
-            return
+            return True
         except requests.exceptions.RequestException as e:
             print(f"Error on attempt {attempt + 1} downloading photo: {e}")
             if attempt < 2:
@@ -96,7 +189,115 @@ def download_photo(photo_reference, original_name, found_car_wash_name, index, i
                 print("Final attempt to download photo failed.")
         except IOError as e:
             print(f"Error saving photo {filename}: {e}")
-            return
+            return False
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+    return False
+
+def fetch_photo_bytes(photo_reference, max_width=800):
+    """
+    Fetches a photo into memory over the shared pooled session, without touching the disk.
+
+    Returns:
+        bytes: The image bytes, or None if the download failed.
+    """
+    content, _, _ = _fetch_photo(photo_reference, max_width)
+    return content
+
+def _fetch_photo(photo_reference, max_width=800, etag=None):
+    """
+    Fetches a photo into memory, revalidating against `etag` if one is given.
+
+    Returns:
+        tuple: (bytes or None, ETag of the response or None, True if the server answered 304 Not Modified)
+    """
+    if not photo_reference:
+        return None, None, False
+
+    url = f"{PLACE_PHOTO_URL}{photo_reference}/media?maxHeightPx={max_width}&key={API_KEY}"
+    headers = {"If-None-Match": etag} if etag else {}
+    session = get_session()
+    for attempt in range(3):
+        try:
+            get_rate_limiter("google_maps").acquire()
+            with _host_semaphore(url):
+                response = session.get(url, timeout=DOWNLOAD_TIMEOUT, headers=headers)
+                if etag and response.status_code == 304:
+                    return None, etag, True
+                response.raise_for_status()
+                return response.content, response.headers.get("ETag"), False
+        except requests.exceptions.RequestException as e:
+            print(f"Error on attempt {attempt + 1} fetching photo: {e}")
+            if attempt < 2:
+                time.sleep(2 ** attempt)
+            else:
+                print("Final attempt to fetch photo failed.")
+    return None, None, False
+
+def fetch_photos_bytes(photo_references, original_name, found_car_wash_name, image_base_dir, max_width=800,
+                       max_workers=PHOTO_DOWNLOAD_WORKERS, persist=PERSIST_API_IMAGES):
+    """
+    Loads all photos of a place into memory concurrently, for callers that hand
+    them straight to the vision model.
+
+    Photos already on disk are revalidated by ETag and read from disk when
+    unchanged; the rest are fetched into memory and, with `persist`, saved to
+    the same paths as download_photos() on a background thread after they are returned.
+
+    Returns:
+        list: (filename, bytes) pairs, in reference order, for the photos that loaded.
+    """
+    references = list(photo_references or [])
+    if not references:
+        return []
+    nested_dir = os.path.join(image_base_dir, sanitize_filename(original_name), sanitize_filename(found_car_wash_name))
+
+    def load(item):
+        index, photo_reference = item
+        basename = f"photo_{index + 1}.jpg"
+        stored_etag = _stored_etag(nested_dir, basename)
+        content, etag, not_modified = _fetch_photo(photo_reference, max_width, stored_etag)
+        if not_modified:
+            try:
+                with open(os.path.join(nested_dir, basename), "rb") as f:
+                    return basename, f.read(), etag, False
+            except OSError:
+                content, etag, _ = _fetch_photo(photo_reference, max_width)
+        return basename, content, etag, True
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(references)))) as executor:
+        loaded = list(executor.map(load, enumerate(references)))
+
+    if persist:
+        fetched = [(basename, content, references[index], etag)
+                   for index, (basename, content, etag, is_new) in enumerate(loaded) if content and is_new]
+        if fetched:
+            run_in_background(_save_photos, nested_dir, fetched)
+    return [(basename, content) for basename, content, _, _ in loaded if content]
+
+def _save_photos(nested_dir, photos):
+    for basename, content, photo_reference, etag in photos:
+        write_file_atomic(os.path.join(nested_dir, basename), content)
+        _record_download(nested_dir, basename, photo_reference, len(content), etag)
+
+def download_photos(photo_references, original_name, found_car_wash_name, image_base_dir, max_width=800,
+                    max_workers=PHOTO_DOWNLOAD_WORKERS):
+    """
+    Downloads all photos of a place concurrently (photo_1.jpg, photo_2.jpg, ... in reference order).
+
+    Returns:
+        int: Number of photos on disk afterwards.
+    """
+    references = list(photo_references or [])
+    if not references:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(references)))) as executor:
+        results = list(executor.map(
+            lambda item: download_photo(item[1], original_name, found_car_wash_name, item[0], image_base_dir, max_width),
+            enumerate(references)
+        ))
+    return sum(results)
 
 if __name__ == "__main__":
     if API_KEY == "YOUR_API_KEY":
@@ -127,11 +328,9 @@ if __name__ == "__main__":
 
                 if photo_references:
                     print(f"Downloading {len(photo_references)} photos for '{filename_prefix}'...")
-                    for i, ref in enumerate(photo_references):
-                        # In the __main__ block, we don't have original_name and found_car_wash_name
-                        # so we'll use filename_prefix for both for demonstration purposes.
-                        # This part will be updated in countCompetitors.py to pass correct values.
-                        # Pass a dummy IMAGE_DIR for the __main__ block, as it's not relevant for countCompetitors.py
-                        download_photo(ref, filename_prefix, filename_prefix, i, "place_images_temp")
+                    # In the __main__ block, we don't have original_name and found_car_wash_name
+                    # so we'll use filename_prefix for both for demonstration purposes.
+                    # Pass a dummy IMAGE_DIR for the __main__ block, as it's not relevant for countCompetitors.py
+                    download_photos(photo_references, filename_prefix, filename_prefix, "place_images_temp")
                 else:
                     print(f"No photos to download for Place ID: {place_id}")
@@ -1,8 +1,15 @@
-import requests
-import json
 import os
+import sys
 from dotenv import load_dotenv
-from geo_utils import calculate_distance
+from geo_utils import calculate_distance, haversine_one_to_many
+
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.places_client import search_nearby, places_field_mask
+
+# Only the fields read by get_nearby_business_count.
+BUSINESS_FIELD_MASK = places_field_mask("displayName", "location", "formattedAddress")
 
 load_dotenv()
 
@@ -23,54 +30,18 @@ def find_nearby_places(api_key, latitude, longitude, radius_miles=2, included_ty
     Returns:
         dict: The JSON response from the API, or None if an error occurs.
     """
-    base_url = "https://places.googleapis.com/v1/places:searchNearby"
-
-    # Convert radius from miles to meters (1 mile = 1609.34 meters)
-    radius_meters = radius_miles * 1609.34
-    if not (0.0 < radius_meters <= 50000.0):
-        print("Error: Radius must be between 0.0 (exclusive) and 50000.0 meters (inclusive).")
-        return None
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": api_key,
-        "X-Goog-FieldMask": "*" # Requesting all fields
-    }
-
-    payload = {
-        "locationRestriction": {
-            "circle": {
-                "center": {
-                    "latitude": latitude,
-                    "longitude": longitude
-                },
-                "radius": radius_meters
-            }
-        },
-        "maxResultCount": min(max(1, max_results), 20)
-    }
-
-    if included_types and len(included_types) > 0:
-        payload["includedTypes"] = included_types
+    return search_nearby(
+        api_key,
+        latitude,
+        longitude,
+        radius_miles=radius_miles,
+        included_types=included_types,
+        max_results=max_results,
+        rank_preference="DISTANCE",
+        field_mask=BUSINESS_FIELD_MASK
+    )
 
-    payload["rankPreference"] = "DISTANCE"
-    
-    try:
-        response = requests.post(base_url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
-        response_data = response.json()
-        return response_data
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err}")
-        print(f"Response content: {response.text}")
-    except requests.exceptions.RequestException as req_err:
-        print(f"Request error occurred: {req_err}")
-    except json.JSONDecodeError:
-        print("Error decoding JSON response.")
-        print(f"Response content: {response.text}")
-    return None
-
-def get_nearby_business_count(latitude: float, longitude: float):
+def get_nearby_business_count(latitude: float, longitude: float, target_car_wash=None):
     """
     Finds a nearby car wash and then counts the number of other businesses
     in its immediate vicinity.
@@ -78,6 +49,9 @@ def get_nearby_business_count(latitude: float, longitude: float):
     Args:
         latitude: The starting latitude.
         longitude: The starting longitude.
+        target_car_wash: Optional nearest car wash place (Places API dict) already
+                         resolved by the caller. It is used instead of a new search
+                         when it lies within the 500m car wash radius.
 
     Returns:
         A dictionary with the results, or None if an error occurs.
@@ -90,21 +64,28 @@ def get_nearby_business_count(latitude: float, longitude: float):
     # --- Step 1: Find the nearest car wash ---
     
     car_wash_radius_miles = 500/1609
-    carwash_data = find_nearby_places(
-        API_KEY,
-        latitude,
-        longitude,
-        radius_miles=car_wash_radius_miles,
-        included_types=['car_wash'],
-        max_results=1
-    )
-
-    if not carwash_data or "places" not in carwash_data or not carwash_data["places"]:
-        print(f"No car wash found within 500m")
-        return None
-
-    # Assume the first result is the one we want
-    target_car_wash = carwash_data['places'][0]
+    if target_car_wash is not None:
+        target_location = target_car_wash.get('location', {})
+        target_distance = calculate_distance(latitude, longitude, target_location.get('latitude'), target_location.get('longitude'))
+        if target_distance is None or target_distance > car_wash_radius_miles:
+            print(f"No car wash found within 500m")
+            return None
+    else:
+        carwash_data = find_nearby_places(
+            API_KEY,
+            latitude,
+            longitude,
+            radius_miles=car_wash_radius_miles,
+            included_types=['car_wash'],
+            max_results=1
+        )
+
+        if not carwash_data or "places" not in carwash_data or not carwash_data["places"]:
+            print(f"No car wash found within 500m")
+            return None
+
+        # Assume the first result is the one we want
+        target_car_wash = carwash_data['places'][0]
     car_wash_name = target_car_wash.get('displayName', {}).get('text', 'N/A')
     car_wash_location = target_car_wash.get('location', {})
     car_wash_latitude = car_wash_location.get('latitude', 'N/A')
@@ -159,18 +140,16 @@ def get_nearby_business_count(latitude: float, longitude: float):
         distance = calculate_distance(latitude, longitude, float(car_wash_latitude), float(car_wash_longitude))
         final_result['distance'] = distance
         
-        # Calculate distance between car wash and nearest businesses
-        for i, business in enumerate(nearest_businesses):
-            business_latitude = business.get('location', {}).get('latitude')
-            business_longitude = business.get('location', {}).get('longitude')
-            if business_latitude and business_longitude:
-                distance_car_wash_nearest_business = calculate_distance(
-                    float(car_wash_latitude), float(car_wash_longitude),
-                    float(business_latitude), float(business_longitude)
-                )
-                final_result['distance_car_wash_nearest_business_' + str(i+1)] = distance_car_wash_nearest_business
-            else:
-                final_result['distance_car_wash_nearest_business_' + str(i+1)] = None
+        # Calculate distance between car wash and nearest businesses in one vectorized pass
+        business_lats = [business.get('location', {}).get('latitude') or float('nan') for business in nearest_businesses]
+        business_lons = [business.get('location', {}).get('longitude') or float('nan') for business in nearest_businesses]
+        business_distances = haversine_one_to_many(
+            float(car_wash_latitude), float(car_wash_longitude), business_lats, business_lons
+        ).tolist() if nearest_businesses else []
+        for i, distance_car_wash_nearest_business in enumerate(business_distances):
+            if distance_car_wash_nearest_business != distance_car_wash_nearest_business:  # NaN: missing location
+                distance_car_wash_nearest_business = None
+            final_result['distance_car_wash_nearest_business_' + str(i+1)] = distance_car_wash_nearest_business
 
         # print(f"Distance from input location: {distance:.2f} miles")
         # print(f"Car Wash: '{final_result['target_car_wash']['name']}'")
@@ -2,6 +2,7 @@ import pandas as pd
 import json
 import math
 from searchNearbyAll import find_nearby_places # Import the function
+from common.geo import calculate_distance
 
 # --- Configuration ---
 # IMPORTANT: Replace YOUR_API_KEY with your actual key. Do not share your key publicly.
@@ -63,21 +64,8 @@ def process_car_wash_data(api_key, excel_file_path, output_csv_path):
             first_nearest_lon = first_nearest_car_wash_actual.get("location", {}).get("longitude")
 
             if first_nearest_lat is not None and first_nearest_lon is not None:
-                # Haversine formula (copied from searchNearbyAll.py for self-containment, or could import if preferred)
-                R = 6371  # Radius of Earth in kilometers
-                lat1_rad = math.radians(latitude)
-                lon1_rad = math.radians(longitude)
-                lat2_rad = math.radians(first_nearest_lat)
-                lon2_rad = math.radians(first_nearest_lon)
-
-                dlon = lon2_rad - lon1_rad
-                dlat = lat2_rad - lat1_rad
-
-                a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-                distance_km = R * c
-                distance_from_nearest = f"{distance_km * 0.621371:.2f} miles" # Convert km to miles
+                distance_miles = calculate_distance(latitude, longitude, first_nearest_lat, first_nearest_lon)
+                distance_from_nearest = f"{distance_miles:.2f} miles"
 
         elif car_washes and len(car_washes) == 1:
             print(f"  Found 1 car wash (likely the query location itself). No other car washes found.")
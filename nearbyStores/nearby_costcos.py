@@ -1,8 +1,10 @@
-import requests
-import json
 import os
 from dotenv import load_dotenv
 from nearbyStores.geo_utils import calculate_distance
+from common.places_client import search_nearby, search_text, places_field_mask
+
+# Only the fields read by get_costco_info.
+STORE_FIELD_MASK = places_field_mask("displayName", "location")
 
 load_dotenv()
 
@@ -11,85 +13,47 @@ def find_nearby_places(api_key, latitude, longitude, radius_miles=1, keyword=Non
     Finds nearby places using the Google Places API.
     """
     if keyword:
-        base_url = "https://places.googleapis.com/v1/places:searchText"
+        data = search_text(
+            api_key,
+            keyword,
+            latitude,
+            longitude,
+            radius_miles=radius_miles,
+            included_types=included_types,
+            max_results=max_results,
+            rank_preference="RELEVANCE",
+            field_mask=STORE_FIELD_MASK
+        )
     else:
-        base_url = "https://places.googleapis.com/v1/places:searchNearby"
+        data = search_nearby(
+            api_key,
+            latitude,
+            longitude,
+            radius_miles=radius_miles,
+            included_types=included_types,
+            max_results=max_results,
+            rank_preference="DISTANCE",
+            field_mask=STORE_FIELD_MASK
+        )
+
+    if data is None:
+        return None
 
-    radius_meters = radius_miles * 1609.34
+    # Filter places by distance
+    if "places" in data:
+        filtered_places = []
+        for place in data["places"]:
+            place_lat = place.get("location", {}).get("latitude")
+            place_lon = place.get("location", {}).get("longitude")
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": api_key,
-        "X-Goog-FieldMask": "*"
-    }
+            if place_lat and place_lon:
+                distance = calculate_distance(latitude, longitude, place_lat, place_lon)
+                if distance <= radius_miles:
+                    filtered_places.append(place)
 
-    if keyword:
-        payload = {
-            "locationBias": {
-                "circle": {
-                    "center": {
-                        "latitude": latitude,
-                        "longitude": longitude
-                    },
-                    "radius": radius_meters
-                }
-            },
-            "maxResultCount": min(max(1, max_results), 20)
-        }
-    else:
-        payload = {
-            "locationRestriction": {
-                "circle": {
-                    "center": {
-                        "latitude": latitude,
-                        "longitude": longitude
-                    },
-                    "radius": radius_meters
-                }
-            },
-            "maxResultCount": min(max(1, max_results), 20)
-        }
-
-    if included_types:
-        payload["includedTypes"] = included_types
-    if keyword:
-        payload["textQuery"] = keyword
-    
-    if not keyword:
-        payload["rankPreference"] = "DISTANCE"
-    else:
-        payload["rankPreference"] = "RELEVANCE"
+        data["places"] = filtered_places
 
-    try:
-        response = requests.post(base_url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # Filter places by distance
-        if "places" in data:
-            filtered_places = []
-            for place in data["places"]:
-                place_lat = place.get("location", {}).get("latitude")
-                place_lon = place.get("location", {}).get("longitude")
-                
-                if place_lat and place_lon:
-                    distance = calculate_distance(latitude, longitude, place_lat, place_lon)
-                    if distance <= radius_miles:
-                        filtered_places.append(place)
-            
-            data["places"] = filtered_places
-        
-        return data
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err}")
-        print(f"Response content: {response.text}")
-    except requests.exceptions.RequestException as req_err:
-        print(f"Request error occurred: {req_err}")
-    except json.JSONDecodeError:
-        print("Error decoding JSON response.")
-        print(f"Response content: {response.text}")
-    return None
+    return data
 
 def get_costco_info(latitude: float, longitude: float):
     """
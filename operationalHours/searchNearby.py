@@ -1,8 +1,17 @@
-import requests
-import json
 import os
+import sys
 from dotenv import load_dotenv
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.places_client import search_nearby, places_field_mask
+
+# Only the fields read by the operational hours output row.
+OPERATIONAL_HOURS_FIELD_MASK = places_field_mask(
+    "displayName", "location", "rating", "userRatingCount", "regularOpeningHours", "businessStatus"
+)
+
 load_dotenv()
 
 def find_nearby_places(api_key, latitude, longitude, radius_miles=2, included_types=None, max_results=10, rank_preference="POPULARITY"):
@@ -24,56 +33,16 @@ def find_nearby_places(api_key, latitude, longitude, radius_miles=2, included_ty
     Returns:
         dict: The JSON response from the API, or None if an error occurs.
     """
-    base_url = "https://places.googleapis.com/v1/places:searchNearby"
-
-    # Convert radius from miles to meters (1 mile = 1609.34 meters)
-    # CORRECTED: Use the radius_miles argument passed to the function
-    radius_meters = radius_miles * 1609.34
-    if not (0.0 < radius_meters <= 50000.0):
-        print("Error: Radius must be between 0.0 (exclusive) and 50000.0 meters (inclusive).")
-        return None
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": api_key,
-        "X-Goog-FieldMask": "*" # Requesting all fields
-    }
-
-    payload = {
-        "locationRestriction": {
-            "circle": {
-                "center": {
-                    "latitude": latitude,
-                    "longitude": longitude
-                },
-                "radius": radius_meters
-            }
-        },
-        "maxResultCount": min(max(1, max_results), 20)
-    }
-
-    if included_types and len(included_types) > 0:
-        payload["includedTypes"] = included_types
-    
-    if rank_preference:
-        payload["rankPreference"] = rank_preference
-        # if rank_preference == "DISTANCE" and "includedTypes" in payload:
-        #     print("Warning: When rankPreference is 'DISTANCE', 'includedTypes' might not be effective or could be ignored by the API for optimal distance ranking.")
-
-    try:
-        response = requests.post(base_url, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
-        response_data = response.json()
-        return response_data
-    except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err}")
-        print(f"Response content: {response.text}")
-    except requests.exceptions.RequestException as req_err:
-        print(f"Request error occurred: {req_err}")
-    except json.JSONDecodeError:
-        print("Error decoding JSON response.")
-        print(f"Response content: {response.text}")
-    return None
+    return search_nearby(
+        api_key,
+        latitude,
+        longitude,
+        radius_miles=radius_miles,
+        included_types=included_types,
+        max_results=max_results,
+        rank_preference=rank_preference,
+        field_mask=OPERATIONAL_HOURS_FIELD_MASK
+    )
 
 if __name__ == "__main__":
     # --- Configuration ---
@@ -1,29 +1,34 @@
 import requests
 import json
-import math
+import os
 import sys
 import argparse
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from common.geo import polyline_distances, EARTH_RADIUS_METERS
+from common.osm_store import OSM_BACKEND, get_osm_store
+
 # The public Overpass API endpoint
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points on the earth (in meters)."""
-    R = 6371000  # Radius of Earth in meters
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    a = math.sin(delta_phi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c / 1609.34  # Convert to miles
-
-def get_nearest_roads_with_speed(lat, lon, radius_meters):
+# Earth radius expressed in miles the way this module always has (meters / 1609.34).
+EARTH_RADIUS_MILES_SPEED = EARTH_RADIUS_METERS / 1609.34
+
+def get_nearest_roads_with_speed(lat, lon, radius_meters, backend=None):
     """
-    Queries the Overpass API for roads with speed limits within a given radius,
+    Queries the Overpass API (or the local OSM store, with backend="local" or
+    OSM_BACKEND=local) for roads with speed limits within a given radius,
     then sorts them by distance.
     """
-    
+    if (backend or OSM_BACKEND) == "local":
+        roads = get_osm_store().maxspeed_ways_around(lat, lon, radius_meters)
+        if not roads:
+            print("No roads with a maxspeed tag found in that area.")
+            return []
+        return _sort_roads_by_distance(lat, lon, roads)
+
     # 1. Build the Overpass QL query with the provided inputs
     # This query finds all 'ways' (roads) with a 'highway' and 'maxspeed' tag
     # that are within the specified radius of the lat/lon.
@@ -52,30 +57,35 @@ def get_nearest_roads_with_speed(lat, lon, radius_meters):
     if not roads:
         print("No roads with a maxspeed tag found in that area.")
         return []
-        
-    roads_with_distance = []
-    center_point = (lat, lon)
-    
-    for road in roads:
-        # Skip if it's not a 'way' or has no geometry
-        if road.get('type') != 'way' or not road.get('geometry'):
-            continue
 
-        min_dist_to_road = float('inf')
-        
-        # Find the closest point (node) on the road to our center point
-        for point in road['geometry']:
-            dist = haversine(center_point[0], center_point[1], point['lat'], point['lon'])
-            if dist < min_dist_to_road:
-                min_dist_to_road = dist
-        
+    return _sort_roads_by_distance(lat, lon, roads)
+
+
+def _sort_roads_by_distance(lat, lon, roads):
+    """Computes each road's distance to (lat, lon) and returns the roads sorted nearest first."""
+    # Skip anything that is not a 'way' or has no geometry
+    ways = [road for road in roads if road.get('type') == 'way' and road.get('geometry')]
+
+    # Distance to the closest point on each road's line segments (not just its
+    # vertices), for every way in the response at once.
+    nearest = polyline_distances(
+        lat, lon,
+        [[(point['lat'], point['lon']) for point in road['geometry']] for road in ways],
+        radius=EARTH_RADIUS_MILES_SPEED
+    )
+
+    roads_with_distance = []
+    for i, road in enumerate(ways):
         # Use .get() for safe access to tags that might be missing
         tags = road.get('tags', {})
         roads_with_distance.append({
             'name': tags.get('name', 'Unnamed Road'),
             'maxspeed': tags.get('maxspeed', 'N/A'),
             'id': road.get('id'),
-            'distance': min_dist_to_road
+            'distance': float(nearest['distance'][i]),
+            'closest_lat': float(nearest['closest_lat'][i]),
+            'closest_lon': float(nearest['closest_lon'][i]),
+            'segment_index': int(nearest['segment_index'][i])
         })
 
     # 4. Sort the list of roads by the calculated distance
@@ -0,0 +1,56 @@
+import math
+import os
+import random
+import sys
+import time
+
+# Add the trafficLights directory to the Python path (for geo_utils)
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from nearby_traffic_lights import filter_duplicate_locations, _filter_duplicate_locations_scalar
+from geo_utils import calculate_distance
+
+CENTER_LAT = 34.5810125
+CENTER_LON = -92.5740888
+RADIUS_MILES = 2.0
+
+def make_sorted_lights(n, seed=0):
+    """Generates n synthetic signals within 2 miles, clustered like real intersections and sorted by distance."""
+    rng = random.Random(seed)
+    intersections = max(1, n // 4)
+    centers = []
+    for _ in range(intersections):
+        r = RADIUS_MILES * math.sqrt(rng.random())
+        theta = rng.random() * 2 * math.pi
+        centers.append((
+            CENTER_LAT + (r * math.cos(theta)) / 69.0,
+            CENTER_LON + (r * math.sin(theta)) / (69.0 * math.cos(math.radians(CENTER_LAT)))
+        ))
+    lights = []
+    for node_id in range(n):
+        lat, lon = centers[rng.randrange(intersections)]
+        lat += rng.gauss(0, 0.0002)
+        lon += rng.gauss(0, 0.0002)
+        lights.append({
+            'id': node_id,
+            'lat': lat,
+            'lon': lon,
+            'distance_miles': calculate_distance(CENTER_LAT, CENTER_LON, lat, lon)
+        })
+    return sorted(lights, key=lambda x: x['distance_miles'])
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+
+    print(f"{'nodes':>8} {'kept':>8} {'scalar (s)':>12} {'grid (s)':>12} {'speedup':>9} {'identical':>10}")
+    for n in sizes:
+        lights = make_sorted_lights(n)
+        scalar_result, scalar_time = time_call(_filter_duplicate_locations_scalar, lights)
+        grid_result, grid_time = time_call(filter_duplicate_locations, lights)
+        identical = [l['id'] for l in scalar_result] == [l['id'] for l in grid_result]
+        print(f"{n:>8} {len(grid_result):>8} {scalar_time:>12.4f} {grid_time:>12.4f} {scalar_time / grid_time:>8.1f}x {str(identical):>10}")
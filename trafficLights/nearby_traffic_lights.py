@@ -1,36 +1,55 @@
 import requests
 import json
+import math
+import numpy as np
 from geo_utils import calculate_distance
+from common.geo import haversine_one_to_many, haversine_pairwise, EARTH_RADIUS_MILES, EARTH_RADIUS_METERS
+from common.osm_store import OSM_BACKEND, get_osm_store
 
-def get_nearby_traffic_lights(lat, lon, radius=3218.68):
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+# Sites are grouped into square regions of this size (degrees) for bulk queries.
+BULK_REGION_SIZE_DEG = 0.5
+
+def _assign_distances(lat, lon, traffic_lights):
+    """Sets 'distance_miles' on every light with coordinates, in one vectorized pass."""
+    located = [light for light in traffic_lights if light.get('lat') is not None and light.get('lon') is not None]
+    if not located:
+        return
+    distances = haversine_one_to_many(
+        lat, lon,
+        [light['lat'] for light in located],
+        [light['lon'] for light in located]
+    )
+    for light, distance in zip(located, distances.tolist()):
+        light['distance_miles'] = distance
+
+def get_nearby_traffic_lights(lat, lon, radius=3218.68, backend=None):
     """
-    Fetches nearby traffic lights from the Overpass API and sorts them by distance.
+    Fetches nearby traffic lights from the Overpass API (or the local OSM store)
+    and sorts them by distance.
 
     Args:
         lat (float): Latitude of the query location.
         lon (float): Longitude of the query location.
         radius (int, optional): Search radius in meters. Defaults to 3218.68 (2 miles).
+        backend (str, optional): "overpass" or "local". Defaults to the OSM_BACKEND env variable.
 
     Returns:
         list: A sorted list of traffic light dictionaries, each including a 'distance_miles' key.
     """
-    OVERPASS_URL = "https://overpass-api.de/api/interpreter"
-    query = f"""
-    [out:json][timeout:25];
-    node["highway"="traffic_signals"](around:{radius},{lat},{lon});
-    out body;
-    """
-    response = requests.post(OVERPASS_URL, data={"data": query})
-    data = response.json()
-
-    traffic_lights = data.get('elements', [])
-
-    for light in traffic_lights:
-        light_lat = light.get('lat')
-        light_lon = light.get('lon')
-        if light_lat is not None and light_lon is not None:
-            distance = calculate_distance(lat, lon, light_lat, light_lon)
-            light['distance_miles'] = distance
+    if (backend or OSM_BACKEND) == "local":
+        traffic_lights = get_osm_store().traffic_signals_around(lat, lon, radius)
+    else:
+        query = f"""
+        [out:json][timeout:25];
+        node["highway"="traffic_signals"](around:{radius},{lat},{lon});
+        out body;
+        """
+        response = requests.post(OVERPASS_URL, data={"data": query})
+        data = response.json()
+        traffic_lights = data.get('elements', [])
+    _assign_distances(lat, lon, traffic_lights)
 
     # Filter out lights that couldn't have distance calculated and sort
     sorted_lights = sorted(
@@ -40,10 +59,64 @@ def get_nearby_traffic_lights(lat, lon, radius=3218.68):
 
     return sorted_lights
 
+def _candidate_duplicate_pairs(lats, lons, threshold_miles):
+    """
+    Finds all (i, j) pairs with j < i that lie closer than threshold_miles.
+
+    Points are bucketed into a grid whose cells are at least threshold_miles
+    wide, so only the 3x3 block of cells around each point needs checking.
+    Pair generation and the distance test are done with NumPy arrays.
+    """
+    n = len(lats)
+    cell_lat = math.degrees(threshold_miles / EARTH_RADIUS_MILES)
+    max_abs_lat = min(float(np.max(np.abs(lats))), 89.0)
+    cell_lon = cell_lat / math.cos(math.radians(max_abs_lat))
+
+    rows = np.floor(lats / cell_lat).astype(np.int64)
+    cols = np.floor(lons / cell_lon).astype(np.int64)
+    rows -= rows.min() - 1
+    cols -= cols.min() - 1
+    width = int(cols.max()) + 2
+    keys = rows * width + cols
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    point_ids = np.arange(n)
+
+    pair_i = []
+    pair_j = []
+    for d_row in (-1, 0, 1):
+        for d_col in (-1, 0, 1):
+            target = keys + d_row * width + d_col
+            start = np.searchsorted(sorted_keys, target, side="left")
+            end = np.searchsorted(sorted_keys, target, side="right")
+            counts = end - start
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            i_idx = np.repeat(point_ids, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            j_idx = order[np.repeat(start, counts) + offsets]
+            earlier = j_idx < i_idx
+            pair_i.append(i_idx[earlier])
+            pair_j.append(j_idx[earlier])
+
+    if not pair_i:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pair_i = np.concatenate(pair_i)
+    pair_j = np.concatenate(pair_j)
+    close = haversine_pairwise(lats[pair_i], lons[pair_i], lats[pair_j], lons[pair_j]) < threshold_miles
+    return pair_i[close], pair_j[close]
+
 def filter_duplicate_locations(sorted_lights, threshold_miles=0.05):
     """
     Filters out duplicate traffic light locations based on a distance threshold.
 
+    Lights are visited nearest-first and a light is kept unless it lies within
+    the threshold of an already kept light. Close pairs are found with a grid
+    index and vectorized distance math, so the cost grows with the number of
+    nearby pairs instead of n * kept.
+
     Args:
         sorted_lights (list): A list of sorted traffic light dictionaries.
         threshold_miles (float, optional): The distance threshold in miles to consider
@@ -52,6 +125,30 @@ def filter_duplicate_locations(sorted_lights, threshold_miles=0.05):
     Returns:
         list: A filtered list of traffic light dictionaries.
     """
+    if not sorted_lights:
+        return []
+    if threshold_miles <= 0:
+        return list(sorted_lights)
+
+    lats = np.array([light['lat'] for light in sorted_lights], dtype=float)
+    lons = np.array([light['lon'] for light in sorted_lights], dtype=float)
+    pair_i, pair_j = _candidate_duplicate_pairs(lats, lons, threshold_miles)
+
+    # Group each light's earlier close neighbours (CSR layout keyed by i).
+    by_i = np.argsort(pair_i, kind="stable")
+    pair_i = pair_i[by_i]
+    pair_j = pair_j[by_i]
+    bounds = np.searchsorted(pair_i, np.arange(len(sorted_lights) + 1))
+
+    kept = np.zeros(len(sorted_lights), dtype=bool)
+    for i in range(len(sorted_lights)):
+        start, end = bounds[i], bounds[i + 1]
+        kept[i] = start == end or not kept[pair_j[start:end]].any()
+
+    return [light for light, keep in zip(sorted_lights, kept) if keep]
+
+def _filter_duplicate_locations_scalar(sorted_lights, threshold_miles=0.05):
+    """Reference O(n^2) implementation kept for benchmarking and equivalence checks."""
     if not sorted_lights:
         return []
 
@@ -71,6 +168,147 @@ def filter_duplicate_locations(sorted_lights, threshold_miles=0.05):
 
     return unique_lights
 
+def fetch_traffic_signals_in_bbox(south, west, north, east, timeout=180):
+    """
+    Fetches every highway=traffic_signals node inside a bounding box with one Overpass query.
+
+    Returns:
+        list: Overpass node elements (dicts with 'id', 'lat', 'lon', 'tags').
+    """
+    query = f"""
+    [out:json][timeout:{timeout}];
+    node["highway"="traffic_signals"]({south},{west},{north},{east});
+    out body;
+    """
+    response = requests.post(OVERPASS_URL, data={"data": query}, timeout=timeout + 30)
+    response.raise_for_status()
+    return response.json().get('elements', [])
+
+def _radius_to_degrees(lat, radius_meters):
+    """Returns the (lat, lon) degree spans that cover radius_meters around a latitude."""
+    lat_deg = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    lon_deg = min(180.0, lat_deg / cos_lat)
+    return lat_deg, lon_deg
+
+def group_sites_into_regions(sites, radius=3218.68, region_size_deg=BULK_REGION_SIZE_DEG):
+    """
+    Groups sites into regional bounding boxes for bulk Overpass queries.
+
+    Args:
+        sites (list): (lat, lon) tuples.
+        radius (float, optional): Search radius in meters around each site.
+        region_size_deg (float, optional): Grid cell size used to group sites.
+
+    Returns:
+        list: (bbox, site_indices) tuples, where bbox is (south, west, north, east)
+              and already padded by the search radius.
+    """
+    cells = {}
+    for index, (lat, lon) in enumerate(sites):
+        if lat is None or lon is None or math.isnan(lat) or math.isnan(lon):
+            continue
+        cell = (math.floor(lat / region_size_deg), math.floor(lon / region_size_deg))
+        cells.setdefault(cell, []).append(index)
+
+    regions = []
+    for site_indices in cells.values():
+        lats = [sites[i][0] for i in site_indices]
+        lons = [sites[i][1] for i in site_indices]
+        lat_pad, lon_pad = _radius_to_degrees(max(abs(l) for l in lats), radius)
+        bbox = (
+            max(-90.0, min(lats) - lat_pad),
+            max(-180.0, min(lons) - lon_pad),
+            min(90.0, max(lats) + lat_pad),
+            min(180.0, max(lons) + lon_pad),
+        )
+        regions.append((bbox, site_indices))
+    return regions
+
+class TrafficSignalIndex:
+    """
+    Grid bucket index over traffic signal nodes for local radius queries.
+
+    Bucket size follows the query radius, so a radius query only scans the
+    3x3 block of buckets around the query point.
+    """
+
+    def __init__(self, nodes, radius=3218.68):
+        self.cell_deg = math.degrees(radius / EARTH_RADIUS_METERS)
+        self.buckets = {}
+        for node in nodes:
+            if node.get('lat') is None or node.get('lon') is None:
+                continue
+            self.buckets.setdefault(self._cell(node['lat'], node['lon']), []).append(node)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def query_radius(self, lat, lon, radius):
+        """Returns the nodes within radius meters of (lat, lon), in node id order."""
+        lat_deg, lon_deg = _radius_to_degrees(lat, radius)
+        min_row, min_col = self._cell(lat - lat_deg, lon - lon_deg)
+        max_row, max_col = self._cell(lat + lat_deg, lon + lon_deg)
+        radius_miles = radius / 1609.34
+        candidates = []
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                candidates.extend(self.buckets.get((row, col), []))
+        if not candidates:
+            return []
+        distances = haversine_one_to_many(
+            lat, lon,
+            [node['lat'] for node in candidates],
+            [node['lon'] for node in candidates]
+        )
+        found = [node for node, distance in zip(candidates, distances.tolist()) if distance <= radius_miles]
+        # Overpass returns nodes in id order; keep that so distance ties sort identically.
+        found.sort(key=lambda node: node.get('id', 0))
+        return found
+
+def get_nearby_traffic_lights_bulk(sites, radius=3218.68, region_size_deg=BULK_REGION_SIZE_DEG, backend=None):
+    """
+    Bulk equivalent of get_nearby_traffic_lights for many sites.
+
+    Sites are grouped into regional bounding boxes, all signals in each box are
+    fetched with one Overpass query, and each site's radius query is answered
+    locally from a spatial index.
+
+    Args:
+        sites (list): (lat, lon) tuples.
+        radius (float, optional): Search radius in meters. Defaults to 3218.68 (2 miles).
+        region_size_deg (float, optional): Grid cell size used to group sites.
+        backend (str, optional): "overpass" or "local". With the local store every
+                                 site is answered directly from its R-tree index.
+
+    Returns:
+        list: For each input site, the same sorted list get_nearby_traffic_lights
+              would return (or None if the site has no valid coordinates or its
+              region query failed).
+    """
+    if (backend or OSM_BACKEND) == "local":
+        return [
+            get_nearby_traffic_lights(lat, lon, radius, backend="local")
+            if lat is not None and lon is not None and not (math.isnan(lat) or math.isnan(lon)) else None
+            for lat, lon in sites
+        ]
+
+    results = [None] * len(sites)
+    for bbox, site_indices in group_sites_into_regions(sites, radius, region_size_deg):
+        try:
+            nodes = fetch_traffic_signals_in_bbox(*bbox)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error fetching traffic signals for region {bbox}: {e}")
+            continue
+
+        index = TrafficSignalIndex(nodes, radius)
+        for site_index in site_indices:
+            lat, lon = sites[site_index]
+            traffic_lights = [dict(node) for node in index.query_radius(lat, lon, radius)]
+            _assign_distances(lat, lon, traffic_lights)
+            results[site_index] = sorted(traffic_lights, key=lambda x: x['distance_miles'])
+    return results
+
 if __name__ == "__main__":
     # Query location
     QUERY_LAT = 34.5810125
@@ -6,9 +6,9 @@ import sys
 # Add the project root to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from trafficLights.nearby_traffic_lights import get_nearby_traffic_lights, filter_duplicate_locations
+from trafficLights.nearby_traffic_lights import get_nearby_traffic_lights, get_nearby_traffic_lights_bulk, filter_duplicate_locations
 
-def process_data(start_index, end_index):
+def process_data(start_index, end_index, bulk=False):
     excel_file_path = 'trafficLights/1mile_raw_data.xlsx'
     output_csv_path = 'trafficLights/traffic_light_analysis.csv'
 
@@ -36,7 +36,15 @@ def process_data(start_index, end_index):
             writer.writeheader()
 
 
-    for index, row in df.iloc[start_index:end_index].iterrows():
+    records = df.iloc[start_index:end_index]
+
+    bulk_results = None
+    if bulk:
+        # One Overpass query per region instead of one per site.
+        sites = [(float(row['Latitude']), float(row['Longitude'])) for _, row in records.iterrows()]
+        bulk_results = get_nearby_traffic_lights_bulk(sites)
+
+    for position, (index, row) in enumerate(records.iterrows()):
         full_site_address = row['full_site_address']
         latitude = row['Latitude']
         longitude = row['Longitude']
@@ -44,7 +52,12 @@ def process_data(start_index, end_index):
         print(f"--- Processing record {index}: {full_site_address} ---")
 
         try:
-            sorted_traffic_lights = get_nearby_traffic_lights(latitude, longitude)
+            if bulk_results is not None:
+                sorted_traffic_lights = bulk_results[position]
+                if sorted_traffic_lights is None:
+                    raise ValueError("No bulk result for this site.")
+            else:
+                sorted_traffic_lights = get_nearby_traffic_lights(latitude, longitude)
             unique_traffic_lights = filter_duplicate_locations(sorted_traffic_lights)
             
             output_row = {
@@ -79,14 +92,16 @@ def process_data(start_index, end_index):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python trafficLights/process_data.py <start_index> <end_index>")
+    bulk_mode = "--bulk" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--bulk"]
+    if len(args) != 2:
+        print("Usage: python trafficLights/process_data.py <start_index> <end_index> [--bulk]")
         sys.exit(1)
 
     try:
-        start = int(sys.argv[1])
-        end = int(sys.argv[2])
-        process_data(start, end)
+        start = int(args[0])
+        end = int(args[1])
+        process_data(start, end, bulk=bulk_mode)
     except ValueError:
         print("Invalid start or end index provided. Please provide integers.")
         sys.exit(1)
@@ -3,13 +3,15 @@ import os
 from dotenv import load_dotenv
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from utils.competitor_matcher import match_competitors
-from utils.placePhotos import get_photo_references_and_name, download_photo
+from utils.placePhotos import get_place_photos, fetch_photos_bytes
 from utils.keyword_classification import keywordclassifier
-from utils.gpt_images_classification import visionModelResponse
-from utils.file_utils import sanitize_filename, get_place_image_count
+from utils.gpt_images_classification import visionModelResponseFromBytes, get_cached_vision_verdict, cache_vision_verdict
+from utils.file_utils import get_place_image_count
 from utils.geo_utils import calculate_distance
-from utils.google_maps_utils import get_satellite_image_name, download_satellite_image, find_nearby_places
+from utils.google_maps_utils import get_satellite_image_name, load_satellite_image_bytes, find_nearby_places
+from common.background_io import PERSIST_API_IMAGES
 
 IMAGE_DIR = "tunnelIdentification/place_images"
 if not os.path.exists(IMAGE_DIR):
@@ -19,7 +21,14 @@ SATELLITE_IMAGE_BASE_DIR = "tunnelIdentification/satellite_images"
 if not os.path.exists(SATELLITE_IMAGE_BASE_DIR):
     os.makedirs(SATELLITE_IMAGE_BASE_DIR)
 
-def identify_tunnel(original_latitude, original_longitude):
+def identify_tunnel(original_latitude, original_longitude, nearest_car_wash=None):
+    """
+    Identifies whether the car wash nearest to the given location is an express tunnel.
+
+    `nearest_car_wash` may carry a Places API place already resolved by the caller
+    (it needs id, displayName and location). It is used instead of a new search
+    when it lies within the 1 mile search radius.
+    """
     load_dotenv()
     API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
     if not API_KEY or API_KEY == "YOUR_API_KEY":
@@ -28,16 +37,25 @@ def identify_tunnel(original_latitude, original_longitude):
     place_types_to_search = ['car_wash']
     max_num_results = 1
     ranking_method = "DISTANCE"
+    search_radius_miles = 1
 
-    results = find_nearby_places(
-        API_KEY,
-        latitude=original_latitude,
-        longitude=original_longitude,
-        radius_miles=1,
-        included_types=place_types_to_search,
-        max_results=max_num_results,
-        rank_preference=ranking_method
-    )
+    if nearest_car_wash is not None:
+        nearest_location = nearest_car_wash.get("location", {})
+        nearest_distance = calculate_distance(original_latitude, original_longitude, nearest_location.get("latitude"), nearest_location.get("longitude"))
+        if nearest_distance is not None and nearest_distance <= search_radius_miles:
+            results = {"places": [nearest_car_wash]}
+        else:
+            results = {"places": []}
+    else:
+        results = find_nearby_places(
+            API_KEY,
+            latitude=original_latitude,
+            longitude=original_longitude,
+            radius_miles=search_radius_miles,
+            included_types=place_types_to_search,
+            max_results=max_num_results,
+            rank_preference=ranking_method
+        )
 
     if results and "places" in results and results["places"]:
         place = results["places"][0]
@@ -62,7 +80,6 @@ def identify_tunnel(original_latitude, original_longitude):
             classification_result = keywordclassifier(display_name)
             keyword_classification = classification_result.get("classification")
             keyword_explanation = classification_result.get("explanation")
-            time.sleep(1)
 
             if keyword_classification == "Competitor":
                 is_competitor = True
@@ -71,37 +88,49 @@ def identify_tunnel(original_latitude, original_longitude):
                 image_classification = None
                 image_justification = None
             elif keyword_classification == "Can't say":
-                satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
-                if satellite_image_name is None and place_id and place_latitude and place_longitude:
-                    if download_satellite_image(API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR):
-                        satellite_image_name = f"{place_id}.jpg"
-                
-                satellite_image_filename = satellite_image_name
-                place_images_count = 0
+                photos = []
                 if place_id:
-                    photo_references, _ = get_photo_references_and_name(place_id)
-                    if photo_references:
-                        for photo_idx, ref in enumerate(photo_references):
-                            download_photo(ref, "api_call", display_name, photo_idx, IMAGE_DIR)
-                        place_images_count = get_place_image_count("api_call", display_name, IMAGE_DIR)
+                    photos, _ = get_place_photos(place_id)
+                photo_references = [photo.get("name") for photo in photos]
 
-                current_place_images_folder_path = os.path.join(IMAGE_DIR, sanitize_filename("api_call"), sanitize_filename(display_name))
-                current_satellite_image_full_path = os.path.join(SATELLITE_IMAGE_BASE_DIR, satellite_image_name) if satellite_image_name else ""
-
-                if (place_images_count is not None and place_images_count > 0) or (current_satellite_image_full_path and os.path.exists(current_satellite_image_full_path)):
-                    try:
-                        image_result = visionModelResponse(
-                            place_images_folder_path=current_place_images_folder_path,
-                            satellite_image_path=current_satellite_image_full_path
+                # A verdict for this place and photo set skips every download and the vision call.
+                cached_verdict = get_cached_vision_verdict(place_id, photos)
+                if cached_verdict is not None:
+                    satellite_image_filename = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
+                    place_images_count = get_place_image_count("api_call", f"{display_name} {place_id}", IMAGE_DIR)
+                    image_classification = cached_verdict.get("classification")
+                    image_justification = cached_verdict.get("justification")
+                    if image_classification == "Competitor":
+                        is_competitor = True
+                else:
+                    # Images go from download to the model request in memory; saving
+                    # them to disk happens in the background (PERSIST_API_IMAGES).
+                    with ThreadPoolExecutor(max_workers=1) as satellite_executor:
+                        satellite_future = satellite_executor.submit(
+                            load_satellite_image_bytes, API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR
                         )
-                        image_classification = image_result.get("classification")
-                        image_justification = image_result.get("justification")
-                        if image_classification == "Competitor":
-                            is_competitor = True
-                        time.sleep(1)
-                    except Exception as e:
-                        image_classification = "Error"
-                        image_justification = str(e)
+                        # Branches of a chain share a name; the place_id keeps their folders apart.
+                        place_images = fetch_photos_bytes(photo_references, "api_call", f"{display_name} {place_id}", IMAGE_DIR)
+                        satellite_image_bytes = satellite_future.result()
+
+                    if satellite_image_bytes is not None and PERSIST_API_IMAGES:
+                        satellite_image_filename = f"{place_id}.jpg"
+                    else:
+                        satellite_image_filename = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
+                    place_images_count = len(place_images)
+
+                    if place_images or satellite_image_bytes:
+                        try:
+                            image_result = visionModelResponseFromBytes(satellite_image_bytes, place_images)
+                            cache_vision_verdict(place_id, photos, image_result)
+                            image_classification = image_result.get("classification")
+                            image_justification = image_result.get("justification")
+                            if image_classification == "Competitor":
+                                is_competitor = True
+                            time.sleep(1)
+                        except Exception as e:
+                            image_classification = "Error"
+                            image_justification = str(e)
         
         return {
             "original_latitude": original_latitude,
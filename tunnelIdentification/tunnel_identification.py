@@ -4,10 +4,10 @@ from dotenv import load_dotenv
 import time
 import traceback
 from utils.competitor_matcher import match_competitors
-from utils.placePhotos import get_photo_references_and_name, download_photo
-from utils.keyword_classification import keywordclassifier
+from utils.placePhotos import get_place_photos, download_photos
+from utils.keyword_classification import keywordclassifier, keywordclassifier_batch, keyword_cache_stats
 # from utils.gemini_images_classification import visionModelResponse
-from utils.gpt_images_classification import visionModelResponse
+from utils.gpt_images_classification import visionModelResponse, get_cached_vision_verdict, cache_vision_verdict, vision_cache_stats
 from utils.file_utils import sanitize_filename, get_place_image_count
 from utils.geo_utils import calculate_distance
 from utils.google_maps_utils import get_satellite_image_name, download_satellite_image, find_nearby_places
@@ -22,6 +22,32 @@ SATELLITE_IMAGE_BASE_DIR = "tunnelIdentification/satellite_images"
 if not os.path.exists(SATELLITE_IMAGE_BASE_DIR):
     os.makedirs(SATELLITE_IMAGE_BASE_DIR)
 
+# Sites whose nearest car washes are looked up and keyword-classified together,
+# just before their rows are processed and written.
+CHUNK_SIZE = 10
+
+def lookup_and_classify_chunk(api_key, rows, **search_params):
+    """
+    Looks up the nearest car washes of a chunk of sites, then classifies every
+    name the competitor list misses in one batched keyword request.
+
+    Returns:
+        tuple: (dict of row index -> find_nearby_places result, dict of name -> keyword result)
+    """
+    nearby_results = {}
+    for index, row in rows.iterrows():
+        if pd.isna(row.iloc[0]) or str(row.iloc[0]).strip() == "" or pd.isna(row.iloc[1]) or pd.isna(row.iloc[2]):
+            continue
+        nearby_results[index] = find_nearby_places(api_key, latitude=row.iloc[1], longitude=row.iloc[2], **search_params)
+
+    unmatched_names = []
+    for results in nearby_results.values():
+        if results and results.get("places"):
+            name = results["places"][0].get("displayName", {}).get("text", "N/A")
+            if not match_competitors([name])[1] and name not in unmatched_names:
+                unmatched_names.append(name)
+    return nearby_results, dict(zip(unmatched_names, keywordclassifier_batch(unmatched_names)))
+
 if __name__ == "__main__":
     import sys
 
@@ -76,8 +102,20 @@ if __name__ == "__main__":
         else:
             print(f"Appending to existing CSV file: {output_filepath}")
 
-        
-        for index, row in df.iloc[start_index_to_process:end_index_to_process].iterrows():
+        rows_to_process = df.iloc[start_index_to_process:end_index_to_process]
+        for position, (index, row) in enumerate(rows_to_process.iterrows()):
+            # Lookups and batched keyword classification run one chunk at a time, so each
+            # row is still written as soon as it is done and a failed run loses at most a chunk.
+            if position % CHUNK_SIZE == 0:
+                nearby_results, keyword_results = lookup_and_classify_chunk(
+                    API_KEY,
+                    rows_to_process.iloc[position:position + CHUNK_SIZE],
+                    radius_miles=1,
+                    included_types=place_types_to_search,
+                    max_results=max_num_results,
+                    rank_preference=ranking_method
+                )
+
             satellite_image_filename = None
             site_address = row.iloc[0]
             original_latitude = row.iloc[1]
@@ -93,15 +131,7 @@ if __name__ == "__main__":
                 print(f"Skipping record {index} due to missing latitude or longitude.")
                 continue
 
-            results = find_nearby_places(
-                API_KEY,
-                latitude=original_latitude,
-                longitude=original_longitude,
-                radius_miles=1,
-                included_types=place_types_to_search,
-                max_results=max_num_results,
-                rank_preference=ranking_method
-            )
+            results = nearby_results.get(index)
 
             if results and "places" in results:
                 # Only process the first car wash found
@@ -130,11 +160,10 @@ if __name__ == "__main__":
                         image_justification = None
                     else:
                         # Filter 2: Keyword Classification
-                        classification_result = keywordclassifier(display_name)
+                        classification_result = keyword_results.get(display_name) or keywordclassifier(display_name)
                         # print(f"####{classification_result}")
                         keyword_classification = classification_result.get("classification")
                         keyword_explanation = classification_result.get("explanation")
-                        time.sleep(1)
 
                         if keyword_classification == "Competitor":
                             is_competitor = True
@@ -144,39 +173,52 @@ if __name__ == "__main__":
                             image_justification = None
                         elif keyword_classification == "Can't say":
                             # Filter 3: Vision Model
-                            satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
-                            if satellite_image_name is None and place_id and place_latitude and place_longitude:
-                                if download_satellite_image(API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR):
-                                    satellite_image_name = f"{place_id}.jpg"
-                            
-                            satellite_image_filename = satellite_image_name
-                            place_images_count = 0  # Initialize place_images_count
+                            photos = []
                             if place_id:
-                                photo_references, _ = get_photo_references_and_name(place_id)
+                                photos, _ = get_place_photos(place_id)
+                            photo_references = [photo.get("name") for photo in photos]
+
+                            # A verdict for this place and photo set skips every download and the vision call.
+                            cached_verdict = get_cached_vision_verdict(place_id, photos)
+                            if cached_verdict is not None:
+                                satellite_image_filename = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
+                                place_images_count = get_place_image_count(site_address, display_name, IMAGE_DIR)
+                                image_classification = cached_verdict.get("classification")
+                                image_justification = cached_verdict.get("justification")
+                                if image_classification == "Competitor":
+                                    is_competitor = True
+                            else:
+                                satellite_image_name = get_satellite_image_name(place_id, SATELLITE_IMAGE_BASE_DIR)
+                                if satellite_image_name is None and place_id and place_latitude and place_longitude:
+                                    if download_satellite_image(API_KEY, place_latitude, place_longitude, place_id, SATELLITE_IMAGE_BASE_DIR):
+                                        satellite_image_name = f"{place_id}.jpg"
+
+                                satellite_image_filename = satellite_image_name
+                                place_images_count = 0  # Initialize place_images_count
                                 if photo_references:
-                                    for photo_idx, ref in enumerate(photo_references):
-                                        download_photo(ref, site_address, display_name, photo_idx, IMAGE_DIR)
+                                    download_photos(photo_references, site_address, display_name, IMAGE_DIR)
                                     place_images_count = get_place_image_count(site_address, display_name, IMAGE_DIR)
 
-                            current_place_images_folder_path = os.path.join(IMAGE_DIR, sanitize_filename(site_address), sanitize_filename(display_name))
-                            current_satellite_image_full_path = os.path.join(SATELLITE_IMAGE_BASE_DIR, satellite_image_name) if satellite_image_name else ""
-
-                            if (place_images_count is not None and place_images_count > 0) or (current_satellite_image_full_path and os.path.exists(current_satellite_image_full_path)):
-                                try:
-                                    image_result = visionModelResponse(
-                                        place_images_folder_path=current_place_images_folder_path,
-                                        satellite_image_path=current_satellite_image_full_path
-                                    )
-                                    image_classification = image_result.get("classification")
-                                    image_justification = image_result.get("justification")
-                                    if image_classification == "Competitor":
-                                        is_competitor = True
-                                    time.sleep(1)
-                                except Exception as e:
-                                    print(f"ERROR calling visionModelResponse for {display_name}: {e}")
-                                    print(traceback.format_exc())
-                                    image_classification = "Error"
-                                    image_justification = str(e)
+                                current_place_images_folder_path = os.path.join(IMAGE_DIR, sanitize_filename(site_address), sanitize_filename(display_name))
+                                current_satellite_image_full_path = os.path.join(SATELLITE_IMAGE_BASE_DIR, satellite_image_name) if satellite_image_name else ""
+
+                                if (place_images_count is not None and place_images_count > 0) or (current_satellite_image_full_path and os.path.exists(current_satellite_image_full_path)):
+                                    try:
+                                        image_result = visionModelResponse(
+                                            place_images_folder_path=current_place_images_folder_path,
+                                            satellite_image_path=current_satellite_image_full_path
+                                        )
+                                        cache_vision_verdict(place_id, photos, image_result)
+                                        image_classification = image_result.get("classification")
+                                        image_justification = image_result.get("justification")
+                                        if image_classification == "Competitor":
+                                            is_competitor = True
+                                        time.sleep(1)
+                                    except Exception as e:
+                                        print(f"ERROR calling visionModelResponse for {display_name}: {e}")
+                                        print(traceback.format_exc())
+                                        image_classification = "Error"
+                                        image_justification = str(e)
                     
                     record_data = {
                         "original_name_address": site_address,
@@ -223,6 +265,10 @@ if __name__ == "__main__":
 
 
         print(f"\nProcessing complete. Results appended to {output_filepath}")
+        stats = keyword_cache_stats()
+        print(f"Keyword classification cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+        stats = vision_cache_stats()
+        print(f"Vision verdict cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
 
     except Exception as e:
         print(f"An error occurred during processing: {e}")
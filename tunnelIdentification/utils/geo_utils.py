@@ -1,22 +1,8 @@
-import pandas as pd
-from math import radians, sin, cos, sqrt, atan2
+import os
+import sys
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate the distance between two points in miles."""
-    if pd.isna(lat1) or pd.isna(lon1) or pd.isna(lat2) or pd.isna(lon2):
-        return None
-    R = 3958.8  # Radius of Earth in miles
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-    lat1_rad = radians(lat1)
-    lon1_rad = radians(lon1)
-    lat2_rad = radians(lat2)
-    lon2_rad = radians(lon2)
-
-    dlon = lon2_rad - lon1_rad
-    dlat = lat2_rad - lat1_rad
-
-    a = sin(dlat / 2)**2 + cos(lat1_rad) * cos(lat2_rad) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-
-    distance = R * c
-    return distance
+# Distance helpers live in common/geo.py; re-exported here for existing imports.
+from common.geo import calculate_distance, haversine_one_to_many, haversine_many_to_many
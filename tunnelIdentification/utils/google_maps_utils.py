@@ -1,9 +1,15 @@
 import os
-import requests
-import json
+import sys
 import time
 from requests.exceptions import RequestException
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.places_client import search_nearby, get_session, DEFAULT_FIELD_MASK
+from common.background_io import write_file_async, PERSIST_API_IMAGES
+from common.rate_limiter import get_rate_limiter
+
 def get_satellite_image_name(place_id, satellite_image_base_dir):
     """Gets the name of the satellite image if it exists, using place_id as filename."""
     if place_id is None:
@@ -15,34 +21,32 @@ def get_satellite_image_name(place_id, satellite_image_base_dir):
         return satellite_filename
     return None
 
-def download_satellite_image(api_key, latitude, longitude, place_id, satellite_image_base_dir):
-    """Downloads a satellite image from Google Static Maps API, saving with place_id as filename."""
+SATELLITE_IMAGE_PARAMS = {
+    "zoom": 20,
+    "size": "640x640",
+    "maptype": "hybrid",
+}
+
+def fetch_satellite_image_bytes(api_key, latitude, longitude):
+    """
+    Fetches a satellite image from Google Static Maps API into memory.
+
+    Returns:
+        bytes: The image bytes, or None if all attempts failed.
+    """
     base_url = "https://maps.googleapis.com/maps/api/staticmap"
 
     params = {
         "center": f"{latitude},{longitude}",
-        "zoom": 20,
-        "size": "640x640",
-        "maptype": "hybrid",
+        **SATELLITE_IMAGE_PARAMS,
         "key": api_key
     }
 
-    satellite_filename = f"{place_id}.jpg"
-    output_filepath = os.path.join(satellite_image_base_dir, satellite_filename)
-
     for attempt in range(3):
         try:
-            response = requests.get(base_url, params=params, timeout=15)
+            response = get_session().get(base_url, params=params, timeout=15)
             response.raise_for_status()
-
-            output_dir = os.path.dirname(output_filepath)
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir)
-
-            with open(output_filepath, "wb") as f:
-                f.write(response.content)
-            print(f"Satellite image saved as '{output_filepath}'")
-            return True
+            return response.content
         except RequestException as e:
             print(f"Attempt {attempt + 1} failed to download satellite image: {e}")
             if attempt < 2:
@@ -52,65 +56,63 @@ def download_satellite_image(api_key, latitude, longitude, place_id, satellite_i
                 print("All attempts failed.")
                 if hasattr(e, 'response') and e.response is not None:
                     print(f"Final response content: {e.response.text}")
-    return False
+    return None
 
-def find_nearby_places(api_key, latitude, longitude, radius_miles=1, included_types=None, max_results=10, rank_preference="POPULARITY"):
-    """
-    Finds nearby places using the Google Places API (Nearby Search New).
-    """
-    base_url = "https://places.googleapis.com/v1/places:searchNearby"
+def download_satellite_image(api_key, latitude, longitude, place_id, satellite_image_base_dir):
+    """Downloads a satellite image from Google Static Maps API, saving with place_id as filename."""
+    satellite_filename = f"{place_id}.jpg"
+    output_filepath = os.path.join(satellite_image_base_dir, satellite_filename)
 
-    radius_meters = radius_miles * 1609.34
-    if not (0.0 < radius_meters <= 50000.0):
-        print("Error: Radius must be between 0.0 (exclusive) and 50000.0 meters (inclusive).")
-        return None
+    content = fetch_satellite_image_bytes(api_key, latitude, longitude)
+    if content is None:
+        return False
 
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": api_key,
-        "X-Goog-FieldMask": "*"
-    }
+    output_dir = os.path.dirname(output_filepath)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
 
-    payload = {
-        "locationRestriction": {
-            "circle": {
-                "center": {
-                    "latitude": latitude,
-                    "longitude": longitude
-                },
-                "radius": radius_meters
-            }
-        },
-        "maxResultCount": min(max(1, max_results), 20)
-    }
+    with open(output_filepath, "wb") as f:
+        f.write(content)
+    print(f"Satellite image saved as '{output_filepath}'")
+    return True
 
-    if included_types and len(included_types) > 0:
-        payload["includedTypes"] = included_types
-    
-    if rank_preference:
-        payload["rankPreference"] = rank_preference
+def load_satellite_image_bytes(api_key, latitude, longitude, place_id, satellite_image_base_dir, persist=PERSIST_API_IMAGES):
+    """
+    Returns the satellite image of a place as bytes, reading the saved copy if
+    there is one and otherwise fetching it. A fetched image is saved under
+    `place_id` on a background thread when `persist` is set.
 
-    for attempt in range(3):
+    Returns:
+        bytes: The image bytes, or None if it is not on disk and could not be fetched.
+    """
+    satellite_filename = get_satellite_image_name(place_id, satellite_image_base_dir)
+    if satellite_filename:
         try:
-            response = requests.post(base_url, headers=headers, data=json.dumps(payload), timeout=15)
-            response.raise_for_status()
-            return response.json()
-        except RequestException as e:
-            print(f"Attempt {attempt + 1} for find_nearby_places failed: {e}")
-            if attempt < 2:
-                print("Retrying in 2 seconds...")
-                time.sleep(2)
-            else:
-                print("All attempts failed.")
-                if hasattr(e, 'response') and e.response is not None:
-                    try:
-                        print(f"Final response content: {e.response.json()}")
-                    except json.JSONDecodeError:
-                        print(f"Final response content (not JSON): {e.response.text}")
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON response: {e}")
-            if 'response' in locals() and response.text:
-                print(f"Response content: {response.text}")
-            return None # Do not retry on JSON decode error
+            with open(os.path.join(satellite_image_base_dir, satellite_filename), "rb") as f:
+                return f.read()
+        except OSError:
+            pass
+    if not (place_id and latitude and longitude):
+        return None
 
-    return None
+    get_rate_limiter("google_maps").acquire()
+    content = fetch_satellite_image_bytes(api_key, latitude, longitude)
+    if content is not None and persist:
+        write_file_async(os.path.join(satellite_image_base_dir, f"{place_id}.jpg"), content)
+    return content
+
+def find_nearby_places(api_key, latitude, longitude, radius_miles=1, included_types=None, max_results=10, rank_preference="POPULARITY", field_mask=DEFAULT_FIELD_MASK):
+    """
+    Finds nearby places using the Google Places API (Nearby Search New).
+    Requests go through the shared pooled client in common/places_client.py.
+    """
+    return search_nearby(
+        api_key,
+        latitude,
+        longitude,
+        radius_miles=radius_miles,
+        included_types=included_types,
+        max_results=max_results,
+        rank_preference=rank_preference,
+        field_mask=field_mask
+    )
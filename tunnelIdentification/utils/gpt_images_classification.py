@@ -1,5 +1,7 @@
 import os
+import sys
 import base64
+import hashlib
 import mimetypes
 import json
 from typing import List, Dict, Optional
@@ -9,6 +11,13 @@ from pydantic import BaseModel, Field
 from typing import Literal
 from dotenv import load_dotenv
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.classification_cache import get_classification_cache
+from common.image_prep import prepare_image_set, prepare_image_bytes_set, jpeg_data_url, IMAGE_BYTE_BUDGET, JPEG_QUALITY
+from common.photo_selection import select_photos, select_photo_bytes, DUPLICATE_HAMMING_DISTANCE
+
 load_dotenv()
 
 # --- Azure OpenAI Configuration ---
@@ -26,77 +35,14 @@ class CarWashClassification(BaseModel):
         description="Detailed justification for the classification, mentioning visible features, adherence to criteria, or missing/ambiguous data."
     )
 
-def get_mime_type(file_path):
-    """Determines the MIME type of a file based on its extension."""
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if mime_type is None:
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext in ['.jpg', '.jpeg']:
-            return 'image/jpeg'
-        elif ext == '.png':
-            return 'image/png'
-        else:
-            return 'application/octet-stream'
-    return mime_type
-
-def image_to_data_url(file_path: str) -> Optional[str]:
-    """Encodes an image file into a base64 data URL."""
-    try:
-        mime_type = get_mime_type(file_path)
-        if not mime_type or not mime_type.startswith('image'):
-            print(f"Warning: File is not a recognized image type: {file_path}. Skipping.")
-            return None
-            
-        with open(file_path, "rb") as image_file:
-            base64_encoded_data = base64.b64encode(image_file.read()).decode('utf-8')
-        return f"data:{mime_type};base64,{base64_encoded_data}"
-    except Exception as e:
-        print(f"Error encoding image {file_path} to data URL: {e}")
-        return None
-
-def visionModelResponse(place_images_folder_path: str, satellite_image_path: str) -> dict:
-    """
-    Analyzes car wash images (customer/business uploads and satellite image)
-    to determine if it's an Express Tunnel Car Wash, returning structured JSON.
-    """
-    if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_MODEL_DEPLOYMENT_NAME]):
-        return {"error": "Azure OpenAI environment variables are not fully configured."}
+IMAGE_DETAIL = "high"
+MAX_PLACE_IMAGES = 9
+# Downscale and recompress images before upload (see common/image_prep.py).
+PREPROCESS_IMAGES = os.getenv("VISION_PREPROCESS_IMAGES", "1").lower() not in ("0", "false", "no")
+# Drop near-duplicate place photos and send the most informative ones (see common/photo_selection.py).
+SELECT_DISTINCT_PHOTOS = os.getenv("VISION_SELECT_DISTINCT_PHOTOS", "1").lower() not in ("0", "false", "no")
 
-    all_image_content_parts = []
-
-    # 1. Load Satellite Image
-    print(f"Loading satellite image from: {satellite_image_path}")
-    if os.path.isfile(satellite_image_path):
-        satellite_data_url = image_to_data_url(satellite_image_path)
-        if satellite_data_url:
-            all_image_content_parts.append({
-                "type": "image_url",
-                "image_url": {"url": satellite_data_url, "detail": "high"}
-            })
-            print(f"  - Loaded: {os.path.basename(satellite_image_path)}")
-    else:
-        return {"error": f"Satellite image file not found at '{satellite_image_path}'. Please check the path."}
-
-    # 2. Load Place Photos (up to 9)
-    print(f"Loading images from: {place_images_folder_path}")
-    if os.path.isdir(place_images_folder_path):
-        image_files = [f for f in os.listdir(place_images_folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp'))]
-        for filename in image_files[:9]:
-            file_path = os.path.join(place_images_folder_path, filename)
-            place_data_url = image_to_data_url(file_path)
-            if place_data_url:
-                all_image_content_parts.append({
-                    "type": "image_url",
-                    "image_url": {"url": place_data_url, "detail": "high"}
-                })
-                print(f"  - Loaded: {filename}")
-    else:
-        print(f"Place images folder not found or is not a directory at '{place_images_folder_path}'. Skipping place images.")
-
-    if not all_image_content_parts:
-        return {"error": "No valid images were found to analyze. Please ensure the paths are correct and images exist."}
-
-    system_prompt = """
+SYSTEM_PROMPT = """
 You are analyzing publicly available images of car wash locations (from Google or Yelp), either uploaded by the business or its customers. Your goal is to determine whether the location is an express car wash that uses a tunnel system.
 
 Classify a car wash as a “Competitor” if the following indicators are present:
@@ -165,14 +111,219 @@ Justification:
 - [Mention visible features: tunnel structure, entrance/exit, equipment, signage, conveyor, vacuum area, etc.]
 - [If classification is unclear, explain what data was missing or ambiguous.]
 """
-    user_query_prompt = "Analyze the provided images for the car wash location and determine if it is an Express Tunnel Car Wash competitor based on the criteria."
+
+USER_QUERY_PROMPT = "Analyze the provided images for the car wash location and determine if it is an Express Tunnel Car Wash competitor based on the criteria."
+
+# Verdicts are cached per place and photo set under this version, so changing
+# the prompts, deployment, image or preprocessing settings or response schema re-classifies.
+VISION_CACHE_NAMESPACE = "vision_classification"
+# Photo names are not stable, so the photo set is identified by its size;
+# verdicts expire after this many days to pick up replaced photos of the same size.
+VISION_CACHE_TTL_DAYS = float(os.getenv("VISION_CACHE_TTL_DAYS", "30"))
+VISION_PROMPT_VERSION = hashlib.sha1(json.dumps([
+    AZURE_OPENAI_MODEL_DEPLOYMENT_NAME, SYSTEM_PROMPT, USER_QUERY_PROMPT, IMAGE_DETAIL, MAX_PLACE_IMAGES,
+    [PREPROCESS_IMAGES, JPEG_QUALITY, IMAGE_BYTE_BUDGET, SELECT_DISTINCT_PHOTOS, DUPLICATE_HAMMING_DISTANCE],
+    CarWashClassification.model_json_schema()
+], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def image_set_hash(photos):
+    """
+    Hash of the photo set a verdict was based on: the number of photos and
+    their pixel dimensions, from the Places photo metadata.
+
+    Photo resource names expire and change between responses, so they are
+    not part of the key.
+    """
+    dimensions = sorted((photo.get("widthPx"), photo.get("heightPx")) for photo in photos or [])
+    return hashlib.sha1(json.dumps([len(dimensions), dimensions]).encode("utf-8")).hexdigest()
+
+
+def _vision_cache_key(place_id, photos):
+    return f"{place_id}:{image_set_hash(photos)}"
+
+
+def get_cached_vision_verdict(place_id, photos):
+    """
+    Returns the cached visionModelResponse result for this place and photo set, or None.
+
+    Only needs the photo metadata (one Place Details call, see get_place_photos),
+    so callers can check it before downloading the satellite image or any photo.
+    Verdicts older than VISION_CACHE_TTL_DAYS are ignored.
+    """
+    cache = get_classification_cache()
+    if cache is None or not place_id:
+        return None
+    return cache.get(VISION_CACHE_NAMESPACE, _vision_cache_key(place_id, photos), VISION_PROMPT_VERSION,
+                     max_age_seconds=VISION_CACHE_TTL_DAYS * 86400)
+
+
+def cache_vision_verdict(place_id, photos, result):
+    """Stores a successful visionModelResponse result; errors are not cached."""
+    cache = get_classification_cache()
+    if cache is None or not place_id or not isinstance(result, dict) or "classification" not in result:
+        return
+    cache.set(VISION_CACHE_NAMESPACE, _vision_cache_key(place_id, photos), VISION_PROMPT_VERSION, result)
+
+
+def vision_cache_stats():
+    """Hit/miss counts and hit rate of the vision verdict cache in this process."""
+    cache = get_classification_cache()
+    return cache.stats(VISION_CACHE_NAMESPACE) if cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0}
+
+
+def get_mime_type(file_path):
+    """Determines the MIME type of a file based on its extension."""
+    mime_type, _ = mimetypes.guess_type(file_path)
+    if mime_type is None:
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext in ['.jpg', '.jpeg']:
+            return 'image/jpeg'
+        elif ext == '.png':
+            return 'image/png'
+        else:
+            return 'application/octet-stream'
+    return mime_type
+
+def image_to_data_url(file_path: str) -> Optional[str]:
+    """Encodes an image file into a base64 data URL."""
+    try:
+        mime_type = get_mime_type(file_path)
+        if not mime_type or not mime_type.startswith('image'):
+            print(f"Warning: File is not a recognized image type: {file_path}. Skipping.")
+            return None
+            
+        with open(file_path, "rb") as image_file:
+            base64_encoded_data = base64.b64encode(image_file.read()).decode('utf-8')
+        return f"data:{mime_type};base64,{base64_encoded_data}"
+    except Exception as e:
+        print(f"Error encoding image {file_path} to data URL: {e}")
+        return None
+
+def build_image_content_parts(place_images_folder_path: str, satellite_image_path: str, preprocess: bool = PREPROCESS_IMAGES,
+                              dedup_photos: bool = SELECT_DISTINCT_PHOTOS):
+    """
+    Loads the satellite image and up to MAX_PLACE_IMAGES place photos as image_url content parts.
+
+    With `dedup_photos`, near-duplicate photos are dropped and the most
+    informative distinct ones are chosen; otherwise the first files by name
+    are used. With `preprocess`, images are resized onto the model's tile grid, re-encoded
+    without metadata and kept within the per-request byte budget (see
+    common/image_prep.py); otherwise the files are sent as they are on disk.
+
+    Returns:
+        tuple: (list of content parts, error message or None)
+    """
+    # 1. Satellite Image
+    print(f"Loading satellite image from: {satellite_image_path}")
+    if not os.path.isfile(satellite_image_path):
+        return [], f"Satellite image file not found at '{satellite_image_path}'. Please check the path."
+    image_paths = [satellite_image_path]
+
+    # 2. Place Photos (up to MAX_PLACE_IMAGES)
+    print(f"Loading images from: {place_images_folder_path}")
+    if os.path.isdir(place_images_folder_path):
+        image_files = sorted(f for f in os.listdir(place_images_folder_path) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.webp')))
+        place_image_paths = [os.path.join(place_images_folder_path, filename) for filename in image_files]
+        if dedup_photos:
+            image_paths += select_photos(place_image_paths, MAX_PLACE_IMAGES)
+        else:
+            image_paths += place_image_paths[:MAX_PLACE_IMAGES]
+    else:
+        print(f"Place images folder not found or is not a directory at '{place_images_folder_path}'. Skipping place images.")
+
+    if preprocess:
+        data_urls = prepare_image_set(image_paths)
+    else:
+        data_urls = [(path, image_to_data_url(path)) for path in image_paths]
+
+    all_image_content_parts = []
+    for path, data_url in data_urls:
+        if data_url:
+            all_image_content_parts.append({
+                "type": "image_url",
+                "image_url": {"url": data_url, "detail": IMAGE_DETAIL}
+            })
+            print(f"  - Loaded: {os.path.basename(path)}")
+    return all_image_content_parts, None
+
+def build_image_content_parts_from_bytes(satellite_image_bytes, place_images, preprocess: bool = PREPROCESS_IMAGES,
+                                         dedup_photos: bool = SELECT_DISTINCT_PHOTOS):
+    """
+    build_image_content_parts() for images already in memory, so the online
+    path never reads them back from disk.
+
+    Args:
+        satellite_image_bytes (bytes): The satellite image.
+        place_images (list): (label, raw bytes) pairs of place photos, in the order they were listed.
+
+    Returns:
+        tuple: (list of content parts, error message or None)
+    """
+    if not satellite_image_bytes:
+        return [], "Satellite image could not be fetched."
+    images = [("satellite", satellite_image_bytes)]
+
+    place_images = list(place_images or [])
+    if dedup_photos:
+        images += select_photo_bytes(place_images, MAX_PLACE_IMAGES)
+    else:
+        images += place_images[:MAX_PLACE_IMAGES]
+
+    if preprocess:
+        data_urls = prepare_image_bytes_set(images)
+    else:
+        # Places and Static Maps photos are served as JPEG.
+        data_urls = [(label, jpeg_data_url(raw)) for label, raw in images]
+
+    all_image_content_parts = []
+    for label, data_url in data_urls:
+        all_image_content_parts.append({
+            "type": "image_url",
+            "image_url": {"url": data_url, "detail": IMAGE_DETAIL}
+        })
+        print(f"  - Loaded: {label}")
+    return all_image_content_parts, None
+
+def visionModelResponse(place_images_folder_path: str, satellite_image_path: str) -> dict:
+    """
+    Analyzes car wash images (customer/business uploads and satellite image)
+    to determine if it's an Express Tunnel Car Wash, returning structured JSON.
+    """
+    if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_MODEL_DEPLOYMENT_NAME]):
+        return {"error": "Azure OpenAI environment variables are not fully configured."}
+
+    all_image_content_parts, error = build_image_content_parts(place_images_folder_path, satellite_image_path)
+    if error:
+        return {"error": error}
+    return _classify_image_parts(all_image_content_parts)
+
+def visionModelResponseFromBytes(satellite_image_bytes, place_images) -> dict:
+    """
+    visionModelResponse() for images held in memory.
+
+    Args:
+        satellite_image_bytes (bytes): The satellite image.
+        place_images (list): (label, raw bytes) pairs of place photos.
+    """
+    if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_MODEL_DEPLOYMENT_NAME]):
+        return {"error": "Azure OpenAI environment variables are not fully configured."}
+
+    all_image_content_parts, error = build_image_content_parts_from_bytes(satellite_image_bytes, place_images)
+    if error:
+        return {"error": error}
+    return _classify_image_parts(all_image_content_parts)
+
+def _classify_image_parts(all_image_content_parts) -> dict:
+    if not all_image_content_parts:
+        return {"error": "No valid images were found to analyze. Please ensure the paths are correct and images exist."}
 
     messages = [
-        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": SYSTEM_PROMPT},
         {
             "role": "user",
             "content": [
-                {"type": "text", "text": user_query_prompt}
+                {"type": "text", "text": USER_QUERY_PROMPT}
             ] + all_image_content_parts
         }
     ]
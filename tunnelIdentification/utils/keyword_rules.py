@@ -0,0 +1,80 @@
+import re
+
+# Keyword rules from the keyword classifier prompt, as regex fragments matched
+# on whole words of the lowercased, punctuation-stripped name.
+COMPETITOR_KEYWORDS = [
+    r"e?xpress",
+    r"xpres+",
+    r"flex\s*serve?",
+    r"quick\s*wash",
+    r"tunnel",
+    r"exterior",
+]
+
+NOT_COMPETITOR_KEYWORDS = [
+    r"self\s*serv(?:e|ice)",
+    r"hand\s*wash",
+    r"mobile",
+    r"truck\s*wash",
+    r"blue\s*beacon",
+    r"window\s*tint(?:ing)?",
+    r"detail(?:ing|s|ers?)?",
+    r"oil\s*change",
+]
+
+# Words that make a "Not a Competitor" keyword unreliable on their own (the
+# prompt's "Can't say" terms, plus automation hints the model weighs), so
+# names containing them are left to the model.
+AMBIGUOUS_KEYWORDS = [
+    r"auto(?:matic)?",
+    r"lube",
+    r"drive\s*thru",
+    r"drive\s*through",
+    r"full\s*serv(?:e|ice)",
+    r"speed",
+    r"quick",
+    r"kwik",
+]
+
+_RULES_RE = re.compile(
+    r"\b(?:"
+    r"(?P<competitor>" + "|".join(COMPETITOR_KEYWORDS) + r")|"
+    r"(?P<not_competitor>" + "|".join(NOT_COMPETITOR_KEYWORDS) + r")|"
+    r"(?P<ambiguous>" + "|".join(AMBIGUOUS_KEYWORDS) + r")"
+    r")\b"
+)
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def rule_classify(car_wash_name):
+    """
+    Resolves the unambiguous cases of the keyword classifier without a model call.
+
+    Any competitor keyword wins, as in the prompt ("if the input contains both
+    types of keywords, default to Competitor"). A not-competitor keyword only
+    decides the name when no ambiguous word is present.
+
+    Returns:
+        dict: {"classification", "explanation"} like keywordclassifier, or None
+              if the name should go to the model.
+    """
+    if not isinstance(car_wash_name, str):
+        return None
+    text = _NON_ALNUM_RE.sub(" ", car_wash_name.lower())
+
+    found = {"competitor": [], "not_competitor": [], "ambiguous": []}
+    for match in _RULES_RE.finditer(text):
+        group = match.lastgroup
+        found[group].append(match.group(group))
+
+    if found["competitor"]:
+        return {
+            "classification": "Competitor",
+            "explanation": f"Rule-based: name contains competitor keyword(s) {', '.join(found['competitor'])}.",
+        }
+    if found["not_competitor"] and not found["ambiguous"]:
+        return {
+            "classification": "Not a Competitor",
+            "explanation": f"Rule-based: name contains non-competitor keyword(s) {', '.join(found['not_competitor'])}.",
+        }
+    return None
@@ -1,9 +1,14 @@
 import os
+import sys
 import requests
-import json
 import time
 from requests.exceptions import RequestException
 
+# Add the project root to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from common.places_client import search_nearby, DEFAULT_FIELD_MASK
+
 def get_satellite_image_name(place_id, satellite_image_base_dir):
     """Gets the name of the satellite image if it exists, using place_id as filename."""
     if place_id is None:
@@ -54,63 +59,18 @@ def download_satellite_image(api_key, latitude, longitude, place_id, satellite_i
                     print(f"Final response content: {e.response.text}")
     return False
 
-def find_nearby_places(api_key, latitude, longitude, radius_miles=1, included_types=None, max_results=10, rank_preference="POPULARITY"):
+def find_nearby_places(api_key, latitude, longitude, radius_miles=1, included_types=None, max_results=10, rank_preference="POPULARITY", field_mask=DEFAULT_FIELD_MASK):
     """
     Finds nearby places using the Google Places API (Nearby Search New).
+    Requests go through the shared pooled client in common/places_client.py.
     """
-    base_url = "https://places.googleapis.com/v1/places:searchNearby"
-
-    radius_meters = radius_miles * 1609.34
-    if not (0.0 < radius_meters <= 50000.0):
-        print("Error: Radius must be between 0.0 (exclusive) and 50000.0 meters (inclusive).")
-        return None
-
-    headers = {
-        "Content-Type": "application/json",
-        "X-Goog-Api-Key": api_key,
-        "X-Goog-FieldMask": "*"
-    }
-
-    payload = {
-        "locationRestriction": {
-            "circle": {
-                "center": {
-                    "latitude": latitude,
-                    "longitude": longitude
-                },
-                "radius": radius_meters
-            }
-        },
-        "maxResultCount": min(max(1, max_results), 20)
-    }
-
-    if included_types and len(included_types) > 0:
-        payload["includedTypes"] = included_types
-    
-    if rank_preference:
-        payload["rankPreference"] = rank_preference
-
-    for attempt in range(3):
-        try:
-            response = requests.post(base_url, headers=headers, data=json.dumps(payload), timeout=15)
-            response.raise_for_status()
-            return response.json()
-        except RequestException as e:
-            print(f"Attempt {attempt + 1} for find_nearby_places failed: {e}")
-            if attempt < 2:
-                print("Retrying in 2 seconds...")
-                time.sleep(2)
-            else:
-                print("All attempts failed.")
-                if hasattr(e, 'response') and e.response is not None:
-                    try:
-                        print(f"Final response content: {e.response.json()}")
-                    except json.JSONDecodeError:
-                        print(f"Final response content (not JSON): {e.response.text}")
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON response: {e}")
-            if 'response' in locals() and response.text:
-                print(f"Response content: {response.text}")
-            return None # Do not retry on JSON decode error
-
-    return None
+    return search_nearby(
+        api_key,
+        latitude,
+        longitude,
+        radius_miles=radius_miles,
+        included_types=included_types,
+        max_results=max_results,
+        rank_preference=rank_preference,
+        field_mask=field_mask
+    )